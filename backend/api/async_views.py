@@ -0,0 +1,171 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import views
+
+# Async variants of the Gemini-backed endpoints, for running under ASGI.
+# The model call is awaited, so one worker can keep many of them in flight,
+# while the CPU-bound pandas work runs on a small dedicated thread pool.
+
+metrics_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'METRICS_THREADS', 4),
+    thread_name_prefix='metrics',
+)
+
+
+def run_in_pool(fn, *args):
+    return asyncio.get_running_loop().run_in_executor(metrics_executor, fn, *args)
+
+def json_response(data, status=200):
+    # DRF's encoder also handles the numpy scalars pandas hands back
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+async def agenerate_text(endpoint, merchant_id, prompt):
+    call = lambda: views.llm_gateway.agenerate(prompt, merchant_id)
+    # Hashing the merchant's rows for its version is CPU work, so it runs in the pool
+    version = await run_in_pool(views.data_version, merchant_id)
+    return await views.llm_cache.aget_or_call(endpoint, merchant_id, prompt, call, version)
+
+# Calls that outlived their request's deadline, still running to fill the cache
+background_calls = set()
+# Calls running or waiting for the gateway, bounded like views.llm_slots
+llm_slots = asyncio.BoundedSemaphore(settings.LLM_MAX_IN_FLIGHT + settings.LLM_MAX_QUEUED)
+
+def forget_call(task):
+    background_calls.discard(task)
+    if not task.cancelled():
+        task.exception()  # already reported to the request; keeps asyncio from logging it again
+
+async def agenerate_within(endpoint, merchant_id, prompt, started):
+    """Async views.generate_within"""
+    if llm_slots.locked():
+        print(f"Answering {endpoint} for {merchant_id} without Gemini: too many calls queued")
+        return None
+    # Not locked, so this takes a slot without waiting
+    await llm_slots.acquire()
+    task = asyncio.ensure_future(agenerate_text(endpoint, merchant_id, prompt))
+    background_calls.add(task)
+    task.add_done_callback(forget_call)
+    task.add_done_callback(lambda task: llm_slots.release())
+    try:
+        # shield, so the deadline stops the wait but not the call
+        return views.parse_model_output(await asyncio.wait_for(asyncio.shield(task), views.remaining_budget(started)))
+    except Exception as e:
+        print(f"Answering {endpoint} for {merchant_id} without Gemini: {str(e) or 'deadline passed'}")
+        return None
+
+async def llm_response(build, endpoint, field, merchant_id, fallback, stored=None):
+    started = time.monotonic()
+    try:
+        prompt, result = await run_in_pool(build, merchant_id)
+        output = await run_in_pool(stored, merchant_id) if stored else None
+        if output is None:
+            output = await agenerate_within(endpoint, merchant_id, prompt, started)
+        return json_response(views.llm_or_fallback(result, field, output, fallback))
+
+    except views.NoDataError as e:
+        return json_response({'error': str(e)}, status=404)
+    except Exception as e:
+        return json_response({'error': str(e)}, status=500)
+
+
+def read_chat_request(request):
+    """(merchant_id, query, lang) from a JSON or form body, or an error response"""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return json_response({'error': 'Invalid JSON body'}, status=400)
+    else:
+        data = request.POST
+
+    user_query = data.get('query')
+    merchant_id = data.get('merchant_id')
+    lang = data.get('lang', 'en')  # Support 'en' or 'ms'
+
+    if views.llm_api_key_missing():
+        return json_response({'error': 'API key missing'}, status=500)
+    if not user_query or not merchant_id:
+        return json_response({'error': 'Missing query or merchant_id'}, status=400)
+    return merchant_id, user_query, lang
+
+async def astream_chat_events(chunks, finish):
+    text = []
+    try:
+        async for chunk in chunks:
+            text.append(chunk.text)
+            yield views.sse_event({'text': chunk.text})
+        yield views.sse_event(await finish(''.join(text)), event='done')
+    except Exception as e:
+        yield views.sse_event({'error': str(e)}, event='error')
+
+
+@csrf_exempt
+@require_POST
+async def ask_gemini(request):
+    parsed = read_chat_request(request)
+    if not isinstance(parsed, tuple):
+        return parsed
+    merchant_id, user_query, lang = parsed
+
+    try:
+        state, chat = await run_in_pool(views.get_chat, merchant_id, lang)
+
+        response = await views.llm_gateway.asend(chat, user_query, merchant_id)
+        # Saving may summarize old turns with a blocking model call, so it runs in the pool too
+        return json_response(await run_in_pool(views.chat_response, merchant_id, state, user_query, response.text))
+
+    except views.NoDataError as e:
+        return json_response({'error': str(e)}, status=404)
+    except views.LLMUnavailableError as e:
+        return json_response({'error': str(e)}, status=503)
+    except Exception as e:
+        return json_response({'error': str(e)}, status=500)
+
+@csrf_exempt
+@require_POST
+async def ask_gemini_stream(request):
+    parsed = read_chat_request(request)
+    if not isinstance(parsed, tuple):
+        return parsed
+    merchant_id, user_query, lang = parsed
+
+    try:
+        state, chat = await run_in_pool(views.get_chat, merchant_id, lang)
+
+        chunks = await views.llm_gateway.asend(chat, user_query, merchant_id, stream=True)
+        finish = lambda text: run_in_pool(views.chat_response, merchant_id, state, user_query, text)
+        return views.event_stream_response(astream_chat_events(chunks, finish))
+
+    except views.NoDataError as e:
+        return json_response({'error': str(e)}, status=404)
+    except views.LLMUnavailableError as e:
+        return json_response({'error': str(e)}, status=503)
+    except Exception as e:
+        return json_response({'error': str(e)}, status=500)
+
+@require_GET
+async def merchant_recommendations(request, merchant_id):
+    return await llm_response(
+        views.build_recommendations, 'recommendations', 'recommendations', merchant_id,
+        views.rule_recommendations, views.stored_recommendations,
+    )
+
+@require_GET
+async def realtime_recommendations(request, merchant_id):
+    return await llm_response(
+        views.build_realtime_recommendations, 'realtime_recommendations', 'recommendations', merchant_id,
+        views.rule_recommendations,
+    )
+
+@require_GET
+async def merchant_alerts_v2(request, merchant_id):
+    return await llm_response(views.build_alerts, 'alerts', 'gemini_insights', merchant_id, views.rule_insights)
@@ -0,0 +1,36 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from api.utils import data_loader
+from api.utils.merchant_index import MerchantIndex
+from api.utils.rollups import DailyRollup
+
+
+class Command(BaseCommand):
+    help = 'Convert the CSV datasets into a typed, memory-mappable columnar snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data-dir', type=Path, default=data_loader.data_dir)
+        parser.add_argument('--snapshot-dir', type=Path, default=data_loader.snapshot_dir)
+        parser.add_argument('--force', action='store_true', help='Rebuild even if the snapshot is fresh')
+
+    def handle(self, *args, **options):
+        data_dir = options['data_dir']
+        snapshot_dir = options['snapshot_dir']
+
+        if not options['force'] and data_loader.snapshot_is_fresh(data_dir, snapshot_dir):
+            self.stdout.write(f"Snapshot in {snapshot_dir} is already up to date")
+            return
+
+        frames = data_loader.read_csv_datasets(data_dir)
+
+        # Ship the merged per-merchant frame too, so workers map it instead of each re-merging
+        index = MerchantIndex.build(frames['merchants'], frames['items'], frames['trans_items'], frames['transactions'])
+        frames['merchant_index'] = index.frame
+        frames['daily_rollup'] = DailyRollup.build(index.frame, index.key).to_flat()
+
+        manifest = data_loader.write_snapshot(frames, data_dir, snapshot_dir)
+        usage = data_loader.memory_usage(frames)
+        rows = ', '.join(f"{name}={len(df)} rows/{usage[name] / 2**20:.1f}MB" for name, df in frames.items())
+        self.stdout.write(self.style.SUCCESS(f"Wrote snapshot {manifest['version']} to {snapshot_dir} ({rows})"))
@@ -0,0 +1,69 @@
+import time
+from pathlib import Path
+
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.utils import data_loader
+from api.utils.anomalies import anomalies_enabled, write_anomalies
+from api.utils.anomaly_detector import AnomalyDetector, load_detector, save_detector
+from api.utils.ingest import read_appended, read_range, stamp_sources
+
+
+class Command(BaseCommand):
+    help = 'Watch the order files for appended orders and record Anomaly rows for unusual hours'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=10, help='Seconds between checks for new orders')
+        parser.add_argument('--once', action='store_true', help='Process what has been appended so far and exit')
+        parser.add_argument('--reset', action='store_true', help='Ignore the saved statistics and warm up from history again')
+        parser.add_argument('--data-dir', type=Path, default=data_loader.data_dir)
+
+    def handle(self, *args, **options):
+        data_dir = options['data_dir']
+        path = settings.ANOMALY_DETECTOR_STATE_PATH
+        if not anomalies_enabled():
+            self.stdout.write("The assistant app is not installed, so anomalies are only printed")
+
+        saved = None if options['reset'] else load_detector(path)
+        detector, sources = saved if saved is not None else self.warm_up(data_dir)
+        save_detector(path, detector, sources)
+
+        while True:
+            appended = read_appended(sources, data_dir)
+            if appended is None:
+                self.stdout.write("The datasets changed other than by appended orders; warming up again")
+                detector, sources = self.warm_up(data_dir)
+            else:
+                frames, sources = appended
+                if len(frames['transactions']):
+                    self.record(detector.process(frames['transactions']), len(frames['transactions']))
+            # Saved after every batch, so a restart carries on from here instead of re-reading history
+            save_detector(path, detector, sources)
+
+            if options['once']:
+                return
+            time.sleep(options['interval'])
+
+    def warm_up(self, data_dir):
+        """A detector fed the last ANOMALY_WARMUP_DAYS days of orders, without reporting them"""
+        sources = stamp_sources(data_dir)
+        filename = data_loader.DATASET_FILES['transactions']
+        # Only the bytes the stamps cover, so orders appended meanwhile are read as the next batch
+        transactions = read_range(Path(data_dir) / filename, 0, sources[filename]['size'])
+        data_loader.parse_transaction_times(transactions)
+        if len(transactions):
+            start = transactions['order_time'].max().normalize() - pd.Timedelta(days=settings.ANOMALY_WARMUP_DAYS)
+            transactions = transactions[transactions['order_time'] >= start]
+
+        detector = AnomalyDetector(settings.ANOMALY_EWMA_ALPHA, settings.ANOMALY_Z_THRESHOLD, settings.ANOMALY_MIN_DAYS)
+        detector.process(transactions)
+        self.stdout.write(f"Warmed up on {len(transactions)} orders of {len(detector.merchants)} merchants")
+        return detector, sources
+
+    def record(self, anomalies, orders):
+        for merchant_id, anomaly_type, severity, description in anomalies:
+            self.stdout.write(f"[{severity}] {merchant_id} {anomaly_type}: {description}")
+        created = write_anomalies(anomalies)
+        self.stdout.write(f"Processed {orders} new orders: {len(anomalies)} anomalies, {created} new Anomaly rows")
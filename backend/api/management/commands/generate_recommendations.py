@@ -0,0 +1,59 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.utils.batch_recommendations import BatchGenerator
+from api.utils.precompute_store import PrecomputeStore
+
+
+class Command(BaseCommand):
+    help = 'Generate Gemini recommendations for many merchants per request and store them for merchant_recommendations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--merchants', nargs='+', help='Only these merchant IDs')
+        parser.add_argument('--token-budget', type=int, default=settings.LLM_BATCH_TOKEN_BUDGET, help='Estimated prompt tokens per request')
+        parser.add_argument('--batch-size', type=int, default=settings.LLM_BATCH_MAX_MERCHANTS, help='Most merchants per request')
+        parser.add_argument('--attempts', type=int, default=settings.LLM_BATCH_ATTEMPTS, help='Rounds for merchants missing from a reply')
+        parser.add_argument('--restart', action='store_true', help='Regenerate merchants whose stored recommendations are current')
+
+    def handle(self, *args, **options):
+        from api import views
+
+        started = time.time()
+        store = PrecomputeStore(settings.PRECOMPUTE_STORE_PATH)
+        merchant_ids = options['merchants'] or views.current_data().merchants['merchant_id'].astype(str).tolist()
+        done = {} if options['restart'] else store.versions('recommendations')
+        versions = {m: views.data_version(m) for m in merchant_ids}
+
+        summaries = {}
+        for merchant_id in merchant_ids:
+            if done.get(merchant_id) == versions[merchant_id]:
+                continue
+            try:
+                summaries[merchant_id], _ = views.recommendations_summary(merchant_id)
+            except views.NoDataError:
+                continue
+        skipped = len(merchant_ids) - len(summaries)
+        if skipped:
+            self.stdout.write(f"Skipping {skipped} of {len(merchant_ids)} merchants: already current or without data")
+        if not summaries:
+            self.stdout.write(self.style.SUCCESS("Nothing to generate"))
+            return
+
+        generator = BatchGenerator(
+            views.llm_gateway, options['token_budget'], max(options['batch_size'], 1), max(options['attempts'], 1)
+        )
+
+        def save(results):
+            # Stored per batch, so an interrupted run keeps what it already paid for
+            store.put('recommendations', {m: (versions[m], value) for m, value in results.items()})
+            self.stdout.write(f"{len(results)} merchants stored")
+
+        results, failed = generator.generate(summaries, on_batch=save)
+        for merchant_id, error in failed.items():
+            self.stderr.write(f"{merchant_id}: {error}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated recommendations for {len(results)} of {len(summaries)} merchants "
+            f"in {generator.calls} requests, {time.time() - started:.1f}s"
+        ))
@@ -0,0 +1,30 @@
+from pathlib import Path
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from api.utils import data_loader
+from api.utils.ingest import append_orders
+
+
+class Command(BaseCommand):
+    help = 'Append new orders and their items to the order CSVs as a delta'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=Path, required=True, help='CSV of new orders, same columns as transaction_data.csv')
+        parser.add_argument('--items', type=Path, required=True, help='CSV of their order items, same columns as transaction_items.csv')
+        parser.add_argument('--data-dir', type=Path, default=data_loader.data_dir)
+
+    def handle(self, *args, **options):
+        # Read as text so values are appended exactly as given
+        read = lambda path: pd.read_csv(path, dtype=str, keep_default_na=False)
+        try:
+            counts = append_orders(read(options['transactions']), read(options['items']), options['data_dir'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Appended {counts['transactions']} orders and {counts['trans_items']} order items to {options['data_dir']}"
+        ))
+        # The columnar snapshot no longer matches, so a restart would parse the CSVs again
+        self.stdout.write("Running servers fold them in on their next reload; run build_snapshot to refresh the snapshot for restarts")
@@ -0,0 +1,83 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.utils.precompute_store import PrecomputeStore
+
+# Kind stored in the precompute store -> name of the views function that builds it
+PRECOMPUTE_KINDS = {
+    'metrics': 'compute_metrics',
+    'keywords': 'compute_keyword_recommendations',
+    'alerts': 'compute_alerts',
+}
+
+
+def init_worker():
+    # Forked workers inherit the parent's loaded data; spawned ones load it here
+    django.setup()
+    from api import views  # noqa: F401
+
+def precompute_chunk(merchant_ids):
+    """{merchant_id: (version, {kind: result})} for one shard of merchants"""
+    from api import views
+
+    results = {}
+    for merchant_id in merchant_ids:
+        values = {}
+        for kind, name in PRECOMPUTE_KINDS.items():
+            try:
+                value = getattr(views, name)(merchant_id)
+            except views.NoDataError:
+                continue
+            if value is not None:
+                values[kind] = value
+        results[merchant_id] = (views.data_version(merchant_id), values)
+    return results
+
+
+class Command(BaseCommand):
+    help = 'Precompute metrics, keyword recommendations and alert inputs for every merchant'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes (default: all cores)')
+        parser.add_argument('--chunk-size', type=int, default=50, help='Merchants per task; each finished task is a checkpoint')
+        parser.add_argument('--merchants', nargs='+', help='Only these merchant IDs')
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and recompute everyone')
+
+    def handle(self, *args, **options):
+        # Load everything once in the parent, so forked workers share it
+        from api import views
+        views.warm_up()
+
+        store = PrecomputeStore(settings.PRECOMPUTE_STORE_PATH)
+        merchant_ids = options['merchants'] or views.current_data().merchants['merchant_id'].astype(str).tolist()
+        done = {} if options['restart'] else store.done()
+        pending = [m for m in merchant_ids if done.get(m) != views.data_version(m)]
+        skipped = len(merchant_ids) - len(pending)
+        if skipped:
+            self.stdout.write(f"Resuming: {skipped} of {len(merchant_ids)} merchants already done")
+        if not pending:
+            self.stdout.write(self.style.SUCCESS("Nothing to precompute"))
+            return
+
+        chunk_size = max(options['chunk_size'], 1)
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        finished = 0
+
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as executor:
+            futures = {executor.submit(precompute_chunk, chunk): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                try:
+                    results = future.result()
+                except Exception as e:
+                    # Left out of the checkpoint, so the next run retries this shard
+                    self.stderr.write(f"Shard starting at {futures[future][0]} failed: {e}")
+                    continue
+                store.write(results, PRECOMPUTE_KINDS)
+                finished += len(results)
+                self.stdout.write(f"{finished + skipped}/{len(merchant_ids)} merchants done")
+
+        self.stdout.write(self.style.SUCCESS(f"Precomputed {finished} merchants into {settings.PRECOMPUTE_STORE_PATH}"))
@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.utils.alerts import compute_fleet_alerts, delay_anomalies
+from api.utils.anomalies import anomalies_enabled, write_anomalies
+from api.utils.precompute_store import PrecomputeStore
+
+
+class Command(BaseCommand):
+    help = 'Compute the alerts of every merchant in one pass, store them for merchant_alerts_v2 and record Anomaly rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=int, default=0, help='Run again every this many seconds, picking up new data (default: once)')
+
+    def handle(self, *args, **options):
+        from api import views
+
+        store = PrecomputeStore(settings.PRECOMPUTE_STORE_PATH)
+        if not anomalies_enabled():
+            self.stdout.write("The assistant app is not installed, so no Anomaly rows will be written")
+
+        while True:
+            self.run_once(views, store)
+            if not options['every']:
+                return
+            time.sleep(options['every'])
+            views.datasets.reload()
+
+    def run_once(self, views, store):
+        started = time.time()
+        current = views.current_data()
+        results = {}
+        records = []
+        for merchant_id, summary in compute_fleet_alerts(current.hot.latest_frame(), current.merchant_index.key):
+            results[merchant_id] = (views.data_version(merchant_id), views.alert_payload(merchant_id, summary))
+            for severity, description in delay_anomalies(summary):
+                records.append((merchant_id, 'order_issue', severity, description))
+
+        store.put('alerts', results)
+        created = write_anomalies(records)
+        self.stdout.write(self.style.SUCCESS(
+            f"Computed alerts for {len(results)} merchants in {time.time() - started:.1f}s, "
+            f"{len(records)} bottlenecks, {created} new anomalies"
+        ))
@@ -0,0 +1,117 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# The per-merchant computations as the views did them before the indexes,
+# rollups and caches, on the CSVs read as plain frames. Tests compare the
+# optimized paths against these.
+
+
+def read_frames(data_dir):
+    data_dir = Path(data_dir)
+    return {
+        'keywords': pd.read_csv(data_dir / 'keywords.csv'),
+        'merchants': pd.read_csv(data_dir / 'merchant.csv'),
+        'transactions': pd.read_csv(data_dir / 'transaction_data.csv'),
+        'trans_items': pd.read_csv(data_dir / 'transaction_items.csv'),
+        'items': pd.read_csv(data_dir / 'items.csv'),
+    }
+
+def get_merchant_data(frames, merchant_id):
+    merchant_data = frames['merchants'][frames['merchants']['merchant_id'] == merchant_id].copy()
+    if merchant_data.empty:
+        return pd.DataFrame()
+    merchant_items = frames['items'][frames['items']['merchant_id'] == merchant_id].copy()
+    if merchant_items.empty:
+        return pd.DataFrame()
+
+    result = pd.merge(frames['trans_items'], merchant_items, on='item_id', how='inner')
+    result = pd.merge(result, frames['transactions'], on='order_id', how='inner')
+    result = pd.merge(result, merchant_data, on='merchant_id', how='left')
+    for col in ['order_time', 'delivery_time', 'driver_arrival_time', 'driver_pickup_time']:
+        if col in result.columns:
+            result[col] = pd.to_datetime(result[col])
+    if 'join_date' in result.columns:
+        result['join_date'] = pd.to_datetime(result['join_date'], format='%d%m%Y')
+    return result.reset_index(drop=True)
+
+def item_sales(data):
+    return data.groupby(['item_id', 'item_name']).size().reset_index(name='num_sales')
+
+def merchant_metrics(data, top_n=5):
+    """Every dashboard metric, in the shape compute_merchant_metrics returns"""
+    sales = item_sales(data)
+    order_hours = data['order_time'].dt.hour.value_counts().sort_values(ascending=False)
+    order_days = data['order_time'].dt.day_name().value_counts().sort_values(ascending=False)
+    return {
+        'top_selling_items': sales.sort_values(by='num_sales', ascending=False).head(top_n).to_dict(orient='records'),
+        'least_selling_items': sales.sort_values(by='num_sales', ascending=True).head(top_n).to_dict(orient='records'),
+        'popular_order_hours': order_hours.to_dict(),
+        'popular_order_days': order_days.to_dict(),
+        'average_basket_size': round(data[['order_id', 'item_id']].drop_duplicates().groupby('order_id').size().mean(), 2),
+        'average_order_value': round(data['order_value'].mean(), 2),
+        'average_delivery_time': round(((data['delivery_time'] - data['order_time']).dt.total_seconds() / 60).mean(), 2),
+        'total_revenue': round(data['item_price'].sum(), 2),
+        'total_orders': data['order_id'].nunique(),
+    }
+
+def latest_day(data):
+    """The merchant's rows on its latest order date"""
+    dates = data['order_time'].dt.date
+    return data[dates == dates.max()].reset_index(drop=True)
+
+def merchant_alerts(merchant_id, data):
+    """The alerts endpoint's response for one merchant, without the model's insights"""
+    latest_date = data['order_time'].max().normalize()
+    latest = data.loc[data['order_time'].dt.normalize() == latest_date]
+    sales = latest.groupby('item_name')['order_id'].nunique().reset_index(name='sales_count')
+    high_threshold = sales['sales_count'].mean() + sales['sales_count'].std()
+    arrival = (latest['driver_arrival_time'] - latest['order_time']).dt.total_seconds() / 60
+    pickup = (latest['driver_pickup_time'] - latest['driver_arrival_time']).dt.total_seconds() / 60
+    delivery = (latest['delivery_time'] - latest['driver_pickup_time']).dt.total_seconds() / 60
+    return {
+        'merchant_id': merchant_id,
+        'latest_date': str(latest_date.date()),
+        'inventory_status': {
+            'high_selling_items': sales[sales['sales_count'] > high_threshold]['item_name'].tolist(),
+            'low_selling_items': sales[sales['sales_count'] <= 2]['item_name'].tolist(),
+        },
+        'revenue_summary': {
+            'total_orders': latest['order_id'].nunique(),
+            'total_revenue': round(latest['order_value'].sum(), 2),
+        },
+        'bottleneck_alerts': [
+            "Drivers are taking longer than usual to arrive." if arrival.mean() > 15
+            else "Driver arrival times are within acceptable range.",
+            "Orders are waiting too long after drivers arrive." if pickup.mean() > 10
+            else "Pickup delays are minimal and acceptable.",
+            "Deliveries are slower than expected." if delivery.mean() > 30
+            else "Delivery times are within expected range.",
+        ],
+    }
+
+def keyword_recommendations(frames, merchant_id, encode, cuisine_keywords, top_k=5, min_score=0.4):
+    """{item_name: [keyword records]} scored one item and one keyword at a time"""
+    keywords = frames['keywords'].sort_values(by='checkout', ascending=False)
+    items = frames['items'][frames['items']['merchant_id'] == merchant_id]
+    keyword_vectors = np.asarray(encode(keywords['keyword'].astype(str).tolist()), dtype=np.float64)
+    max_checkout = keywords['checkout'].max()
+    max_order = keywords['order'].max()
+
+    results = {}
+    for _, item in items.iterrows():
+        item_vector = np.asarray(encode([item['item_name']])[0], dtype=np.float64)
+        terms = cuisine_keywords.get(item['cuisine_tag'], [])
+        scored = []
+        for (_, keyword), vector in zip(keywords.iterrows(), keyword_vectors):
+            semantic = vector @ item_vector / (np.linalg.norm(vector) * np.linalg.norm(item_vector))
+            business = 0.4 * keyword['checkout'] / max_checkout + 0.6 * keyword['order'] / max_order
+            cuisine = 1 if any(term in keyword['keyword'].lower() for term in terms) else 0
+            score = 0.5 * semantic + 0.3 * business + 0.2 * cuisine
+            if score > min_score:
+                scored.append({'keyword': keyword['keyword'], 'score': score, 'checkout': keyword['checkout'], 'order': keyword['order']})
+        scored.sort(key=lambda r: (-r['score'], -r['checkout'], -r['order']))
+        if scored[:top_k]:
+            results[item['item_name']] = scored[:top_k]
+    return results
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from contextlib import ExitStack
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from rest_framework.utils.encoders import JSONEncoder
+
+from api.utils.chat_store import ChatSessionStore, InProcessSessionBackend
+from api.utils.llm_cache import InProcessBackend, LLMResponseCache
+from api.utils.llm_gateway import FakeBackend, LLMGateway
+from api.utils.registry import DatasetRegistry
+
+# Synthetic datasets in the shape of data/datasets/, small enough to build per test
+
+WORDS = ['burger', 'pizza', 'taco', 'curry', 'sushi', 'noodle', 'fries', 'salad', 'kebab', 'pasta']
+CUISINES = ['Burgers', 'Italian', 'Mexican', 'Indian', 'Japanese', 'Fusion']
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def merchant_ids(count):
+    return [f'm{i:03d}' for i in range(count)]
+
+def make_orders(rng, items, merchant_ids, count, start, days, first_order=0):
+    """(transaction_data rows, transaction_items rows) for count orders spread over days from start"""
+    owners = rng.choice(merchant_ids, count)
+    order_time = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days * 24 * 60, count), unit='min')
+    arrival = order_time + pd.to_timedelta(rng.integers(2, 25, count), unit='min')
+    pickup = arrival + pd.to_timedelta(rng.integers(1, 15, count), unit='min')
+    delivery = pickup + pd.to_timedelta(rng.integers(10, 40, count), unit='min')
+    order_ids = [f'o{first_order + i}' for i in range(count)]
+
+    menus = {m: group['item_id'].to_numpy() for m, group in items.groupby('merchant_id')}
+    lines = []
+    for order_id, merchant_id in zip(order_ids, owners):
+        for item_id in rng.choice(menus[merchant_id], rng.integers(1, 4)):
+            lines.append({'order_id': order_id, 'item_id': int(item_id), 'merchant_id': merchant_id})
+    trans_items = pd.DataFrame(lines)
+    prices = trans_items.merge(items[['item_id', 'item_price']], on='item_id').groupby('order_id')['item_price'].sum()
+
+    transactions = pd.DataFrame({
+        'order_id': order_ids,
+        'order_time': order_time.strftime(TIME_FORMAT),
+        'driver_arrival_time': arrival.strftime(TIME_FORMAT),
+        'driver_pickup_time': pickup.strftime(TIME_FORMAT),
+        'delivery_time': delivery.strftime(TIME_FORMAT),
+        'order_value': pd.Series(order_ids).map(prices).round(2).to_numpy(),
+        'eater_id': rng.integers(1, 300, count),
+        'merchant_id': owners,
+    })
+    return transactions, trans_items
+
+def write_datasets(data_dir, merchants=6, orders=400, days=21, seed=0):
+    """Write the five CSVs; the last merchant has a menu but no orders"""
+    rng = np.random.default_rng(seed)
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    ids = merchant_ids(merchants)
+
+    pd.DataFrame({
+        'merchant_id': ids,
+        'merchant_name': [f'Shop {i}' for i in range(merchants)],
+        'join_date': [f'{i % 28 + 1:02d}0{i % 9 + 1}2022' for i in range(merchants)],
+        'city_id': rng.integers(1, 9, merchants),
+    }).to_csv(data_dir / 'merchant.csv', index=False)
+
+    rows = []
+    for merchant_id in ids:
+        for j in range(rng.integers(3, 9)):
+            rows.append({
+                'item_id': len(rows),
+                'cuisine_tag': rng.choice(CUISINES),
+                'item_name': f"{WORDS[rng.integers(len(WORDS))]} special {j}",
+                'item_price': round(float(rng.uniform(3, 30)), 2),
+                'merchant_id': merchant_id,
+            })
+    items = pd.DataFrame(rows)
+    items.to_csv(data_dir / 'items.csv', index=False)
+
+    transactions, trans_items = make_orders(rng, items, ids[:-1], orders, '2023-01-01', days)
+    transactions.to_csv(data_dir / 'transaction_data.csv', index=False)
+    trans_items.to_csv(data_dir / 'transaction_items.csv', index=False)
+
+    keywords = [f'{word} {suffix}' for word in WORDS for suffix in ['delivery', 'near me', 'cheap', 'best', 'promo', 'spicy']]
+    pd.DataFrame({
+        'keyword': keywords,
+        'view': rng.integers(100, 10000, len(keywords)),
+        'menu': rng.integers(10, 1000, len(keywords)),
+        'checkout': rng.integers(1, 500, len(keywords)),
+        'order': rng.integers(1, 400, len(keywords)),
+    }).to_csv(data_dir / 'keywords.csv')
+
+def new_orders(data_dir, merchant_ids, count, start, days=1, seed=1):
+    """Orders to append with ingest.append_orders, numbered after the existing ones"""
+    data_dir = Path(data_dir)
+    items = pd.read_csv(data_dir / 'items.csv')
+    existing = len(pd.read_csv(data_dir / 'transaction_data.csv', usecols=['order_id']))
+    return make_orders(np.random.default_rng(seed), items, merchant_ids, count, start, days, existing)
+
+
+class FakeEncoder:
+    """Deterministic SentenceTransformer stand-in: texts with the same first word get the same vector"""
+
+    def __init__(self, model_name=None, dim=16):
+        self.dim = dim
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        vectors = []
+        for text in texts:
+            word = text.lower().split()[0] if text.strip() else ''
+            seed = int(hashlib.md5(word.encode('utf-8')).hexdigest()[:8], 16)
+            vectors.append(np.random.default_rng(seed).standard_normal(self.dim))
+        return np.array(vectors, dtype=np.float32).reshape(-1, self.dim)
+
+
+def fake_gateway(backend=None, **limits):
+    """A gateway over FakeBackend whose limits never get in the way unless given"""
+    options = dict(rate=1000, burst=1000, merchant_rate=1000, merchant_burst=1000, backoff_base=0)
+    options.update(limits)
+    return LLMGateway(backend or FakeBackend(), **options)
+
+
+class SyntheticDataMixin:
+    """Runs each test in a temporary working directory with synthetic data in data/datasets/
+
+    The data paths are relative to the working directory, so everything the
+    code under test writes (snapshot, embeddings, index) stays in it too.
+    """
+
+    merchants = 6
+    orders = 400
+    days = 21
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        self.addCleanup(os.chdir, cwd)
+        self.tmp = Path(tmp)
+        self.data_dir = Path('data/datasets')
+        self.snapshot_dir = Path('data/snapshot')
+        write_datasets(self.data_dir, self.merchants, self.orders, self.days)
+        self.merchant_ids = merchant_ids(self.merchants)
+
+    def registry(self, hot_days=7):
+        return DatasetRegistry(self.data_dir, self.snapshot_dir, hot_days)
+
+    def serve(self, gateway=None, hot_days=7):
+        """Point the views at this test's data, a fresh precompute store, LLM cache and
+        chat store, the fake encoder and, when given, an LLM gateway
+
+        Returns the registry the views now read from.
+        """
+        from api import views
+        from api.utils.precompute_store import PrecomputeStore
+
+        registry = self.registry(hot_days)
+        stack = ExitStack()
+        self.addCleanup(stack.close)
+        stack.enter_context(mock.patch.object(views, 'datasets', registry))
+        stack.enter_context(mock.patch.object(views, 'precomputed', PrecomputeStore(self.tmp / 'precomputed.sqlite3')))
+        stack.enter_context(mock.patch.object(views, 'load_sentence_transformer', FakeEncoder))
+        stack.enter_context(mock.patch.object(views, 'llm_cache', LLMResponseCache(InProcessBackend())))
+        stack.enter_context(mock.patch.object(views, 'chat_store', ChatSessionStore(InProcessSessionBackend())))
+        if gateway is not None:
+            stack.enter_context(mock.patch.object(views, 'llm_gateway', gateway))
+        return registry
+
+
+def assert_close(test, actual, expected, places=6):
+    """assertEqual for nested JSON-like values, with floats compared to `places` decimals"""
+    if isinstance(expected, dict):
+        test.assertEqual(set(actual), set(expected))
+        for key in expected:
+            assert_close(test, actual[key], expected[key], places)
+    elif isinstance(expected, (list, tuple)):
+        test.assertEqual(len(actual), len(expected))
+        for a, e in zip(actual, expected):
+            assert_close(test, a, e, places)
+    elif isinstance(expected, (float, np.floating)) and np.isnan(expected):
+        test.assertTrue(np.isnan(actual))
+    elif isinstance(expected, (float, np.floating)):
+        test.assertAlmostEqual(float(actual), float(expected), places)
+    else:
+        test.assertEqual(actual, expected)
+
+def as_json(value):
+    """value as a JSON response body would carry it (string keys, plain numbers)"""
+    return json.loads(json.dumps(value, cls=JSONEncoder))
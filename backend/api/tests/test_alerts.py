@@ -0,0 +1,77 @@
+import io
+
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api import views
+from api.utils.alerts import compute_fleet_alerts
+from api.utils.anomalies import write_anomalies
+from assistant.models import Anomaly, SellerProfile
+from . import reference
+from .support import SyntheticDataMixin
+
+TIME_COLUMNS = ['order_time', 'driver_arrival_time', 'driver_pickup_time', 'delivery_time']
+
+
+class FleetAlertTests(SyntheticDataMixin, SimpleTestCase):
+    def test_fleet_pass_matches_per_merchant_alerts(self):
+        self.serve()
+        current = views.current_data()
+        frames = reference.read_frames(self.data_dir)
+        summaries = dict(compute_fleet_alerts(current.hot.latest_frame(), current.merchant_index.key))
+        self.assertEqual(sorted(summaries), self.merchant_ids[:-1])
+
+        for merchant_id in self.merchant_ids[:-1]:
+            with self.subTest(merchant_id=merchant_id):
+                data = reference.get_merchant_data(frames, merchant_id)
+                for col in TIME_COLUMNS:
+                    data[col] = pd.to_datetime(data[col])
+                _, result = views.alert_payload(merchant_id, summaries[merchant_id])
+                self.assertEqual(result, reference.merchant_alerts(merchant_id, data))
+
+
+class AnomalyRecordTests(SyntheticDataMixin, TestCase):
+    def seller(self, name, merchant_id=None):
+        user = User.objects.create(username=name)
+        return SellerProfile.objects.create(user=user, shop_name=name, merchant_id=merchant_id)
+
+    def slow_down_drivers(self, merchant_id):
+        """Make every driver of the merchant's latest day arrive 40 minutes after the order"""
+        path = self.data_dir / 'transaction_data.csv'
+        transactions = pd.read_csv(path)
+        order_time = pd.to_datetime(transactions['order_time'])
+        mine = transactions['merchant_id'] == merchant_id
+        latest = mine & (order_time.dt.normalize() == order_time[mine].max().normalize())
+        shift = order_time + pd.Timedelta(minutes=40) - pd.to_datetime(transactions['driver_arrival_time'])
+        for col in ['driver_arrival_time', 'driver_pickup_time', 'delivery_time']:
+            shifted = pd.to_datetime(transactions[col]) + shift
+            transactions.loc[latest, col] = shifted[latest].dt.strftime('%Y-%m-%d %H:%M:%S')
+        transactions.to_csv(path, index=False)
+
+    def test_records_go_to_the_seller_with_that_merchant_id(self):
+        seller = self.seller('first', self.merchant_ids[0])
+        self.seller('unlinked')
+        records = [
+            (self.merchant_ids[0], 'order_issue', 'high', 'Slow pickups.'),
+            (self.merchant_ids[1], 'order_issue', 'low', 'No seller for this one.'),
+        ]
+        self.assertEqual(write_anomalies(records), 1)
+        self.assertEqual(list(Anomaly.objects.values_list('seller', 'description')), [(seller.id, 'Slow pickups.')])
+        # Still unresolved, so not recorded twice
+        self.assertEqual(write_anomalies(records), 0)
+
+    def test_run_alerts_records_bottlenecks(self):
+        merchant_id = self.merchant_ids[2]
+        seller = self.seller('slow', merchant_id)
+        self.slow_down_drivers(merchant_id)
+        self.serve()
+        with override_settings(PRECOMPUTE_STORE_PATH=self.tmp / 'alerts.sqlite3'):
+            call_command('run_alerts', stdout=io.StringIO())
+
+        anomalies = Anomaly.objects.filter(seller=seller)
+        self.assertEqual(anomalies.count(), 1)
+        self.assertEqual(anomalies[0].type, 'order_issue')
+        self.assertIn('arrival delay', anomalies[0].description)
+        self.assertEqual(Anomaly.objects.count(), 1)
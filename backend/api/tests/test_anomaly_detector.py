@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from api.utils.anomaly_detector import EWMA, AnomalyDetector, load_detector, save_detector
+from .support import SyntheticDataMixin
+
+
+def hourly_orders(merchant_id, start, days, stop_at=None):
+    """Orders with a daily cycle: busy lunches, steady afternoons, nothing at night"""
+    rows = []
+    for day in range(days):
+        for hour in range(8, 22):
+            at = pd.Timestamp(start) + pd.Timedelta(days=day, hours=hour)
+            if stop_at is not None and at >= pd.Timestamp(stop_at):
+                return rows
+            # One more order every other day, for a little variance
+            count = (6 if 11 <= hour <= 13 else 1) + (at.day + hour) % 2
+            for i in range(count):
+                order_time = at + pd.Timedelta(minutes=5 * i)
+                rows.append({
+                    'order_time': order_time,
+                    'driver_arrival_time': order_time + pd.Timedelta(minutes=5),
+                    'driver_pickup_time': order_time + pd.Timedelta(minutes=10),
+                    'delivery_time': order_time + pd.Timedelta(minutes=30),
+                    'order_value': 10.0,
+                    'merchant_id': merchant_id,
+                })
+    return rows
+
+
+def frame(*rows):
+    return pd.DataFrame([row for part in rows for row in part]).sort_values('order_time', kind='stable')
+
+
+class EWMATests(SimpleTestCase):
+    def test_mean_matches_pandas(self):
+        values = np.random.default_rng(0).normal(10, 2, 200)
+        stat = EWMA()
+        for value in values:
+            stat.update(value, 0.1)
+        expected = pd.Series(values).ewm(alpha=0.1, adjust=False).mean().iloc[-1]
+        self.assertAlmostEqual(stat.mean, expected)
+        self.assertEqual(stat.count, 200)
+        self.assertGreater(stat.var, 0)
+
+
+class AnomalyDetectorTests(SyntheticDataMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.detector = AnomalyDetector(alpha=0.1, threshold=3.0, min_days=7)
+
+    def warm_up(self, days=14):
+        history = frame(*(hourly_orders(m, '2023-01-01', days) for m in ['m1', 'm2']))
+        return self.detector.process(history)
+
+    def test_daily_cycle_is_not_an_anomaly(self):
+        self.assertEqual(self.warm_up(), [])
+        # Every hour since each merchant's first order is part of its series, nights included
+        stats = self.detector.merchants['m1'].stats['orders']
+        self.assertEqual(stats[3].count, 13)
+        self.assertEqual(stats[3].mean, 0)
+        self.assertEqual(self.detector.process(frame(*(hourly_orders(m, '2023-01-15', 1) for m in ['m1', 'm2']))), [])
+
+    def test_orders_stopping_is_a_sales_drop(self):
+        self.warm_up()
+        day = frame(
+            hourly_orders('m1', '2023-01-15', 1, stop_at='2023-01-15 11:00'),
+            hourly_orders('m2', '2023-01-15', 1),
+        )
+        anomalies = self.detector.process(day)
+        self.assertTrue(anomalies)
+        self.assertEqual({merchant_id for merchant_id, *_ in anomalies}, {'m1'})
+        self.assertEqual({anomaly_type for _, anomaly_type, *_ in anomalies}, {'sales_drop'})
+        self.assertTrue(any('2023-01-15 11:00' in description for *_, description in anomalies))
+
+    def test_slow_deliveries_are_an_order_issue(self):
+        self.warm_up()
+        day = frame(*(hourly_orders(m, '2023-01-15', 1) for m in ['m1', 'm2']))
+        late = (day['merchant_id'] == 'm2') & (day['order_time'].dt.hour == 12)
+        day.loc[late, 'delivery_time'] += pd.Timedelta(minutes=60)
+        anomalies = self.detector.process(day)
+        self.assertEqual([(m, t) for m, t, *_ in anomalies], [('m2', 'order_issue')])
+        self.assertIn('delivery delay', anomalies[0][3])
+
+    def test_orders_for_closed_hours_are_counted_late(self):
+        self.warm_up(days=2)
+        stale = frame(hourly_orders('m1', '2023-01-01', 1))
+        self.detector.process(stale)
+        self.assertEqual(self.detector.late, len(stale))
+
+    def test_state_round_trips(self):
+        self.warm_up(days=2)
+        path = self.tmp / 'detector.pickle'
+        save_detector(path, self.detector, {'stamps': 1})
+        detector, sources = load_detector(path)
+        self.assertEqual(sources, {'stamps': 1})
+        self.assertEqual(detector.clock, self.detector.clock)
+        self.assertEqual(detector.merchants['m1'].stats['orders'][12].mean, self.detector.merchants['m1'].stats['orders'][12].mean)
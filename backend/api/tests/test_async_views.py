@@ -0,0 +1,52 @@
+import asyncio
+import os
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import async_views
+from api.utils.llm_gateway import FakeBackend
+from .support import SyntheticDataMixin, fake_gateway
+
+
+@mock.patch.dict(os.environ, {'GEMINI_API_KEY': 'test-key'})
+class AsyncViewTests(SyntheticDataMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.backend = FakeBackend()
+        self.serve(gateway=fake_gateway(self.backend))
+        self.merchant_id = self.merchant_ids[0]
+
+    async def test_llm_endpoints_match_the_sync_views(self):
+        for path in ['recommendations/', 'alerts/', 'realtime-recommendations']:
+            with self.subTest(path=path):
+                sync = await self.async_client.get(f'/api/merchant/{self.merchant_id}/{path}')
+                self.assertEqual(sync.status_code, 200)
+                response = await self.async_client.get(f'/api/async/merchant/{self.merchant_id}/{path.rstrip("/")}/')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), sync.json())
+
+    async def test_full_queue_answers_without_queueing(self):
+        with mock.patch.object(async_views, 'llm_slots', asyncio.BoundedSemaphore(1)) as slots:
+            await slots.acquire()
+            response = await self.async_client.get(f'/api/async/merchant/{self.merchant_id}/recommendations/')
+        self.assertTrue(response.json()['fallback'])
+        self.assertEqual(self.backend.prompts, [])
+
+    async def test_unknown_merchant_is_404(self):
+        response = await self.async_client.get('/api/async/merchant/nobody/alerts/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.backend.prompts, [])
+
+    async def test_ask_gemini(self):
+        response = await self.async_client.post(
+            '/api/async/ask-gemini/', {'merchant_id': self.merchant_id, 'query': 'How am I doing?'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['turn'], 0)
+        self.assertEqual(self.backend.prompts, ['How am I doing?'])
+
+    async def test_ask_gemini_needs_query_and_merchant(self):
+        response = await self.async_client.post('/api/async/ask-gemini/', {'merchant_id': self.merchant_id}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
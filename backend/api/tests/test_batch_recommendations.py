@@ -0,0 +1,106 @@
+import io
+import json
+import re
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from api import views
+from api.utils.batch_recommendations import BatchGenerator, batch_prompt, pack_batches, split_reply
+from api.utils.chat_store import estimate_tokens
+from api.utils.llm_gateway import FakeBackend
+from api.utils.precompute_store import PrecomputeStore
+from .support import SyntheticDataMixin, fake_gateway
+
+RECOMMENDATION = {'title': 'Bundle', 'rationale': 'Sells well', 'action_steps': ['Add a combo'], 'expected_impact': 'More orders'}
+
+
+def reply_for(skip=()):
+    """A model stand-in answering for every merchant in the prompt except skip"""
+    def reply(prompt):
+        merchant_ids = re.findall(r'--- MERCHANT (\S+) ---', prompt)
+        return json.dumps([
+            {'merchant_id': m, 'recommendations': [dict(RECOMMENDATION, title=f'Bundle for {m}')]}
+            for m in merchant_ids if m not in skip
+        ])
+    return reply
+
+
+class PackingTests(SimpleTestCase):
+    def test_batches_stay_within_the_budget(self):
+        summaries = {f'm{i}': 'word ' * 200 for i in range(10)}
+        budget = estimate_tokens(batch_prompt({'m0': summaries['m0'], 'm1': summaries['m1']})) + 10
+        batches = pack_batches(summaries, budget, max_merchants=20)
+        self.assertEqual([m for batch in batches for m in batch], list(summaries))
+        for batch in batches:
+            self.assertLessEqual(estimate_tokens(batch_prompt({m: summaries[m] for m in batch})), budget)
+        self.assertEqual(len(batches), 5)
+
+    def test_merchant_cap_and_oversized_blocks(self):
+        summaries = {'big': 'word ' * 5000, 'a': 'x', 'b': 'y', 'c': 'z'}
+        self.assertEqual(pack_batches(summaries, 2000, max_merchants=2), [['big'], ['a', 'b'], ['c']])
+
+    def test_split_reply(self):
+        text = '```json\n' + reply_for()(batch_prompt({'m1': 's', 'm2': 's'})) + '\n```'
+        self.assertEqual(sorted(split_reply(text, ['m1', 'm2'])), ['m1', 'm2'])
+        self.assertEqual(list(split_reply(text, ['m1'])), ['m1'])
+        self.assertEqual(split_reply('not json', ['m1']), {})
+        invalid = json.dumps([{'merchant_id': 'm1', 'recommendations': [{'title': 'No steps'}]}])
+        self.assertEqual(split_reply(invalid, ['m1']), {})
+
+
+class BatchGeneratorTests(SimpleTestCase):
+    def summaries(self, count):
+        return {f'm{i}': f'Revenue {i}' for i in range(count)}
+
+    def test_one_request_per_batch(self):
+        backend = FakeBackend(reply=reply_for())
+        results, failed = BatchGenerator(fake_gateway(backend), max_merchants=4).generate(self.summaries(10))
+        self.assertEqual(sorted(results), sorted(self.summaries(10)))
+        self.assertEqual(results['m3'][0]['title'], 'Bundle for m3')
+        self.assertEqual(failed, {})
+        self.assertEqual(len(backend.prompts), 3)
+
+    def test_missing_merchants_are_retried_in_smaller_batches(self):
+        backend = FakeBackend(reply=reply_for(skip={'m2'}))
+        generator = BatchGenerator(fake_gateway(backend), max_merchants=4, attempts=3)
+        results, failed = generator.generate(self.summaries(4))
+        self.assertEqual(sorted(results), ['m0', 'm1', 'm3'])
+        self.assertEqual(failed, {'m2': 'Missing or invalid in the reply'})
+        # 4 merchants, then m2 in a batch of 2 and of 1
+        self.assertEqual(generator.calls, 3)
+
+    def test_an_error_fails_only_its_batch(self):
+        backend = FakeBackend(reply=reply_for())
+        backend.fail_next(1, ValueError('Invalid argument'))
+        on_batch = []
+        generator = BatchGenerator(fake_gateway(backend, max_retries=0), max_merchants=2, attempts=1)
+        results, failed = generator.generate(self.summaries(4), on_batch=on_batch.append)
+        self.assertEqual(failed, {'m0': 'Invalid argument', 'm1': 'Invalid argument'})
+        self.assertEqual(sorted(results), ['m2', 'm3'])
+        self.assertEqual(on_batch, [results])
+
+    def test_failed_batches_get_another_round(self):
+        backend = FakeBackend(reply=reply_for())
+        backend.fail_next(1, ValueError('Invalid argument'))
+        results, failed = BatchGenerator(fake_gateway(backend, max_retries=0), max_merchants=2, attempts=2).generate(self.summaries(4))
+        self.assertEqual(len(results), 4)
+        self.assertEqual(failed, {})
+
+
+class GenerateRecommendationsCommandTests(SyntheticDataMixin, SimpleTestCase):
+    def test_stores_recommendations_the_endpoint_serves(self):
+        backend = FakeBackend(reply=reply_for())
+        self.serve(gateway=fake_gateway(backend))
+        path = self.tmp / 'precomputed.sqlite3'
+        with override_settings(PRECOMPUTE_STORE_PATH=path):
+            call_command('generate_recommendations', stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(len(backend.prompts), 1)
+        # The merchant without orders has nothing to summarise
+        last = self.merchant_ids[-1]
+        self.assertIsNone(PrecomputeStore(path).get(last, 'recommendations', views.data_version(last)))
+
+        merchant_id = self.merchant_ids[0]
+        response = self.client.get(f'/api/merchant/{merchant_id}/recommendations/').json()
+        self.assertEqual(response['recommendations'][0]['title'], f'Bundle for {merchant_id}')
+        self.assertEqual(len(backend.prompts), 1)
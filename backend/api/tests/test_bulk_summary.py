@@ -0,0 +1,59 @@
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import views
+from . import reference
+from .support import SyntheticDataMixin, as_json, assert_close
+
+
+class BulkSummaryTests(SyntheticDataMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.serve()
+
+    def post(self, merchant_ids):
+        return self.client.post('/api/merchants/summary/', {'merchant_ids': merchant_ids}, content_type='application/json')
+
+    def lines(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_lines_match_the_per_merchant_summary(self):
+        frames = reference.read_frames(self.data_dir)
+        wanted = [self.merchant_ids[2], self.merchant_ids[0], 'nobody']
+        rows = self.lines(self.post(wanted))
+
+        self.assertEqual([row['merchant_id'] for row in rows], wanted)
+        for row in rows[:2]:
+            merchant_id = row.pop('merchant_id')
+            expected = reference.merchant_metrics(reference.get_merchant_data(frames, merchant_id))
+            assert_close(self, row, as_json(expected))
+        self.assertEqual(rows[2]['error'], 'No data found for this merchant')
+
+    def test_all_merchants(self):
+        rows = self.lines(self.post('all'))
+        self.assertEqual({row['merchant_id'] for row in rows}, set(self.merchant_ids[:-1]))
+
+    def test_rejects_anything_but_id_strings(self):
+        for merchant_ids in [None, [], 'some', [1, 2], ['m000', None], {'id': 'm000'}]:
+            with self.subTest(merchant_ids=merchant_ids):
+                self.assertEqual(self.post(merchant_ids).status_code, 400)
+
+    def test_a_failing_merchant_does_not_end_the_stream(self):
+        get = views.FleetMetrics.get
+
+        def flaky(fleet, merchant_id):
+            if merchant_id == self.merchant_ids[0]:
+                raise ValueError('broken rollup')
+            return get(fleet, merchant_id)
+        with mock.patch.object(views.FleetMetrics, 'get', flaky):
+            rows = self.lines(self.post(self.merchant_ids[:2]))
+        self.assertEqual(rows[0], {'merchant_id': self.merchant_ids[0], 'error': 'broken rollup'})
+        self.assertIn('total_revenue', rows[1])
+
+    def test_a_failed_grouped_pass_is_reported_for_each_merchant(self):
+        with mock.patch.object(views, 'FleetMetrics', side_effect=MemoryError('out of memory')):
+            rows = self.lines(self.post(self.merchant_ids[:2]))
+        self.assertEqual(rows, [{'merchant_id': m, 'error': 'out of memory'} for m in self.merchant_ids[:2]])
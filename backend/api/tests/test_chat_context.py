@@ -0,0 +1,52 @@
+import os
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import views
+from api.utils.llm_gateway import FakeBackend
+from .support import SyntheticDataMixin, fake_gateway
+
+
+@mock.patch.dict(os.environ, {'GEMINI_API_KEY': 'test-key'})
+class ChatContextTests(SyntheticDataMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.backend = FakeBackend(reply=lambda prompt: 'ok')
+        self.gateway = fake_gateway(self.backend)
+        self.serve(gateway=self.gateway)
+        self.merchant_id = self.merchant_ids[0]
+
+    def ask(self, query, lang='en'):
+        return self.client.post('/api/ask-gemini/', {'merchant_id': self.merchant_id, 'query': query, 'lang': lang}, content_type='application/json')
+
+    def test_stats_go_in_the_system_instruction_once_per_version(self):
+        with mock.patch.object(self.gateway, 'start_chat', wraps=self.gateway.start_chat) as start_chat, \
+                mock.patch.object(views, 'get_merchant_metrics', wraps=views.get_merchant_metrics) as metrics:
+            self.ask('first question')
+            self.ask('second question')
+
+        instructions = [call.args[0] for call in start_chat.call_args_list]
+        self.assertEqual(instructions[0], instructions[1])
+        self.assertIn(f"Merchant ID: {self.merchant_id}.", instructions[0])
+        self.assertIn("Total revenue: RM", instructions[0])
+        self.assertEqual(metrics.call_count, 1)
+        # Each turn sends only the question; earlier turns travel as history
+        self.assertEqual(self.backend.prompts, ['first question', 'second question'])
+        self.assertEqual(len(start_chat.call_args_list[1].args[1]), 2)
+
+    def test_language_and_version_change_the_instruction(self):
+        english = views.chat_system_instruction(self.merchant_id, 'en', views.data_version(self.merchant_id))
+        malay = views.chat_system_instruction(self.merchant_id, 'ms', views.data_version(self.merchant_id))
+        self.assertTrue(malay.startswith('Anda ialah'))
+        self.assertNotEqual(english, malay)
+
+        # New data for the merchant means a new version, so the instruction is built again
+        with mock.patch.object(views, 'get_merchant_metrics', wraps=views.get_merchant_metrics) as metrics:
+            views.chat_system_instruction(self.merchant_id, 'en', 'newer data')
+        self.assertEqual(metrics.call_count, 1)
+
+    def test_merchant_without_data_is_404(self):
+        response = self.client.post('/api/ask-gemini/', {'merchant_id': 'nobody', 'query': 'hi'}, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.backend.prompts, [])
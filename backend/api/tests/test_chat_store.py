@@ -0,0 +1,89 @@
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api.utils.chat_store import (
+    ChatSessionStore, ChatState, InProcessSessionBackend, SQLiteSessionBackend, build_chat_store,
+)
+
+
+def summarize(summary, messages):
+    return f"{summary}+{len(messages)}"
+
+
+class ChatStateTests(SimpleTestCase):
+    def test_compacts_old_turns_into_the_summary(self):
+        state = ChatState()
+        for i in range(6):
+            state.append(f"question {i} " * 20, f"answer {i} " * 20)
+
+        self.assertTrue(state.compact(summarize, token_budget=100, keep_turns=2))
+        self.assertEqual(state.summary, '+8')
+        self.assertEqual([m['turn'] for m in state.messages], [4, 4, 5, 5])
+        self.assertEqual(state.turns, 6)
+        self.assertEqual(state.contents()[0]['parts'], ["Summary of our conversation so far: +8"])
+
+    def test_within_budget_is_kept(self):
+        state = ChatState()
+        state.append('hi', 'hello')
+        self.assertFalse(state.compact(summarize, token_budget=100, keep_turns=0))
+        self.assertEqual(len(state.messages), 2)
+
+    def test_failed_summary_still_drops_old_turns(self):
+        state = ChatState()
+        for i in range(4):
+            state.append('q ' * 50, 'a ' * 50)
+
+        def failing(summary, messages):
+            raise RuntimeError('model down')
+        self.assertTrue(state.compact(failing, token_budget=10, keep_turns=1))
+        self.assertEqual(len(state.messages), 2)
+
+
+class SessionBackendTests(SimpleTestCase):
+    def test_in_process_lru_and_size_bounds(self):
+        backend = InProcessSessionBackend(max_sessions=2, max_bytes=100)
+        backend.set('a', 'x' * 10)
+        backend.set('b', 'x' * 10)
+        backend.get('a')
+        backend.set('c', 'x' * 10)
+        self.assertIsNone(backend.get('b'))
+        self.assertIsNotNone(backend.get('a'))
+
+        backend.set('d', 'x' * 95)
+        self.assertEqual(list(backend._sessions), ['d'])
+
+    def test_in_process_idle_timeout(self):
+        backend = InProcessSessionBackend(idle_timeout=60)
+        backend.set('a', 'state')
+        with mock.patch('api.utils.chat_store.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(backend.get('a'))
+
+    def test_sqlite_sessions_live_in_their_own_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'chat' / 'sessions.sqlite3'
+            store = ChatSessionStore(SQLiteSessionBackend(path, max_sessions=2))
+            for merchant_id in ['m1', 'm2', 'm3']:
+                state = store.load(merchant_id)
+                state.append('hi', f'hello {merchant_id}')
+                store.save(merchant_id, state, summarize)
+
+            # A second worker (or a restart) sees the same sessions
+            other = ChatSessionStore(SQLiteSessionBackend(path, max_sessions=2))
+            self.assertEqual(other.load('m3').messages[1]['text'], 'hello m3')
+            self.assertEqual(other.load('m1').messages, [])
+            with closing(sqlite3.connect(path)) as conn:
+                tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+            self.assertEqual(tables, ['sessions'])
+
+    def test_sqlite_store_defaults_outside_the_django_database(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            settings = SimpleNamespace(CHAT_STORE_BACKEND='sqlite', BASE_DIR=Path(tmp), DATABASES={'default': {'NAME': Path(tmp) / 'db.sqlite3'}})
+            store = build_chat_store(settings)
+            self.assertEqual(Path(store.backend.path), Path(tmp) / 'data' / 'chat_sessions.sqlite3')
@@ -0,0 +1,61 @@
+import json
+import os
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import views
+from api.utils.llm_gateway import FakeBackend, FakeResponse
+from .support import SyntheticDataMixin, fake_gateway
+
+
+def parse_events(body):
+    """[(event, data)] from a Server-Sent Events body"""
+    events = []
+    for block in body.decode('utf-8').strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((fields.get('event', 'message'), json.loads(fields['data'])))
+    return events
+
+
+@mock.patch.dict(os.environ, {'GEMINI_API_KEY': 'test-key'})
+class ChatStreamTests(SyntheticDataMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.backend = FakeBackend(reply=lambda prompt: f"Here is a long answer to: {prompt}")
+        self.serve(gateway=fake_gateway(self.backend))
+        self.merchant_id = self.merchant_ids[0]
+
+    def ask(self, query, path='/api/ask-gemini/stream/'):
+        return self.client.post(
+            path, {'merchant_id': self.merchant_id, 'query': query},
+            content_type='application/json', HTTP_ACCEPT='text/event-stream',
+        )
+
+    def test_streams_chunks_then_done(self):
+        response = self.ask('How are sales?')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['X-Accel-Buffering'], 'no')
+
+        events = parse_events(b''.join(response.streaming_content))
+        chunks = [data['text'] for event, data in events if event == 'message']
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), 'Here is a long answer to: How are sales?')
+        self.assertEqual(events[-1], ('done', {'response': ''.join(chunks), 'turn': 0}))
+
+    def test_error_mid_stream_is_an_error_event(self):
+        def broken(text):
+            raise RuntimeError('store unavailable')
+        chunks = [FakeResponse('Hello')]
+        events = parse_events(''.join(views.stream_chat_events(chunks, broken)).encode('utf-8'))
+        self.assertEqual(events, [('message', {'text': 'Hello'}), ('error', {'error': 'store unavailable'})])
+
+    def test_history_is_paginated_newest_first(self):
+        for i in range(12):
+            self.client.post('/api/ask-gemini/', {'merchant_id': self.merchant_id, 'query': f'question {i}'}, content_type='application/json')
+
+        page = self.client.get(f'/api/merchant/{self.merchant_id}/chat-history/?page_size=5').json()
+        self.assertIsNotNone(page['next'])
+        self.assertEqual([m['role'] for m in page['results'][:2]], ['model', 'user'])
+        self.assertEqual(page['results'][1]['text'], 'question 11')
+        self.assertEqual(page['count'], len(views.chat_store.load(self.merchant_id).messages))
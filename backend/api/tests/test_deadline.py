@@ -0,0 +1,61 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from api import views
+from api.utils.llm_gateway import FakeBackend
+from .support import SyntheticDataMixin, fake_gateway
+
+
+class DeadlineTests(SyntheticDataMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.backend = FakeBackend()
+        self.serve(gateway=fake_gateway(self.backend))
+
+    def get(self, path):
+        return self.client.get(f'/api/merchant/{self.merchant_ids[0]}/{path}/').json()
+
+    def test_answers_with_the_model_in_time(self):
+        self.assertNotIn('fallback', self.get('recommendations'))
+        self.assertNotIn('fallback', self.get('alerts'))
+
+    @override_settings(LLM_DEADLINE=0.05)
+    def test_slow_model_gets_the_rule_based_answer(self):
+        self.backend.latency = 0.5
+        started = time.monotonic()
+        response = self.get('recommendations')
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertTrue(response['fallback'])
+        self.assertTrue(response['recommendations'])
+
+    def test_failed_call_gets_the_rule_based_answer(self):
+        self.backend.fail_next(10)
+        with mock.patch.object(views, 'llm_gateway', fake_gateway(self.backend, max_retries=0)):
+            response = self.get('alerts')
+        self.assertTrue(response['fallback'])
+        self.assertTrue(response['gemini_insights'])
+
+    def test_full_queue_answers_without_queueing(self):
+        with mock.patch.object(views, 'llm_slots', threading.BoundedSemaphore(1)) as slots:
+            slots.acquire()
+            response = self.get('recommendations')
+        self.assertTrue(response['fallback'])
+        self.assertEqual(self.backend.prompts, [])
+
+    @override_settings(LLM_DEADLINE=0.05)
+    def test_calls_queued_past_their_deadline_are_skipped(self):
+        release = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        # The only worker is busy until after the request's deadline
+        executor.submit(release.wait, 5)
+        with mock.patch.object(views, 'llm_executor', executor):
+            response = self.get('recommendations')
+            release.set()
+            executor.shutdown(wait=True)
+        self.assertTrue(response['fallback'])
+        self.assertEqual(self.backend.prompts, [])
@@ -0,0 +1,83 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from api.utils.embedding_cache import EmbeddingStore
+from .support import FakeEncoder, SyntheticDataMixin
+
+
+class EmbeddingStoreTests(SyntheticDataMixin, SimpleTestCase):
+    def store(self):
+        self.encoders = getattr(self, 'encoders', [])
+
+        def load(model_name):
+            encoder = FakeEncoder(model_name)
+            self.encoders.append(encoder)
+            return encoder
+        return EmbeddingStore(self.tmp / 'embeddings', 'test-model', load)
+
+    def test_returns_the_model_embeddings_in_input_order(self):
+        texts = ['pizza special', 'burger combo', 'pizza special', 'taco']
+        np.testing.assert_array_equal(self.store().encode(texts), FakeEncoder().encode(texts))
+
+    def test_only_missing_texts_are_encoded(self):
+        store = self.store()
+        store.encode(['pizza special', 'burger combo'])
+        store.encode(['burger combo', 'taco'])
+        self.assertEqual(self.encoders[0].encoded, ['pizza special', 'burger combo', 'taco'])
+
+    def test_restart_reads_the_cache_without_loading_the_model(self):
+        texts = ['pizza special', 'burger combo']
+        first = self.store().encode(texts)
+
+        second = self.store()
+        np.testing.assert_array_equal(second.encode(texts), first)
+        self.assertEqual(len(self.encoders), 1)
+
+    def test_workers_pick_up_each_others_shards(self):
+        one, two = self.store(), self.store()
+        one.encode(['pizza special'])
+        two.encode(['pizza special', 'taco'])
+        self.assertEqual(self.encoders[1].encoded, ['taco'])
+
+    def test_fingerprint_depends_on_texts_and_model(self):
+        store = self.store()
+        other = EmbeddingStore(self.tmp / 'embeddings', 'other-model', FakeEncoder)
+        self.assertEqual(store.fingerprint(['a', 'b']), store.fingerprint(['a', 'b']))
+        self.assertNotEqual(store.fingerprint(['a', 'b']), store.fingerprint(['b', 'a']))
+        self.assertNotEqual(store.fingerprint(['a']), other.fingerprint(['a']))
+
+    def test_shards_are_merged_past_the_limit(self):
+        store = EmbeddingStore(self.tmp / 'embeddings', 'test-model', FakeEncoder, max_shards=3)
+        texts = [f'{word} special' for word in ['pizza', 'burger', 'taco', 'curry', 'sushi', 'noodle']]
+        for text in texts:
+            store.encode([text])
+        self.assertLessEqual(len(list(store.dir.glob('shard-*.json'))), 3)
+        self.assertLessEqual(len(store._shards), 3)
+        np.testing.assert_array_equal(store.encode(texts), FakeEncoder().encode(texts))
+
+        # A fresh worker maps the merged files and encodes nothing
+        restarted = self.store()
+        np.testing.assert_array_equal(restarted.encode(texts), FakeEncoder().encode(texts))
+        self.assertEqual(self.encoders, [])
+
+    def test_cached_texts_dont_wait_for_the_model(self):
+        import threading
+        started, release = threading.Event(), threading.Event()
+
+        class SlowEncoder(FakeEncoder):
+            def encode(self, texts):
+                started.set()
+                release.wait(5)
+                return super().encode(texts)
+        store = EmbeddingStore(self.tmp / 'embeddings', 'test-model', SlowEncoder)
+        release.set()
+        store.encode(['pizza special'])
+        release.clear()
+        thread = threading.Thread(target=store.encode, args=(['taco'],))
+        thread.start()
+        started.wait(5)
+        # The model is busy with 'taco', yet a cached text is answered right away
+        np.testing.assert_array_equal(store.encode(['pizza special']), FakeEncoder().encode(['pizza special']))
+        self.assertTrue(thread.is_alive())
+        release.set()
+        thread.join(5)
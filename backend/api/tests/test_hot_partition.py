@@ -0,0 +1,70 @@
+import pandas as pd
+from django.test import SimpleTestCase
+
+from api.utils import ingest
+from api.utils.hot_partition import HotPartition
+from . import reference
+from .support import SyntheticDataMixin, fake_gateway, new_orders
+
+
+def lines(frame):
+    """(order_id, item_id) of every row, sorted, for comparing frames of different dtypes"""
+    return sorted(zip(frame['order_id'].astype(str), frame['item_id'].astype(str)))
+
+
+class HotPartitionTests(SyntheticDataMixin, SimpleTestCase):
+    def test_latest_day_matches_the_full_history(self):
+        datasets = self.registry(hot_days=3).current()
+        frames = reference.read_frames(self.data_dir)
+        for merchant_id in self.merchant_ids[:-1]:
+            with self.subTest(merchant_id=merchant_id):
+                data = reference.get_merchant_data(frames, merchant_id)
+                data['order_time'] = pd.to_datetime(data['order_time'])
+                expected = reference.latest_day(data)
+                self.assertEqual(lines(datasets.hot.get(merchant_id)), lines(expected))
+                self.assertEqual(datasets.hot.latest_date(merchant_id), pd.Timestamp(expected['order_time'].max()).normalize())
+        self.assertNotIn(self.merchant_ids[-1], datasets.hot)
+        self.assertTrue(datasets.hot.get(self.merchant_ids[-1]).empty)
+
+    def test_keeps_only_the_last_days(self):
+        datasets = self.registry(hot_days=3).current()
+        merchant_id = self.merchant_ids[0]
+        latest = datasets.hot.latest_date(merchant_id)
+        history = datasets.merchant_index.get(merchant_id)
+        older = history[history['order_time'].dt.normalize() == latest - pd.Timedelta(days=2)]
+        self.assertEqual(lines(datasets.hot.get(merchant_id, latest - pd.Timedelta(days=2))), lines(older))
+        self.assertTrue(datasets.hot.get(merchant_id, latest - pd.Timedelta(days=3)).empty)
+
+    def test_append_matches_a_rebuild(self):
+        registry = self.registry(hot_days=3)
+        registry.current()
+        transactions, trans_items = new_orders(self.data_dir, self.merchant_ids[:2], 20, '2023-01-23')
+        ingest.append_orders(transactions, trans_items, self.data_dir)
+        registry.reload()
+        appended = registry.current()
+        index = appended.merchant_index
+        rebuilt = HotPartition.build(index.merged, index.key, index.known_merchants, 3)
+
+        for merchant_id in self.merchant_ids[:-1]:
+            with self.subTest(merchant_id=merchant_id):
+                self.assertEqual(appended.hot.latest_date(merchant_id), rebuilt.latest_date(merchant_id))
+                self.assertEqual(lines(appended.hot.get(merchant_id)), lines(rebuilt.get(merchant_id)))
+        self.assertEqual(appended.hot.latest_date(self.merchant_ids[0]), pd.Timestamp('2023-01-23'))
+        # Appended rows share the index's extended categories, so the fleet frame stays categorical
+        latest = appended.hot.latest_frame()
+        for col, dtype in index.dtypes.items():
+            if isinstance(dtype, pd.CategoricalDtype):
+                self.assertIs(appended.hot.get(self.merchant_ids[0])[col].dtype.categories, dtype.categories)
+                self.assertIsInstance(latest[col].dtype, pd.CategoricalDtype)
+
+    def test_alerts_endpoint_reads_the_latest_day(self):
+        self.serve(gateway=fake_gateway(), hot_days=3)
+        frames = reference.read_frames(self.data_dir)
+        merchant_id = self.merchant_ids[1]
+        data = reference.get_merchant_data(frames, merchant_id)
+        for col in ['order_time', 'driver_arrival_time', 'driver_pickup_time', 'delivery_time']:
+            data[col] = pd.to_datetime(data[col])
+        expected = reference.merchant_alerts(merchant_id, data)
+        response = self.client.get(f'/api/merchant/{merchant_id}/alerts/').json()
+        self.assertEqual(response['latest_date'], expected['latest_date'])
+        self.assertEqual(response['inventory_status'], expected['inventory_status'])
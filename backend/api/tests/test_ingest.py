@@ -0,0 +1,73 @@
+import pandas as pd
+from django.test import SimpleTestCase
+
+from api.utils import ingest
+from api.utils.metrics import compute_merchant_metrics
+from . import reference
+from .support import SyntheticDataMixin, assert_close, new_orders
+
+
+class AppendIngestionTests(SyntheticDataMixin, SimpleTestCase):
+    def append(self, merchant_ids, count=30, start='2023-01-22'):
+        transactions, trans_items = new_orders(self.data_dir, merchant_ids, count, start)
+        ingest.append_orders(transactions, trans_items, self.data_dir)
+
+    def test_appended_orders_match_a_full_load(self):
+        registry = self.registry()
+        registry.current()
+        self.append(self.merchant_ids[:2])
+        self.assertTrue(registry.reload())
+        appended = registry.current()
+        # Folded in, not reloaded: the index keeps the history and adds tails
+        self.assertTrue(appended.merchant_index.tails)
+
+        frames = reference.read_frames(self.data_dir)
+        for merchant_id in self.merchant_ids[:-1]:
+            with self.subTest(merchant_id=merchant_id):
+                expected = reference.merchant_metrics(reference.get_merchant_data(frames, merchant_id))
+                actual = compute_merchant_metrics(
+                    appended.merchant_index.get(merchant_id), rollup=appended.daily_rollup.get(merchant_id)
+                )
+                assert_close(self, actual, expected)
+
+    def test_appended_rows_keep_the_loaded_dtypes(self):
+        registry = self.registry()
+        loaded = registry.current().merchant_index.frame.dtypes
+        self.append(self.merchant_ids[:2])
+        registry.reload()
+        self.append(self.merchant_ids[1:3], start='2023-01-23')
+        registry.reload()
+        index = registry.current().merchant_index
+
+        for merchant_id in self.merchant_ids[:3]:
+            rows = index.get(merchant_id)
+            with self.subTest(merchant_id=merchant_id):
+                self.assertEqual(list(rows.columns), list(loaded.index))
+                for col, dtype in loaded.items():
+                    self.assertIs(type(rows[col].dtype), type(dtype), col)
+                    if isinstance(dtype, pd.CategoricalDtype):
+                        # Every merchant reads the one category set extended by the appends
+                        self.assertIs(rows[col].dtype.categories, index.dtypes[col].categories)
+                        self.assertFalse(rows[col].isna().any(), col)
+        self.assertEqual(len(index.merged), len(index.frame) + sum(len(tail) for tail in index.tails.values()))
+
+    def test_merchant_versions_match_a_fresh_load(self):
+        registry = self.registry()
+        before = {m: registry.current().merchant_version(m) for m in self.merchant_ids}
+        self.append(self.merchant_ids[:2])
+        registry.reload()
+        appended = registry.current()
+        fresh = self.registry().current()
+
+        for merchant_id in self.merchant_ids:
+            with self.subTest(merchant_id=merchant_id):
+                self.assertEqual(appended.merchant_version(merchant_id), fresh.merchant_version(merchant_id))
+        self.assertNotEqual(appended.merchant_version(self.merchant_ids[0]), before[self.merchant_ids[0]])
+        # Merchants without new orders keep their version, and the results stored for it
+        self.assertEqual(appended.merchant_version(self.merchant_ids[3]), before[self.merchant_ids[3]])
+
+    def test_rejects_items_of_orders_outside_the_batch(self):
+        transactions, trans_items = new_orders(self.data_dir, self.merchant_ids[:1], 5, '2023-01-22')
+        with self.assertRaises(ValueError):
+            ingest.append_orders(transactions.iloc[1:], trans_items, self.data_dir)
+        self.assertFalse(self.registry().current().merchant_index.tails)
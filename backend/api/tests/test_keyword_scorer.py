@@ -0,0 +1,38 @@
+from django.test import SimpleTestCase
+
+from api import views
+from api.utils.keyword_scorer import KeywordScorer, normalize_rows
+from api.utils.vector_index import FlatIndex
+from . import reference
+from .support import FakeEncoder, SyntheticDataMixin, assert_close
+
+
+class KeywordScorerTests(SyntheticDataMixin, SimpleTestCase):
+    def test_recommendations_match_per_item_scoring(self):
+        self.serve()
+        frames = reference.read_frames(self.data_dir)
+        encode = FakeEncoder().encode
+
+        for merchant_id in self.merchant_ids:
+            with self.subTest(merchant_id=merchant_id):
+                expected = reference.keyword_recommendations(frames, merchant_id, encode, views.cuisine_keywords)
+                assert_close(self, views.compute_keyword_recommendations(merchant_id), expected, places=5)
+
+    def test_batch_matches_one_item_at_a_time(self):
+        frames = reference.read_frames(self.data_dir)
+        encoder = FakeEncoder()
+        keywords = frames['keywords']
+        index = FlatIndex(normalize_rows(encoder.encode(keywords['keyword'].tolist())))
+        scorer = KeywordScorer(keywords, index, views.cuisine_keywords)
+        items = frames['items']
+        embeddings = encoder.encode(items['item_name'].tolist())
+        cuisines = items['cuisine_tag'].tolist()
+
+        batched = scorer.recommend(embeddings, cuisines)
+        one_by_one = [scorer.recommend(embeddings[i:i + 1], cuisines[i:i + 1])[0] for i in range(len(items))]
+        assert_close(self, batched, one_by_one, places=5)
+
+    def test_unknown_merchant_is_404(self):
+        self.serve()
+        response = self.client.get('/api/merchant/nobody/enhanced-keyword-recommendations/')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,39 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import views
+from .support import FakeEncoder, SyntheticDataMixin
+
+
+class LazyLoadingTests(SyntheticDataMixin, SimpleTestCase):
+    def test_data_loads_on_first_use(self):
+        registry = self.serve()
+        self.assertFalse(registry.loaded)
+
+        self.client.get(f'/api/merchant/{self.merchant_ids[0]}/chat-history/')
+        self.assertFalse(registry.loaded)
+
+        self.client.get(f'/api/merchant/{self.merchant_ids[0]}/total-revenue/')
+        self.assertTrue(registry.loaded)
+        self.assertEqual(registry.generation, 1)
+
+    def test_keyword_model_loads_only_for_uncached_texts(self):
+        registry = self.serve()
+        with mock.patch.object(views, 'load_sentence_transformer', wraps=FakeEncoder) as load:
+            views.compute_keyword_recommendations(self.merchant_ids[0])
+            self.assertEqual(load.call_count, 1)
+
+            # A new process (here a fresh build) finds every embedding on disk
+            store, _ = views.build_keyword_search(registry.current())
+            items = registry.current().items
+            store.encode(items.loc[items['merchant_id'] == self.merchant_ids[0], 'item_name'].tolist())
+        self.assertEqual(load.call_count, 1)
+
+    def test_warm_up_loads_data_and_keyword_search(self):
+        registry = self.serve()
+        with mock.patch.object(views.keyword_search, '_build', wraps=views.keyword_search._build) as build:
+            views.warm_up()
+            views.compute_keyword_recommendations(self.merchant_ids[0])
+        self.assertTrue(registry.loaded)
+        self.assertEqual(build.call_count, 1)
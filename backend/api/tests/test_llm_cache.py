@@ -0,0 +1,210 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api.utils.llm_cache import InProcessBackend, LLMResponseCache, SQLiteFlights
+from api.utils.llm_gateway import FakeBackend, LLMUnavailableError
+from .support import SyntheticDataMixin, fake_gateway
+
+
+class Calls:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self):
+        self.count += 1
+        return f"reply {self.count}"
+
+
+class LLMResponseCacheTests(SimpleTestCase):
+    def test_identical_prompts_call_once(self):
+        cache, call = LLMResponseCache(InProcessBackend()), Calls()
+        self.assertEqual(cache.get_or_call('alerts', 'm1', 'prompt', call), 'reply 1')
+        self.assertEqual(cache.get_or_call('alerts', 'm1', 'prompt', call), 'reply 1')
+        self.assertEqual(call.count, 1)
+
+    def test_endpoint_merchant_and_prompt_are_part_of_the_key(self):
+        cache, call = LLMResponseCache(InProcessBackend()), Calls()
+        cache.get_or_call('alerts', 'm1', 'prompt', call)
+        cache.get_or_call('recommendations', 'm1', 'prompt', call)
+        cache.get_or_call('alerts', 'm2', 'prompt', call)
+        cache.get_or_call('alerts', 'm1', 'other prompt', call)
+        self.assertEqual(call.count, 4)
+
+    def test_new_data_version_misses(self):
+        cache, call = LLMResponseCache(InProcessBackend()), Calls()
+        cache.get_or_call('alerts', 'm1', 'prompt', call, 'v1')
+        cache.get_or_call('alerts', 'm2', 'prompt', call, 'v1')
+        self.assertEqual(cache.get_or_call('alerts', 'm1', 'prompt', call, 'v2'), 'reply 3')
+        self.assertEqual(cache.get_or_call('alerts', 'm2', 'prompt', call, 'v1'), 'reply 2')
+
+    def test_entries_expire(self):
+        cache, call = LLMResponseCache(InProcessBackend(), ttl=60), Calls()
+        cache.get_or_call('alerts', 'm1', 'prompt', call)
+        later = time.monotonic() + 61
+        with mock.patch('api.utils.llm_cache.time.monotonic', return_value=later):
+            cache.get_or_call('alerts', 'm1', 'prompt', call)
+        self.assertEqual(call.count, 2)
+
+    def test_lru_bound(self):
+        backend = InProcessBackend(max_entries=2)
+        cache, call = LLMResponseCache(backend), Calls()
+        for prompt in ['a', 'b', 'a', 'c']:
+            cache.get_or_call('alerts', 'm1', prompt, call)
+        self.assertEqual(len(backend._entries), 2)
+        # 'b' was least recently used
+        cache.get_or_call('alerts', 'm1', 'a', call)
+        self.assertEqual(call.count, 3)
+        cache.get_or_call('alerts', 'm1', 'b', call)
+        self.assertEqual(call.count, 4)
+
+    def test_errors_are_not_cached(self):
+        cache, call = LLMResponseCache(InProcessBackend()), Calls()
+
+        def failing():
+            raise RuntimeError('model down')
+        with self.assertRaises(RuntimeError):
+            cache.get_or_call('alerts', 'm1', 'prompt', failing)
+        self.assertEqual(cache.get_or_call('alerts', 'm1', 'prompt', call), 'reply 1')
+
+
+class SingleFlightTests(SyntheticDataMixin, SimpleTestCase):
+    def test_concurrent_misses_make_one_call(self):
+        cache, started, release = LLMResponseCache(InProcessBackend()), threading.Event(), threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'reply'
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_call('alerts', 'm1', 'prompt', slow))) for _ in range(4)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(results, ['reply'] * 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.in_flight._calls, {})
+
+    async def test_cancelled_follower_leaves_the_others_waiting(self):
+        cache, release = LLMResponseCache(InProcessBackend()), asyncio.Event()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await release.wait()
+            return 'reply'
+        leader = asyncio.create_task(cache.aget_or_call('alerts', 'm1', 'prompt', slow))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.aget_or_call('alerts', 'm1', 'prompt', slow))
+        other = asyncio.create_task(cache.aget_or_call('alerts', 'm1', 'prompt', slow))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        await asyncio.sleep(0.01)
+        release.set()
+        self.assertEqual(await leader, 'reply')
+        self.assertEqual(await other, 'reply')
+        self.assertTrue(follower.cancelled())
+        self.assertEqual(len(calls), 1)
+
+    async def test_follower_timeout_does_not_break_the_leader(self):
+        cache, release = LLMResponseCache(InProcessBackend(), wait_timeout=0.01), asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return 'reply'
+        leader = asyncio.create_task(cache.aget_or_call('alerts', 'm1', 'prompt', slow))
+        await asyncio.sleep(0)
+        with self.assertRaises(asyncio.TimeoutError):
+            await cache.aget_or_call('alerts', 'm1', 'prompt', slow)
+        release.set()
+        self.assertEqual(await leader, 'reply')
+
+    async def test_cancelled_leader_releases_the_key(self):
+        cache, release = LLMResponseCache(InProcessBackend()), asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return 'reply'
+        leader = asyncio.create_task(cache.aget_or_call('alerts', 'm1', 'prompt', slow))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.aget_or_call('alerts', 'm1', 'prompt', slow))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with self.assertRaises(LLMUnavailableError):
+            await follower
+        self.assertEqual(cache.in_flight._calls, {})
+
+        async def quick():
+            return 'again'
+        self.assertEqual(await cache.aget_or_call('alerts', 'm1', 'prompt', quick), 'again')
+
+    def test_sqlite_flights_share_the_reply_across_workers(self):
+        path = self.tmp / 'flights' / 'llm_flights.sqlite3'
+        one = LLMResponseCache(InProcessBackend(), flights=SQLiteFlights(path), poll_interval=0.01)
+        two = LLMResponseCache(InProcessBackend(), flights=SQLiteFlights(path), poll_interval=0.01)
+        started, release, calls = threading.Event(), threading.Event(), []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'reply'
+        results = []
+        first = threading.Thread(target=lambda: results.append(one.get_or_call('alerts', 'm1', 'prompt', slow)))
+        first.start()
+        started.wait(5)
+        second = threading.Thread(target=lambda: results.append(two.get_or_call('alerts', 'm1', 'prompt', slow)))
+        second.start()
+        time.sleep(0.05)
+        release.set()
+        first.join(5)
+        second.join(5)
+        self.assertEqual(results, ['reply', 'reply'])
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(path.exists())
+
+    def test_failed_call_releases_the_flight(self):
+        flights = SQLiteFlights(self.tmp / 'llm_flights.sqlite3')
+        cache = LLMResponseCache(InProcessBackend(), flights=flights)
+
+        def failing():
+            raise RuntimeError('model down')
+        with self.assertRaises(RuntimeError):
+            cache.get_or_call('alerts', 'm1', 'prompt', failing)
+        self.assertTrue(flights.claim(cache.key('alerts', 'm1', 'prompt')))
+
+
+class CachedEndpointTests(SyntheticDataMixin, SimpleTestCase):
+    def test_repeated_requests_reuse_the_reply(self):
+        backend = FakeBackend()
+        self.serve(gateway=fake_gateway(backend))
+        merchant_id = self.merchant_ids[0]
+
+        first = self.client.get(f'/api/merchant/{merchant_id}/recommendations/').json()
+        second = self.client.get(f'/api/merchant/{merchant_id}/recommendations/').json()
+        self.assertEqual(len(backend.prompts), 1)
+        self.assertEqual(first, second)
+        self.assertNotIn('fallback', first)
+
+    def test_appended_orders_make_the_cached_reply_stale(self):
+        from api.utils import ingest
+        from .support import new_orders
+
+        backend = FakeBackend()
+        registry = self.serve(gateway=fake_gateway(backend))
+        merchant_id = self.merchant_ids[0]
+        self.client.get(f'/api/merchant/{merchant_id}/alerts/')
+        transactions, trans_items = new_orders(self.data_dir, [merchant_id], 5, '2023-01-21')
+        ingest.append_orders(transactions, trans_items, self.data_dir)
+        registry.reload()
+        self.client.get(f'/api/merchant/{merchant_id}/alerts/')
+        self.assertEqual(len(backend.prompts), 2)
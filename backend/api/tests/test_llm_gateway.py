@@ -0,0 +1,166 @@
+import asyncio
+import os
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api.utils.llm_gateway import (
+    CircuitOpenError, FakeBackend, GatewayBusyError, GeminiBackend, LLMUnavailableError, RateLimitedError, TokenBucket,
+)
+from .support import SyntheticDataMixin, fake_gateway
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=10, burst=2)
+        self.assertEqual(bucket.reserve(1), 0)
+        self.assertEqual(bucket.reserve(1), 0)
+        self.assertAlmostEqual(bucket.reserve(1), 0.1, places=2)
+        with self.assertRaises(RateLimitedError):
+            bucket.reserve(0.1)
+
+    def test_refund(self):
+        bucket = TokenBucket(rate=0.001, burst=1)
+        bucket.reserve(0)
+        bucket.refund()
+        self.assertEqual(bucket.reserve(0), 0)
+
+
+class LLMGatewayTests(SimpleTestCase):
+    def test_retries_retryable_errors(self):
+        backend = FakeBackend(reply=lambda prompt: 'ok')
+        backend.fail_next(2)
+        gateway = fake_gateway(backend, max_retries=3)
+        self.assertEqual(gateway.generate('prompt'), 'ok')
+        self.assertEqual(len(backend.prompts), 3)
+
+    def test_gives_up_after_the_retries(self):
+        backend = FakeBackend()
+        backend.fail_next(3)
+        with self.assertRaises(LLMUnavailableError):
+            fake_gateway(backend, max_retries=2).generate('prompt')
+        self.assertEqual(len(backend.prompts), 3)
+
+    def test_client_errors_are_not_retried_and_leave_the_breaker_closed(self):
+        backend = FakeBackend(reply=lambda prompt: 'ok')
+        backend.fail_next(2, ValueError('bad request'))
+        gateway = fake_gateway(backend, breaker_failures=2)
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                gateway.generate('prompt')
+        self.assertEqual(len(backend.prompts), 2)
+        self.assertEqual(gateway.breaker.consecutive, 0)
+        self.assertEqual(gateway.generate('prompt'), 'ok')
+
+    def test_each_failed_attempt_counts(self):
+        backend = FakeBackend()
+        backend.fail_next(3)
+        gateway = fake_gateway(backend, max_retries=2, breaker_failures=3)
+        with self.assertRaises(LLMUnavailableError):
+            gateway.generate('prompt')
+        with self.assertRaises(CircuitOpenError):
+            gateway.generate('prompt')
+
+    def test_half_open_breaker_lets_one_probe_through(self):
+        backend = FakeBackend(reply=lambda prompt: 'ok')
+        backend.fail_next(1)
+        gateway = fake_gateway(backend, max_retries=0, breaker_failures=1, breaker_reset=30)
+        with self.assertRaises(LLMUnavailableError):
+            gateway.generate('prompt')
+
+        later = time.monotonic() + 31
+        with mock.patch('api.utils.llm_gateway.time.monotonic', return_value=later):
+            # The first caller after the pause probes; the others still fail fast meanwhile
+            gateway.breaker.check()
+            with self.assertRaises(CircuitOpenError):
+                gateway.generate('prompt')
+            gateway.breaker.record_success()
+            self.assertEqual(gateway.generate('prompt'), 'ok')
+
+    def test_failed_probe_reopens_the_breaker(self):
+        backend = FakeBackend()
+        backend.fail_next(2)
+        gateway = fake_gateway(backend, max_retries=0, breaker_failures=3, breaker_reset=30)
+        gateway.breaker.record_failure()
+        gateway.breaker.record_failure()
+        with self.assertRaises(LLMUnavailableError):
+            gateway.generate('prompt')
+
+        later = time.monotonic() + 31
+        with mock.patch('api.utils.llm_gateway.time.monotonic', return_value=later):
+            with self.assertRaises(LLMUnavailableError):
+                gateway.generate('prompt')
+            with self.assertRaises(CircuitOpenError):
+                gateway.generate('prompt')
+        self.assertEqual(len(backend.prompts), 2)
+
+    def test_merchant_limit_refunds_the_global_token(self):
+        gateway = fake_gateway(FakeBackend(), rate=0.001, burst=2, merchant_rate=0.001, merchant_burst=1, queue_timeout=0)
+        gateway.generate('prompt', 'm1')
+        with self.assertRaises(RateLimitedError):
+            gateway.generate('prompt', 'm1')
+        # m1 being over its limit didn't use up the call another merchant is allowed
+        gateway.generate('prompt', 'm2')
+
+    def test_merchant_buckets_are_bounded(self):
+        gateway = fake_gateway(FakeBackend(), merchant_rate=0.001, merchant_burst=5, max_merchants=3)
+        for merchant_id in ['m1', 'm2', 'm3', 'm1', 'm4']:
+            gateway.generate('prompt', merchant_id)
+        # m2 was the least recently used
+        self.assertEqual(list(gateway.merchant_buckets), ['m3', 'm1', 'm4'])
+
+    def test_refilled_buckets_are_dropped_first(self):
+        gateway = fake_gateway(FakeBackend(), merchant_rate=1000, merchant_burst=5, max_merchants=2)
+        gateway.generate('prompt', 'm1')
+        gateway.generate('prompt', 'm2')
+        time.sleep(0.01)
+        gateway.generate('prompt', 'm3')
+        self.assertEqual(list(gateway.merchant_buckets), ['m3'])
+
+    def test_busy_when_every_slot_is_taken(self):
+        gateway = fake_gateway(FakeBackend(), max_in_flight=1, queue_timeout=0.01)
+        gateway.slots.acquire()
+        with self.assertRaises(GatewayBusyError):
+            gateway.generate('prompt')
+
+    def test_busy_calls_give_back_their_tokens(self):
+        gateway = fake_gateway(FakeBackend(), max_in_flight=1, queue_timeout=0.01, rate=0.001, burst=1,
+                               merchant_rate=0.001, merchant_burst=1)
+        gateway.slots.acquire()
+        with self.assertRaises(GatewayBusyError):
+            gateway.generate('prompt', 'm1')
+        with self.assertRaises(GatewayBusyError):
+            asyncio.run(gateway.agenerate('prompt', 'm1'))
+        gateway.slots.release()
+        # Neither rejected call was sent, so both limits still allow this one
+        gateway.generate('prompt', 'm1')
+
+    def test_async_calls(self):
+        backend = FakeBackend(reply=lambda prompt: 'ok')
+        backend.fail_next(1)
+        gateway = fake_gateway(backend)
+        self.assertEqual(asyncio.run(gateway.agenerate('prompt')), 'ok')
+        self.assertEqual(len(backend.prompts), 2)
+        self.assertEqual(gateway.breaker.consecutive, 0)
+
+
+class ApiKeyTests(SyntheticDataMixin, SimpleTestCase):
+    def test_fake_backend_needs_no_key(self):
+        self.serve(gateway=fake_gateway(FakeBackend(reply=lambda prompt: 'hello')))
+        with mock.patch.dict(os.environ, clear=True):
+            response = self.client.post('/api/ask-gemini/', {'query': 'hi', 'merchant_id': self.merchant_ids[0]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    async def test_async_fake_backend_needs_no_key(self):
+        self.serve(gateway=fake_gateway(FakeBackend(reply=lambda prompt: 'hello')))
+        with mock.patch.dict(os.environ, clear=True):
+            response = await self.async_client.post('/api/async/ask-gemini/', {'query': 'hi', 'merchant_id': self.merchant_ids[0]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_gemini_backend_needs_a_key(self):
+        self.serve(gateway=fake_gateway(GeminiBackend(None)))
+        with mock.patch.dict(os.environ, clear=True):
+            response = self.client.post('/api/ask-gemini/stream/', {'query': 'hi', 'merchant_id': self.merchant_ids[0]}, content_type='application/json')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json(), {'error': 'API key missing'})
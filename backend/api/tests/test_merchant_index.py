@@ -0,0 +1,44 @@
+import pandas as pd
+from django.test import SimpleTestCase
+
+from api import views
+from api.utils.merchant_index import MerchantIndex
+from . import reference
+from .support import SyntheticDataMixin
+
+
+def comparable(frame):
+    """Rows in a fixed order with plain dtypes, for comparing frames built different ways"""
+    frame = frame.reset_index(drop=True)
+    frame = frame.astype({col: object for col in frame.columns if isinstance(frame[col].dtype, pd.CategoricalDtype)})
+    frame = frame.astype({col: 'float64' for col in frame.select_dtypes('number').columns})
+    return frame.sort_values(['order_id', 'item_id']).reset_index(drop=True)
+
+
+class MerchantIndexTests(SyntheticDataMixin, SimpleTestCase):
+    def test_merchant_rows_match_per_merchant_merge(self):
+        frames = reference.read_frames(self.data_dir)
+        index = MerchantIndex.build(frames['merchants'], frames['items'], frames['trans_items'], frames['transactions'])
+
+        for merchant_id in self.merchant_ids:
+            expected = reference.get_merchant_data(frames, merchant_id)
+            actual = index.get(merchant_id)
+            with self.subTest(merchant_id=merchant_id):
+                self.assertEqual(len(actual), len(expected))
+                if len(expected):
+                    pd.testing.assert_frame_equal(comparable(actual[expected.columns]), comparable(expected))
+
+    def test_take_gathers_several_merchants(self):
+        frames = reference.read_frames(self.data_dir)
+        index = MerchantIndex.build(frames['merchants'], frames['items'], frames['trans_items'], frames['transactions'])
+        wanted = self.merchant_ids[1:3]
+
+        taken = index.take(wanted)
+        self.assertEqual(set(taken[index.key]), set(wanted))
+        self.assertEqual(len(taken), sum(len(index.get(m)) for m in wanted))
+
+    def test_unknown_merchant_is_empty(self):
+        self.serve()
+        index = views.current_data().merchant_index
+        self.assertTrue(index.get('nobody').empty)
+        self.assertFalse(index.get(self.merchant_ids[0]).empty)
@@ -0,0 +1,58 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import views
+from api.utils.merchant_index import MerchantIndex
+from api.utils.metrics import compute_merchant_metrics
+from . import reference
+from .support import SyntheticDataMixin, as_json, assert_close
+
+
+class MerchantMetricsTests(SyntheticDataMixin, SimpleTestCase):
+    def test_metrics_match_per_endpoint_computation(self):
+        frames = reference.read_frames(self.data_dir)
+        index = MerchantIndex.build(frames['merchants'], frames['items'], frames['trans_items'], frames['transactions'])
+
+        for merchant_id in self.merchant_ids[:-1]:
+            with self.subTest(merchant_id=merchant_id):
+                expected = reference.merchant_metrics(reference.get_merchant_data(frames, merchant_id))
+                assert_close(self, compute_merchant_metrics(index.get(merchant_id)), expected)
+
+    def test_metric_endpoints_share_one_computation(self):
+        self.serve()
+        merchant_id = self.merchant_ids[0]
+        paths = {
+            'summary': None,
+            'top-selling-items': 'top_selling_items',
+            'least-selling-items': 'least_selling_items',
+            'popular-order-hours': 'popular_order_hours',
+            'popular-order-days': 'popular_order_days',
+            'average-basket-size': 'average_basket_size',
+            'average-order-value': 'average_order_value',
+            'average-delivery-time': 'average_delivery_time',
+            'total-revenue': 'total_revenue',
+        }
+
+        with mock.patch.object(views, 'compute_metrics', wraps=views.compute_metrics) as compute:
+            responses = {path: self.client.get(f'/api/merchant/{merchant_id}/{path}/') for path in paths}
+        self.assertEqual(compute.call_count, 1)
+
+        summary = responses.pop('summary').json()
+        self.assertEqual(summary['merchant_id'], merchant_id)
+        for path, field in paths.items():
+            if field is None:
+                continue
+            with self.subTest(path=path):
+                body = responses[path].json()
+                self.assertEqual(responses[path].status_code, 200)
+                self.assertEqual(body[field] if isinstance(body, dict) and field in body else body, summary[field])
+
+        frames = reference.read_frames(self.data_dir)
+        expected = reference.merchant_metrics(reference.get_merchant_data(frames, merchant_id))
+        assert_close(self, {k: v for k, v in summary.items() if k != 'merchant_id'}, as_json(expected))
+
+    def test_merchant_without_orders_is_404(self):
+        self.serve()
+        self.assertEqual(self.client.get(f'/api/merchant/{self.merchant_ids[-1]}/summary/').status_code, 404)
+        self.assertEqual(self.client.get('/api/merchant/nobody/total-revenue/').status_code, 404)
@@ -0,0 +1,65 @@
+import io
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from api import views
+from api.utils.precompute_store import PrecomputeStore
+from .support import SyntheticDataMixin
+
+
+class PrecomputeTests(SyntheticDataMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.serve()
+        path = self.tmp / 'precomputed.sqlite3'
+        settings = override_settings(PRECOMPUTE_STORE_PATH=path)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.store = PrecomputeStore(path)
+
+    def precompute(self, *args):
+        out = io.StringIO()
+        call_command('precompute', '--workers', '2', '--chunk-size', '2', *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_results_match_the_views_and_are_served(self):
+        merchant_id = self.merchant_ids[0]
+        expected = {
+            'metrics': views.compute_metrics(merchant_id),
+            'alerts': views.compute_alerts(merchant_id),
+            'keywords': views.compute_keyword_recommendations(merchant_id),
+        }
+        self.precompute()
+
+        version = views.data_version(merchant_id)
+        for kind, value in expected.items():
+            with self.subTest(kind=kind):
+                self.assertEqual(self.store.get(merchant_id, kind, version), value)
+
+        failing = mock.Mock(side_effect=AssertionError('should be precomputed'))
+        with mock.patch.multiple(views, compute_metrics=failing, compute_alerts=failing, compute_keyword_recommendations=failing):
+            self.assertEqual(self.client.get(f'/api/merchant/{merchant_id}/summary/').status_code, 200)
+            self.assertEqual(views.build_alerts(merchant_id), expected['alerts'])
+
+    def test_resumes_from_the_checkpoint(self):
+        self.precompute('--merchants', *self.merchant_ids[:2])
+        self.assertEqual(set(self.store.done()), set(self.merchant_ids[:2]))
+
+        output = self.precompute()
+        self.assertIn(f"Resuming: 2 of {len(self.merchant_ids)} merchants already done", output)
+        self.assertIn("Nothing to precompute", self.precompute())
+
+    def test_stale_results_are_ignored(self):
+        merchant_id = self.merchant_ids[0]
+        self.precompute('--merchants', merchant_id)
+        self.assertIsNone(self.store.get(merchant_id, 'metrics', 'another version'))
+        self.assertEqual(self.store.versions('metrics'), {merchant_id: views.data_version(merchant_id)})
+
+    def test_merchant_without_orders_has_no_results(self):
+        merchant_id = self.merchant_ids[-1]
+        self.precompute('--merchants', merchant_id)
+        self.assertIn(merchant_id, self.store.done())
+        self.assertEqual(self.store.versions('metrics'), {})
+        self.assertIsNotNone(self.store.get(merchant_id, 'keywords', views.data_version(merchant_id)))
@@ -0,0 +1,59 @@
+import os
+from unittest import mock
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from api.utils.registry import Derived
+from .support import SyntheticDataMixin
+
+
+class DatasetRegistryTests(SyntheticDataMixin, SimpleTestCase):
+    def rewrite_items(self, price_factor):
+        path = self.data_dir / 'items.csv'
+        items = pd.read_csv(path)
+        items['item_price'] = (items['item_price'] * price_factor).round(2)
+        items.to_csv(path, index=False)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def test_reload_swaps_in_changed_data(self):
+        registry = self.serve()
+        merchant_id = self.merchant_ids[0]
+        before = registry.current()
+        revenue = self.client.get(f'/api/merchant/{merchant_id}/total-revenue/').json()['total_revenue']
+        self.assertFalse(registry.reload())
+
+        self.rewrite_items(2)
+        self.assertTrue(registry.reload())
+        self.assertEqual(registry.generation, 2)
+        self.assertNotEqual(registry.current().version, before.version)
+        doubled = self.client.get(f'/api/merchant/{merchant_id}/total-revenue/').json()['total_revenue']
+        self.assertAlmostEqual(doubled, 2 * revenue, places=1)
+
+        # A request still holding the old Datasets keeps seeing the old data
+        self.assertAlmostEqual(before.merchant_index.get(merchant_id)['item_price'].sum(), revenue, places=2)
+
+    def test_failed_reload_keeps_the_current_data(self):
+        registry = self.registry()
+        current = registry.current()
+        self.rewrite_items(2)
+        with mock.patch('api.utils.registry.Datasets.load', side_effect=ValueError('bad csv')):
+            self.assertFalse(registry.reload())
+        self.assertIs(registry.current(), current)
+
+    def test_derived_values_rebuild_after_a_full_reload(self):
+        registry = self.registry()
+        builds = []
+        derived = Derived(registry, lambda datasets: builds.append(datasets) or len(builds))
+        self.assertEqual(derived.get(), 1)
+        self.assertEqual(derived.get(), 1)
+        self.rewrite_items(2)
+        registry.reload()
+        self.assertEqual(derived.get(), 2)
+
+    def test_forced_reload_of_unchanged_data(self):
+        registry = self.registry()
+        registry.current()
+        self.assertTrue(registry.reload(force=True))
+        self.assertEqual(registry.generation, 2)
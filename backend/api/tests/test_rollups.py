@@ -0,0 +1,51 @@
+import pandas as pd
+from django.test import SimpleTestCase
+
+from api.utils import data_loader
+from api.utils.merchant_index import MerchantIndex
+from api.utils.metrics import compute_merchant_metrics
+from api.utils.rollups import DailyRollup
+from . import reference
+from .support import SyntheticDataMixin, assert_close
+
+
+class DailyRollupTests(SyntheticDataMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        frames = data_loader.read_csv_datasets(self.data_dir)
+        self.index = MerchantIndex.build(frames['merchants'], frames['items'], frames['trans_items'], frames['transactions'])
+
+    def test_rollup_metrics_match_row_metrics(self):
+        rollup = DailyRollup.build(self.index.frame, self.index.key)
+        frames = reference.read_frames(self.data_dir)
+        for merchant_id in self.merchant_ids[:-1]:
+            with self.subTest(merchant_id=merchant_id):
+                expected = reference.merchant_metrics(reference.get_merchant_data(frames, merchant_id))
+                actual = compute_merchant_metrics(self.index.get(merchant_id), rollup=rollup.get(merchant_id))
+                assert_close(self, actual, expected)
+
+    def test_update_matches_a_rebuild(self):
+        frame = self.index.frame
+        # Split on whole orders, as appends do
+        late = frame['order_time'] >= frame['order_time'].quantile(0.8)
+        late_orders = frame.loc[late, 'order_id']
+        later = frame['order_id'].isin(late_orders)
+
+        rollup = DailyRollup.build(frame[~later], self.index.key)
+        updated = rollup.appended(frame[later], self.index.key)
+        rebuilt = DailyRollup.build(frame, self.index.key)
+
+        pd.testing.assert_frame_equal(updated.to_flat(), rebuilt.to_flat(), check_dtype=False)
+        # The rollup it was derived from is left as it was
+        self.assertEqual(rollup.to_flat()['order_count'].sum(), frame[~later]['order_id'].nunique())
+
+    def test_date_range(self):
+        rollup = DailyRollup.build(self.index.frame, self.index.key)
+        merchant_id = self.merchant_ids[0]
+        part = rollup.get(merchant_id, '2023-01-05', '2023-01-06')
+        dates = part.index.get_level_values('date')
+        self.assertTrue(((dates >= '2023-01-05') & (dates <= '2023-01-06')).all())
+        data = self.index.get(merchant_id)
+        in_range = data[data['order_time'].dt.normalize().between('2023-01-05', '2023-01-06')]
+        self.assertEqual(part['line_count'].sum(), len(in_range))
+        self.assertIsNone(rollup.get('nobody'))
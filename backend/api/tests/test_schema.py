@@ -0,0 +1,34 @@
+import pandas as pd
+from django.test import SimpleTestCase
+
+from api.utils import data_loader
+from api.utils.schema import SHARED_CATEGORIES, apply_schema, memory_usage
+from . import reference
+from .support import SyntheticDataMixin
+
+
+class SchemaTests(SyntheticDataMixin, SimpleTestCase):
+    def test_join_keys_share_one_dtype(self):
+        frames = data_loader.read_csv_datasets(self.data_dir)
+        for col, tables in SHARED_CATEGORIES.items():
+            with self.subTest(column=col):
+                self.assertEqual(len({str(frames[t][col].dtype) for t in tables}), 1)
+        self.assertIsInstance(frames['trans_items']['order_id'].dtype, pd.CategoricalDtype)
+        self.assertTrue(pd.api.types.is_integer_dtype(frames['items']['item_id']))
+
+    def test_item_id_dtype_fits_both_tables(self):
+        frames = {
+            'items': pd.DataFrame({'item_id': [1, 2, 3]}),
+            'trans_items': pd.DataFrame({'item_id': [1, 70000]}),
+        }
+        apply_schema(frames)
+        self.assertEqual(frames['items']['item_id'].dtype, frames['trans_items']['item_id'].dtype)
+        self.assertEqual(frames['trans_items']['item_id'].tolist(), [1, 70000])
+
+    def test_values_survive_the_schema(self):
+        raw = reference.read_frames(self.data_dir)
+        typed = data_loader.read_csv_datasets(self.data_dir)
+        for name in ['items', 'trans_items']:
+            with self.subTest(table=name):
+                pd.testing.assert_frame_equal(typed[name].astype(object), raw[name].astype(object), check_dtype=False)
+        self.assertLess(sum(memory_usage(typed).values()), sum(memory_usage(raw).values()))
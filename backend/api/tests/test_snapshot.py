@@ -0,0 +1,64 @@
+import io
+import os
+
+import pandas as pd
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from api.utils import data_loader, ingest
+from api.utils.metrics import compute_merchant_metrics
+from api.utils.registry import Datasets
+from .support import SyntheticDataMixin, assert_close
+
+
+class SnapshotTests(SyntheticDataMixin, SimpleTestCase):
+    def build_snapshot(self, *args):
+        call_command('build_snapshot', '--data-dir', self.data_dir, '--snapshot-dir', self.snapshot_dir, *args, stdout=io.StringIO())
+
+    def test_round_trip_matches_csv(self):
+        self.build_snapshot()
+        self.assertTrue(data_loader.snapshot_is_fresh(self.data_dir, self.snapshot_dir))
+
+        parsed = data_loader.read_csv_datasets(self.data_dir)
+        mapped = data_loader.read_snapshot(self.snapshot_dir)
+        for name, frame in parsed.items():
+            with self.subTest(table=name):
+                pd.testing.assert_frame_equal(mapped[name].copy(), frame)
+
+    def test_loads_with_the_merged_index_and_rollup(self):
+        self.build_snapshot()
+        from_csv = Datasets(data_loader.read_csv_datasets(self.data_dir), 'csv')
+        from_snapshot = Datasets.load(self.data_dir, self.snapshot_dir)
+        self.assertIn('merchant_index', from_snapshot.frames)
+
+        for merchant_id in self.merchant_ids[:-1]:
+            with self.subTest(merchant_id=merchant_id):
+                assert_close(
+                    self,
+                    compute_merchant_metrics(from_snapshot.merchant_index.get(merchant_id), rollup=from_snapshot.daily_rollup.get(merchant_id)),
+                    compute_merchant_metrics(from_csv.merchant_index.get(merchant_id), rollup=from_csv.daily_rollup.get(merchant_id)),
+                )
+
+    def test_changed_csv_makes_the_snapshot_stale(self):
+        self.build_snapshot()
+        path = self.data_dir / 'keywords.csv'
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertFalse(data_loader.snapshot_is_fresh(self.data_dir, self.snapshot_dir))
+        self.assertNotIn('merchant_index', data_loader.load_datasets(self.data_dir, self.snapshot_dir))
+
+    def test_rebuild_replaces_the_previous_version(self):
+        self.build_snapshot()
+        first = data_loader.read_manifest(self.snapshot_dir)['version']
+        self.build_snapshot('--force')
+        versions = [p.name for p in self.snapshot_dir.iterdir() if p.is_dir()]
+        self.assertEqual(versions, [data_loader.read_manifest(self.snapshot_dir)['version']])
+        self.assertNotEqual(versions[0], first)
+
+    def test_merchant_versions_match_the_csv_load(self):
+        self.build_snapshot()
+        sources = ingest.stamp_sources(self.data_dir)
+        from_csv = Datasets(data_loader.read_csv_datasets(self.data_dir), 'csv', sources)
+        from_snapshot = Datasets.load(self.data_dir, self.snapshot_dir)
+        for merchant_id in self.merchant_ids:
+            self.assertEqual(from_snapshot.merchant_version(merchant_id), from_csv.merchant_version(merchant_id))
@@ -0,0 +1,86 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from api import views
+from api.utils.keyword_scorer import KeywordScorer, normalize_rows
+from api.utils.vector_index import FlatIndex, IVFIndex, load_index, load_or_build_index, save_index
+from . import reference
+from .support import FakeEncoder, SyntheticDataMixin, assert_close
+
+
+def random_vectors(n, dim=16, seed=0):
+    return normalize_rows(np.random.default_rng(seed).standard_normal((n, dim)))
+
+
+class VectorIndexTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / 'index'
+
+    def test_flat_search_is_exact(self):
+        vectors, queries = random_vectors(500), random_vectors(5, seed=1)
+        for query, (scores, ids) in zip(queries, FlatIndex(vectors).search(queries, 10)):
+            expected = np.argsort(-(vectors @ query), kind='stable')[:10]
+            np.testing.assert_array_equal(ids, expected)
+            np.testing.assert_allclose(scores, (vectors @ query)[expected], rtol=1e-6)
+
+    def test_ivf_probing_every_list_is_exact(self):
+        vectors, queries = random_vectors(2000), random_vectors(5, seed=1)
+        ivf = IVFIndex.build(vectors, n_lists=20, nprobe=20)
+        flat = FlatIndex(vectors)
+        for (_, ivf_ids), (_, flat_ids) in zip(ivf.search(queries, 10), flat.search(queries, 10)):
+            np.testing.assert_array_equal(ivf_ids, flat_ids)
+        np.testing.assert_array_equal(ivf.reconstruct(np.array([3, 1999])), vectors[[3, 1999]])
+
+    def test_ivf_recall(self):
+        vectors, queries = random_vectors(2000), random_vectors(50, seed=1)
+        ivf = IVFIndex.build(vectors, nprobe=16)
+        flat = FlatIndex(vectors)
+        found = [
+            len(set(ivf_ids) & set(flat_ids))
+            for (_, ivf_ids), (_, flat_ids) in zip(ivf.search(queries, 10), flat.search(queries, 10))
+        ]
+        self.assertGreater(sum(found) / (10 * len(queries)), 0.8)
+
+    def test_saved_index_is_memory_mapped_and_checked(self):
+        vectors = random_vectors(300)
+        save_index(IVFIndex.build(vectors, nprobe=4), self.path, 'fp1')
+
+        loaded = load_index(self.path, 'fp1', kind='ivf', nprobe=8)
+        self.assertIsInstance(loaded.vectors, np.memmap)
+        self.assertEqual(loaded.nprobe, 8)
+        self.assertIsNone(load_index(self.path, 'fp2', kind='ivf'))
+        self.assertIsNone(load_index(self.path, 'fp1', kind='flat'))
+
+    def test_rebuilds_only_when_the_fingerprint_changes(self):
+        builds = []
+
+        def vectors():
+            builds.append(1)
+            return random_vectors(100)
+        load_or_build_index(self.path, 'fp1', vectors)
+        load_or_build_index(self.path, 'fp1', vectors)
+        self.assertEqual(len(builds), 1)
+        load_or_build_index(self.path, 'fp2', vectors)
+        self.assertEqual(len(builds), 2)
+
+
+class ApproximateKeywordTests(SyntheticDataMixin, SimpleTestCase):
+    def test_ivf_scorer_matches_per_item_scoring(self):
+        frames = reference.read_frames(self.data_dir)
+        encoder = FakeEncoder()
+        keywords = frames['keywords']
+        ivf = IVFIndex.build(normalize_rows(encoder.encode(keywords['keyword'].tolist())), n_lists=8, nprobe=8)
+        scorer = KeywordScorer(keywords, ivf, views.cuisine_keywords, candidates=20)
+
+        for merchant_id in self.merchant_ids[:2]:
+            items = frames['items'][frames['items']['merchant_id'] == merchant_id]
+            recommendations = scorer.recommend(encoder.encode(items['item_name'].tolist()), items['cuisine_tag'].tolist())
+            actual = {name: keywords for name, keywords in zip(items['item_name'], recommendations) if keywords}
+            expected = reference.keyword_recommendations(frames, merchant_id, encoder.encode, views.cuisine_keywords)
+            with self.subTest(merchant_id=merchant_id):
+                assert_close(self, actual, expected, places=5)
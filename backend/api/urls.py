@@ -1,8 +1,12 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('ask-gemini/', views.ask_gemini),
+    path('ask-gemini/stream/', views.ask_gemini_stream),
+    path('merchant/<str:merchant_id>/chat-history/', views.chat_history_view),
+    path('merchant/<str:merchant_id>/summary/', views.merchant_summary_view),
+    path('merchants/summary/', views.bulk_summary_view),
     path('merchant/<str:merchant_id>/top-selling-items/', views.top_selling_items_view),
     path('merchant/<str:merchant_id>/least-selling-items/', views.least_selling_items_view),
     path('merchant/<str:merchant_id>/popular-order-hours/', views.popular_hours_view),
@@ -16,4 +20,10 @@ urlpatterns = [
     path('merchant/<str:merchant_id>/enhanced-keyword-recommendations/', views.enhanced_keyword_recommendations_view),
     path('merchant/<str:merchant_id>/alerts/', views.merchant_alerts_v2),
     path('merchant/<str:merchant_id>/realtime-recommendations', views.realtime_recommendations),
+    # Same Gemini endpoints as native async views, for ASGI deployments (backend.asgi)
+    path('async/ask-gemini/', async_views.ask_gemini),
+    path('async/ask-gemini/stream/', async_views.ask_gemini_stream),
+    path('async/merchant/<str:merchant_id>/recommendations/', async_views.merchant_recommendations),
+    path('async/merchant/<str:merchant_id>/alerts/', async_views.merchant_alerts_v2),
+    path('async/merchant/<str:merchant_id>/realtime-recommendations/', async_views.realtime_recommendations),
 ]
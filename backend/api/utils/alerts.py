@@ -0,0 +1,73 @@
+import pandas as pd
+
+# Mean delay in minutes above which a stage counts as a bottleneck, with the
+# message shown either way
+BOTTLENECKS = [
+    ('arrival_delay', 15, "Drivers are taking longer than usual to arrive.", "Driver arrival times are within acceptable range."),
+    ('pickup_delay', 10, "Orders are waiting too long after drivers arrive.", "Pickup delays are minimal and acceptable."),
+    ('delivery_delay', 30, "Deliveries are slower than expected.", "Delivery times are within expected range."),
+]
+LOW_SELLING_MAX = 2
+
+
+def delay_minutes(frame):
+    """Minutes spent in each delivery stage, per row"""
+    return pd.DataFrame({
+        'arrival_delay': (frame['driver_arrival_time'] - frame['order_time']).dt.total_seconds() / 60,
+        'pickup_delay': (frame['driver_pickup_time'] - frame['driver_arrival_time']).dt.total_seconds() / 60,
+        'delivery_delay': (frame['delivery_time'] - frame['driver_pickup_time']).dt.total_seconds() / 60,
+    }, index=frame.index)
+
+def item_lists(sales, key):
+    return {merchant_id: rows['item_name'].tolist() for merchant_id, rows in sales.groupby(key, observed=True)}
+
+def compute_fleet_alerts(latest, key):
+    """Yield (merchant_id, alert summary) for every merchant in latest, the rows of each
+    merchant's latest day, with one grouped pass per statistic
+
+    The summary holds the latest date, order and revenue totals, the high and
+    low selling items, the mean delay of each stage and the bottleneck messages.
+    """
+    if latest.empty:
+        return
+    merchants = latest[key]
+    by_merchant = latest.groupby(merchants, observed=True)
+
+    dates = by_merchant['order_time'].max().dt.normalize()
+    total_orders = by_merchant['order_id'].nunique()
+    total_revenue = by_merchant['order_value'].sum()
+    delays = delay_minutes(latest).groupby(merchants, observed=True).mean()
+
+    # Orders per item, then each merchant's mean + std as its high-selling threshold
+    sales = latest.groupby([merchants, 'item_name'], observed=True)['order_id'].nunique().rename('sales_count').reset_index()
+    sales_by_merchant = sales.groupby(key, observed=True)['sales_count']
+    threshold = sales_by_merchant.transform('mean') + sales_by_merchant.transform('std')
+    low = item_lists(sales[sales['sales_count'] <= LOW_SELLING_MAX], key)
+    high = item_lists(sales[sales['sales_count'] > threshold], key)
+
+    for merchant_id in dates.index:
+        merchant_delays = delays.loc[merchant_id]
+        yield merchant_id, {
+            'latest_date': dates[merchant_id],
+            'total_orders': int(total_orders[merchant_id]),
+            'total_revenue': total_revenue[merchant_id],
+            'high_selling_items': high.get(merchant_id, []),
+            'low_selling_items': low.get(merchant_id, []),
+            'delays': {column: merchant_delays[column] for column, *_ in BOTTLENECKS},
+            'bottlenecks': [
+                slow if merchant_delays[column] > limit else normal
+                for column, limit, slow, normal in BOTTLENECKS
+            ],
+        }
+
+def delay_anomalies(summary):
+    """(severity, description) for each delivery stage over its threshold"""
+    anomalies = []
+    for column, limit, slow, _ in BOTTLENECKS:
+        minutes = summary['delays'][column]
+        if not minutes > limit:
+            continue
+        severity = 'high' if minutes > 2 * limit else 'medium' if minutes > 1.5 * limit else 'low'
+        date = summary['latest_date'].date()
+        anomalies.append((severity, f"{slow} Average {column.replace('_', ' ')} was {minutes:.1f} min on {date} (limit {limit} min)."))
+    return anomalies
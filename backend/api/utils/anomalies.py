@@ -0,0 +1,36 @@
+from django.apps import apps
+
+# Anomaly and SellerProfile live in the assistant app. A merchant's anomalies go
+# to the seller whose profile carries its merchant_id.
+
+
+def anomalies_enabled():
+    return apps.is_installed('assistant')
+
+def write_anomalies(records):
+    """Create Anomaly rows for (merchant_id, type, severity, description) records in one bulk_create
+
+    Records of merchants without a seller profile, and ones identical to an
+    anomaly that is still unresolved, are skipped. Returns the number created.
+    """
+    if not records or not anomalies_enabled():
+        return 0
+    from assistant.models import Anomaly, SellerProfile
+
+    sellers = dict(
+        SellerProfile.objects.filter(merchant_id__in={str(m) for m, *_ in records}).values_list('merchant_id', 'id')
+    )
+    open_anomalies = set(
+        Anomaly.objects.filter(seller_id__in=sellers.values(), is_resolved=False)
+        .values_list('seller_id', 'type', 'description')
+    )
+
+    anomalies = []
+    for merchant_id, anomaly_type, severity, description in records:
+        seller_id = sellers.get(str(merchant_id))
+        if seller_id is None or (seller_id, anomaly_type, description) in open_anomalies:
+            continue
+        open_anomalies.add((seller_id, anomaly_type, description))
+        anomalies.append(Anomaly(seller_id=seller_id, type=anomaly_type, severity=severity, description=description))
+    Anomaly.objects.bulk_create(anomalies)
+    return len(anomalies)
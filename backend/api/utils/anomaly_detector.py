@@ -0,0 +1,192 @@
+import math
+import os
+import pickle
+from pathlib import Path
+
+import pandas as pd
+
+from .alerts import delay_minutes
+
+# Hourly series tracked per merchant: (name, what it means, anomaly type, direction that is bad)
+SERIES = [
+    ('orders', 'Orders per hour', 'sales_drop', -1),
+    ('revenue', 'Revenue per hour', 'sales_drop', -1),
+    ('arrival_delay', 'Average driver arrival delay', 'order_issue', 1),
+    ('pickup_delay', 'Average pickup delay', 'order_issue', 1),
+    ('delivery_delay', 'Average delivery delay', 'order_issue', 1),
+]
+DELAYS = ['arrival_delay', 'pickup_delay', 'delivery_delay']
+# Bumped whenever the saved detector's layout changes, so an old state file is ignored
+STATE_VERSION = 2
+
+
+class EWMA:
+    """Exponentially weighted mean and variance of a series, in constant memory"""
+
+    __slots__ = ('mean', 'var', 'count')
+
+    def __init__(self):
+        self.mean = 0.0
+        self.var = 0.0
+        self.count = 0
+
+    def update(self, value, alpha):
+        if self.count == 0:
+            self.mean = value
+        else:
+            diff = value - self.mean
+            increment = alpha * diff
+            self.mean += increment
+            self.var = (1 - alpha) * (self.var + diff * increment)
+        self.count += 1
+
+
+def empty_totals():
+    """Totals of an hour without orders"""
+    return {
+        'orders': 0,
+        'revenue': 0.0,
+        **{f'{name}_sum': 0.0 for name in DELAYS},
+        **{f'{name}_count': 0 for name in DELAYS},
+    }
+
+
+class MerchantState:
+    """Running statistics of one merchant, one EWMA per series and hour of day, plus
+    the totals of the hour still open (or the last hour closed, with totals None)
+    """
+
+    __slots__ = ('stats', 'hour', 'totals')
+
+    def __init__(self):
+        self.stats = {name: [EWMA() for _ in range(24)] for name, *_ in SERIES}
+        self.hour = None
+        self.totals = None
+
+    def values(self):
+        """The open hour's value of each series; None for delays nobody recorded"""
+        totals = self.totals
+        values = {'orders': totals['orders'], 'revenue': totals['revenue']}
+        for name in DELAYS:
+            count = totals[f'{name}_count']
+            values[name] = totals[f'{name}_sum'] / count if count else None
+        return values
+
+
+class AnomalyDetector:
+    """Online detector over the order stream
+
+    Orders are bucketed per merchant and hour. When an hour closes, each of its
+    values is compared with the merchant's EWMA of the same hour on earlier
+    days, so the daily cycle (quiet nights, busy lunches) is not an anomaly,
+    then folded into it. A value more than `threshold` standard deviations off
+    in the bad direction is an anomaly, once that hour has `min_days` days of
+    history. Hours without orders count as zero orders and revenue from a
+    merchant's first order on, so a merchant whose orders stop is caught too.
+    """
+
+    def __init__(self, alpha=0.1, threshold=3.0, min_days=7):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.min_days = min_days
+        self.merchants = {}
+        self.clock = None      # latest order hour seen in the stream
+        self.late = 0          # orders dropped because their hour had already closed
+
+    def process(self, transactions):
+        """Fold new orders into the statistics and return (merchant_id, type, severity, description)
+        for every anomaly in the hours they close
+        """
+        anomalies = []
+        totals = hourly_totals(transactions)
+        for (merchant_id, hour), values in zip(totals.index, totals.to_dict('records')):
+            state = self.merchants.get(merchant_id)
+            if state is None:
+                state = self.merchants[merchant_id] = MerchantState()
+            if state.hour is not None and (hour < state.hour or (hour == state.hour and state.totals is None)):
+                self.late += int(values['orders'])
+                continue
+            if state.hour is not None and hour > state.hour:
+                anomalies += self._advance(merchant_id, state, hour)
+            if state.totals is None:
+                state.hour, state.totals = hour, values
+            else:
+                state.totals = {name: state.totals[name] + value for name, value in values.items()}
+            if self.clock is None or hour > self.clock:
+                self.clock = hour
+
+        # The stream has moved past these hours, so no more orders are coming for them
+        if self.clock is not None:
+            for merchant_id, state in self.merchants.items():
+                anomalies += self._advance(merchant_id, state, self.clock)
+        return anomalies
+
+    def _advance(self, merchant_id, state, until):
+        """Close the merchant's open hour and every empty hour after it, up to (not including) until"""
+        anomalies = []
+        if state.totals is not None and state.hour < until:
+            anomalies += self._close(merchant_id, state)
+        hour = state.hour + pd.Timedelta(hours=1)
+        while hour < until:
+            state.hour, state.totals = hour, empty_totals()
+            anomalies += self._close(merchant_id, state)
+            hour += pd.Timedelta(hours=1)
+        return anomalies
+
+    def _close(self, merchant_id, state):
+        anomalies = []
+        values = state.values()
+        for name, label, anomaly_type, direction in SERIES:
+            value = values[name]
+            if value is None:
+                continue
+            stat = state.stats[name][state.hour.hour]
+            if stat.count >= self.min_days:
+                # Floor the deviation so a merchant with a very steady series doesn't alert on noise
+                std = max(math.sqrt(stat.var), 0.1 * abs(stat.mean), 1e-9)
+                z = (value - stat.mean) / std
+                if z * direction > self.threshold:
+                    severity = 'high' if abs(z) > 2 * self.threshold else 'medium' if abs(z) > 1.5 * self.threshold else 'low'
+                    anomalies.append((merchant_id, anomaly_type, severity, (
+                        f"{label} was {value:.1f} at {state.hour:%Y-%m-%d %H:00}, "
+                        f"against an average of {stat.mean:.1f} at this hour ({z:+.1f} standard deviations)."
+                    )))
+            stat.update(value, self.alpha)
+        # Keep the hour so later orders for it count as late rather than opening it again
+        state.totals = None
+        return anomalies
+
+
+def hourly_totals(transactions):
+    """Order count, revenue and delay sums/counts per (merchant, hour), in time order"""
+    transactions = transactions.dropna(subset=['order_time'])
+    delays = delay_minutes(transactions)
+    rows = pd.DataFrame({
+        'merchant_id': transactions['merchant_id'].astype(str),
+        'hour': transactions['order_time'].dt.floor('h'),
+        'orders': 1,
+        'revenue': transactions['order_value'].astype(float),
+        **{f'{name}_sum': delays[name] for name in DELAYS},
+        **{f'{name}_count': delays[name].notna().astype(int) for name in DELAYS},
+    })
+    totals = rows.groupby(['merchant_id', 'hour']).sum()
+    # Time first, so every merchant's hours close in order and the clock only moves forward
+    return totals.sort_index(level=['hour', 'merchant_id'])
+
+
+def load_detector(path):
+    """(detector, source stamps) saved by save_detector, or None"""
+    try:
+        with open(path, 'rb') as f:
+            version, detector, sources = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, TypeError, ValueError):
+        return None
+    return (detector, sources) if version == STATE_VERSION else None
+
+def save_detector(path, detector, sources):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    with open(tmp, 'wb') as f:
+        pickle.dump((STATE_VERSION, detector, sources), f)
+    os.replace(tmp, path)
@@ -0,0 +1,147 @@
+import json
+import re
+
+from .chat_store import estimate_tokens
+
+# Bulk generation for `manage.py generate_recommendations`: several merchants'
+# summary blocks share one request and one copy of the instructions, and the
+# reply is a JSON array that is split back out per merchant.
+
+BATCH_INSTRUCTIONS = """
+        You are a Grab Business Consultant AI that gives personalized, real-world business recommendations to food & beverage merchant-partners.
+
+        Below is the performance data of {count} merchants, each under its own MERCHANT header.
+        For EVERY merchant, generate 3 to 5 actionable recommendations based only on that merchant's data.
+        Answer with one JSON array holding one entry per merchant, in this format:
+
+        [
+            {{
+                "merchant_id": "The ID from the merchant's header",
+                "recommendations": [
+                    {{
+                        "title": "Short recommendation title",
+                        "rationale": "Explain why this is important using the data insights.",
+                        "action_steps": [
+                            "Step 1",
+                            "Step 2",
+                            ...
+                        ],
+                        "expected_impact": "What business outcome this could improve"
+                    }},
+                    ...
+                ]
+            }},
+            ...
+        ]
+
+        Be practical and business-relevant — examples include bundling popular items, reducing delivery times, off-peak promotions, optimizing staffing, or retiring underperforming items.
+        Reply with the JSON array only.
+        """
+
+RECOMMENDATION_FIELDS = ('title', 'rationale', 'action_steps', 'expected_impact')
+
+
+def merchant_block(merchant_id, summary):
+    return f"\n--- MERCHANT {merchant_id} ---\n{summary}"
+
+def batch_prompt(summaries):
+    """One prompt for {merchant_id: summary}"""
+    blocks = ''.join(merchant_block(m, summary) for m, summary in summaries.items())
+    return BATCH_INSTRUCTIONS.format(count=len(summaries)) + blocks
+
+def pack_batches(summaries, token_budget, max_merchants):
+    """Merchant IDs grouped so each batch prompt stays within token_budget
+
+    A merchant whose block alone is over the budget still gets a batch of its own.
+    """
+    budget = token_budget - estimate_tokens(BATCH_INSTRUCTIONS)
+    batches, batch, used = [], [], 0
+    for merchant_id, summary in summaries.items():
+        tokens = estimate_tokens(merchant_block(merchant_id, summary))
+        if batch and (used + tokens > budget or len(batch) >= max_merchants):
+            batches.append(batch)
+            batch, used = [], 0
+        batch.append(merchant_id)
+        used += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def valid_recommendations(value):
+    return isinstance(value, list) and len(value) > 0 and all(
+        isinstance(r, dict) and all(r.get(field) for field in RECOMMENDATION_FIELDS)
+        and isinstance(r['action_steps'], list)
+        for r in value
+    )
+
+def split_reply(text, merchant_ids):
+    """{merchant_id: recommendations} for every requested merchant with a valid entry in the reply"""
+    # The model sometimes wraps JSON in a markdown fence despite being asked not to
+    text = re.sub(r'^\s*```(?:json)?|```\s*$', '', text.strip())
+    try:
+        entries = json.loads(text)
+    except ValueError:
+        return {}
+    if not isinstance(entries, list):
+        return {}
+
+    wanted = set(merchant_ids)
+    results = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        merchant_id = str(entry.get('merchant_id', '')).strip()
+        if merchant_id in wanted and valid_recommendations(entry.get('recommendations')):
+            results.setdefault(merchant_id, entry['recommendations'])
+    return results
+
+
+class BatchGenerator:
+    """Recommendations for many merchants in as few model calls as the token budget allows
+
+    Merchants missing from a reply, or whose entry doesn't validate, are retried
+    in later rounds, in batches half as large each time so one merchant that
+    trips the model up ends up on its own.
+    """
+
+    def __init__(self, gateway, token_budget=6000, max_merchants=20, attempts=3):
+        self.gateway = gateway
+        self.token_budget = token_budget
+        self.max_merchants = max_merchants
+        self.attempts = attempts
+        self.calls = 0
+
+    def generate(self, summaries, on_batch=None):
+        """({merchant_id: recommendations}, {merchant_id: last error}) for {merchant_id: summary}
+
+        on_batch(results) is called with each batch's results as it completes.
+        """
+        results, errors = {}, {}
+        pending = dict(summaries)
+        for attempt in range(self.attempts):
+            if not pending:
+                break
+            max_merchants = max(1, self.max_merchants >> attempt)
+            for batch in pack_batches(pending, self.token_budget, max_merchants):
+                found = self.generate_batch({m: pending[m] for m in batch}, errors)
+                for merchant_id in found:
+                    errors.pop(merchant_id, None)
+                results.update(found)
+                if found and on_batch is not None:
+                    on_batch(found)
+            pending = {m: summary for m, summary in pending.items() if m not in results}
+        return results, {m: errors.get(m, 'No valid reply') for m in pending}
+
+    def generate_batch(self, summaries, errors):
+        self.calls += 1
+        try:
+            text = self.gateway.generate(batch_prompt(summaries))
+        except Exception as e:
+            # One bad request fails its batch only; the other batches still run
+            print(f"Error generating recommendations for {len(summaries)} merchants: {e}")
+            errors.update((m, str(e)) for m in summaries)
+            return {}
+        found = split_reply(text, summaries)
+        errors.update((m, 'Missing or invalid in the reply') for m in summaries if m not in found)
+        return found
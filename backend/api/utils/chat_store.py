@@ -0,0 +1,223 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English and Malay text
+    return len(text) // 4
+
+
+class ChatState:
+    """One merchant's conversation: a running summary plus the recent turns verbatim"""
+
+    def __init__(self, messages=None, summary='', turns=0):
+        self.messages = messages or []
+        self.summary = summary
+        self.turns = turns
+
+    @classmethod
+    def from_json(cls, raw):
+        return cls(**json.loads(raw))
+
+    def to_json(self):
+        return json.dumps({'messages': self.messages, 'summary': self.summary, 'turns': self.turns})
+
+    def append(self, prompt, reply):
+        self.messages.append({'turn': self.turns, 'role': 'user', 'text': prompt})
+        self.messages.append({'turn': self.turns, 'role': 'model', 'text': reply})
+        self.turns += 1
+
+    def contents(self):
+        """History in the shape start_chat(history=...) expects"""
+        contents = []
+        if self.summary:
+            contents.append({'role': 'user', 'parts': [f"Summary of our conversation so far: {self.summary}"]})
+            contents.append({'role': 'model', 'parts': ["Understood."]})
+        contents.extend({'role': m['role'], 'parts': [m['text']]} for m in self.messages)
+        return contents
+
+    def tokens(self):
+        return estimate_tokens(self.summary) + sum(estimate_tokens(m['text']) for m in self.messages)
+
+    def compact(self, summarize, token_budget, keep_turns):
+        """Fold all but the last keep_turns turns into the summary once over budget"""
+        keep = 2 * keep_turns
+        if self.tokens() <= token_budget or len(self.messages) <= keep:
+            return False
+        old, self.messages = self.messages[:-keep], self.messages[-keep:]
+        try:
+            self.summary = summarize(self.summary, old)
+        except Exception as e:
+            # The budget matters more than the detail; the old turns are dropped either way
+            print(f"Error summarizing chat history: {e}")
+        return True
+
+
+class InProcessSessionBackend:
+    """LRU of serialized sessions, bounded by count, total size and idle time"""
+
+    def __init__(self, max_sessions=1000, max_bytes=50 * 2**20, idle_timeout=3600):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_timeout = idle_timeout
+        self._sessions = OrderedDict()  # merchant_id -> (last_used, raw)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _pop_oldest(self):
+        _, (_, raw) = self._sessions.popitem(last=False)
+        self._bytes -= len(raw)
+
+    def _evict(self, now):
+        # Least recently used first, so idle sessions are always at the front
+        while self._sessions and next(iter(self._sessions.values()))[0] <= now - self.idle_timeout:
+            self._pop_oldest()
+        while len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes:
+            self._pop_oldest()
+
+    def get(self, merchant_id):
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            entry = self._sessions.get(merchant_id)
+            if entry is None:
+                return None
+            self._sessions[merchant_id] = (now, entry[1])
+            self._sessions.move_to_end(merchant_id)
+            return entry[1]
+
+    def set(self, merchant_id, raw):
+        now = time.monotonic()
+        with self._lock:
+            previous = self._sessions.pop(merchant_id, None)
+            if previous is not None:
+                self._bytes -= len(previous[1])
+            self._sessions[merchant_id] = (now, raw)
+            self._bytes += len(raw)
+            self._evict(now)
+
+    def delete(self, merchant_id):
+        with self._lock:
+            previous = self._sessions.pop(merchant_id, None)
+            if previous is not None:
+                self._bytes -= len(previous[1])
+
+
+class SQLiteSessionBackend:
+    """Sessions in a SQLite file of their own, shared by workers and restarts
+
+    Kept out of the Django database, whose tables are only created by migrations.
+    """
+
+    table = 'sessions'
+
+    def __init__(self, path, max_sessions=1000, idle_timeout=3600):
+        self.path = str(path)
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._created = False
+
+    def _connect(self):
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._created:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} "
+                "(merchant_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._created = True
+        return conn
+
+    def get(self, merchant_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                f"SELECT state FROM {self.table} WHERE merchant_id = ? AND updated_at > ?",
+                (merchant_id, time.time() - self.idle_timeout),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, merchant_id, raw):
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (merchant_id, state, updated_at) VALUES (?, ?, ?)",
+                (merchant_id, raw, now),
+            )
+            conn.execute(f"DELETE FROM {self.table} WHERE updated_at <= ?", (now - self.idle_timeout,))
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE merchant_id IN "
+                f"(SELECT merchant_id FROM {self.table} ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,),
+            )
+
+    def delete(self, merchant_id):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE merchant_id = ?", (merchant_id,))
+
+
+class DjangoCacheSessionBackend:
+    """Sessions in a Django cache; its own eviction policy provides the LRU and memory cap"""
+
+    def __init__(self, alias='default', idle_timeout=3600):
+        from django.core.cache import caches
+        self.cache = caches[alias]
+        self.idle_timeout = idle_timeout
+
+    def key(self, merchant_id):
+        return f"chat:session:{merchant_id}"
+
+    def get(self, merchant_id):
+        raw = self.cache.get(self.key(merchant_id))
+        if raw is not None:
+            self.cache.touch(self.key(merchant_id), self.idle_timeout)
+        return raw
+
+    def set(self, merchant_id, raw):
+        self.cache.set(self.key(merchant_id), raw, self.idle_timeout)
+
+    def delete(self, merchant_id):
+        self.cache.delete(self.key(merchant_id))
+
+
+class ChatSessionStore:
+    """Loads and saves ChatState per merchant, compacting history to a token budget"""
+
+    def __init__(self, backend, token_budget=4000, keep_turns=4):
+        self.backend = backend
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+
+    def load(self, merchant_id):
+        raw = self.backend.get(merchant_id)
+        return ChatState.from_json(raw) if raw is not None else ChatState()
+
+    def save(self, merchant_id, state, summarize):
+        # Concurrent turns for one merchant are last-write-wins
+        state.compact(summarize, self.token_budget, self.keep_turns)
+        self.backend.set(merchant_id, state.to_json())
+
+    def clear(self, merchant_id):
+        self.backend.delete(merchant_id)
+
+
+def build_chat_store(settings):
+    backend_name = getattr(settings, 'CHAT_STORE_BACKEND', 'memory')
+    max_sessions = getattr(settings, 'CHAT_MAX_SESSIONS', 1000)
+    idle_timeout = getattr(settings, 'CHAT_IDLE_TIMEOUT', 3600)
+    if backend_name == 'sqlite':
+        path = getattr(settings, 'CHAT_STORE_SQLITE_PATH', Path(settings.BASE_DIR) / 'data' / 'chat_sessions.sqlite3')
+        backend = SQLiteSessionBackend(path, max_sessions, idle_timeout)
+    elif backend_name == 'django':
+        backend = DjangoCacheSessionBackend(getattr(settings, 'CHAT_STORE_ALIAS', 'default'), idle_timeout)
+    else:
+        backend = InProcessSessionBackend(max_sessions, getattr(settings, 'CHAT_MAX_BYTES', 50 * 2**20), idle_timeout)
+    return ChatSessionStore(
+        backend,
+        token_budget=getattr(settings, 'CHAT_HISTORY_TOKEN_BUDGET', 4000),
+        keep_turns=getattr(settings, 'CHAT_KEEP_TURNS', 4),
+    )
@@ -1,33 +1,162 @@
 import pandas as pd
+import numpy as np
+import hashlib
+import json
 import os
+import shutil
+import time
+from pathlib import Path
 
-# Get the absolute path to the data directory
-current_dir = os.path.dirname(os.path.abspath(__file__))
-data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(current_dir))), 'data', 'datasets')
+from .schema import apply_schema, memory_usage
 
-#load all csv files from data directory
-items = pd.read_csv(os.path.join(data_dir, 'items.csv'))
-keywords = pd.read_csv(os.path.join(data_dir, 'keywords.csv'))
-merchants = pd.read_csv(os.path.join(data_dir, 'merchants.csv'))
-transaction_data = pd.read_csv(os.path.join(data_dir, 'transaction_data.csv'))
-transaction_items = pd.read_csv(os.path.join(data_dir, 'transaction_items.csv'))
+# Relative to backend/, where manage.py and the server run
+data_dir = Path("data/datasets/")
+snapshot_dir = Path("data/snapshot/")
 
-# Load all datasets
-def load_data():
-    items = pd.read_csv(os.path.join(data_dir, 'items.csv'))
-    keywords = pd.read_csv(os.path.join(data_dir, 'keywords.csv'))
-    merchants = pd.read_csv(os.path.join(data_dir, 'merchant.csv'))
-    transactions = pd.read_csv(os.path.join(data_dir, 'transaction_data.csv'))
-    trans_items = pd.read_csv(os.path.join(data_dir, 'transaction_items.csv'))
+SNAPSHOT_FORMAT = 1
 
-    # Convert date columns
+DATASET_FILES = {
+    'items': 'items.csv',
+    'keywords': 'keywords.csv',
+    'merchants': 'merchant.csv',
+    'transactions': 'transaction_data.csv',
+    'trans_items': 'transaction_items.csv',
+}
+
+
+def parse_transaction_times(transactions):
     transactions['order_time'] = pd.to_datetime(transactions['order_time'])
     transactions['driver_arrival_time'] = pd.to_datetime(transactions['driver_arrival_time'])
     transactions['driver_pickup_time'] = pd.to_datetime(transactions['driver_pickup_time'])
     transactions['delivery_time'] = pd.to_datetime(transactions['delivery_time'])
-    merchants['join_date'] = pd.to_datetime(merchants['join_date'], format='%d%m%Y')
-    
-    return items, keywords, merchants, transactions, trans_items
+    return transactions
+
+def read_csv_datasets(data_dir=data_dir):
+    """Parse the raw CSVs into typed, cleaned frames"""
+    frames = {name: pd.read_csv(Path(data_dir) / filename) for name, filename in DATASET_FILES.items()}
+
+    # Convert date columns
+    parse_transaction_times(frames['transactions'])
+    frames['merchants']['join_date'] = pd.to_datetime(frames['merchants']['join_date'], format='%d%m%Y')
+
+    # Clean data
+    frames['keywords'] = frames['keywords'].dropna(subset=['keyword']).reset_index(drop=True)
+    frames['items'] = frames['items'].dropna(subset=['item_name', 'cuisine_tag']).reset_index(drop=True)
+
+    return apply_schema(frames)
+
+
+# --- Columnar snapshot ---
+# One directory per table, one .npy per column. Numeric and datetime columns are
+# stored as-is; categoricals as int codes plus a separate categories array. Every
+# array is opened with mmap, so workers share the pages through the OS page cache.
+# Each build goes into a new version directory and manifest.json is swapped last,
+# so files a running worker has mapped are never overwritten.
+
+def source_stamps(data_dir=data_dir):
+    stamps = {}
+    for name, filename in DATASET_FILES.items():
+        stat = os.stat(Path(data_dir) / filename)
+        stamps[filename] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    return stamps
+
+def stamps_version(stamps):
+    stamps = {filename: {'size': s['size'], 'mtime_ns': s['mtime_ns']} for filename, s in stamps.items()}
+    stamps = json.dumps(stamps, sort_keys=True)
+    return hashlib.sha1(stamps.encode('utf-8')).hexdigest()[:16]
+
+def dataset_version(data_dir=data_dir):
+    """Short id of the current CSVs, for results derived from them"""
+    return stamps_version(source_stamps(data_dir))
+
+def write_table(df, table_dir):
+    table_dir.mkdir(parents=True, exist_ok=True)
+    columns = []
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        # Plain string columns (e.g. merge keys) can't be memory-mapped, so encode them too
+        if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            series = series.astype('category')
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            np.save(table_dir / f"{i}.npy", series.cat.codes.to_numpy())
+            np.save(table_dir / f"{i}.categories.npy", np.asarray(series.cat.categories, dtype=str))
+            columns.append({'name': col, 'kind': 'category'})
+        else:
+            np.save(table_dir / f"{i}.npy", series.to_numpy())
+            columns.append({'name': col, 'kind': 'array'})
+    return columns
+
+def read_table(table_dir, columns):
+    data = {}
+    for i, column in enumerate(columns):
+        values = np.load(table_dir / f"{i}.npy", mmap_mode='r')
+        if column['kind'] == 'category':
+            categories = np.load(table_dir / f"{i}.categories.npy")
+            values = pd.Categorical.from_codes(values, categories=categories)
+        data[column['name']] = values
+    # copy=False keeps the memory-mapped arrays instead of consolidating them into new blocks
+    return pd.DataFrame(data, copy=False)
+
+def write_snapshot(frames, data_dir=data_dir, snapshot_dir=snapshot_dir):
+    """Write frames as a columnar snapshot, stamped with the CSVs they came from"""
+    snapshot_dir = Path(snapshot_dir)
+    version = str(time.time_ns())
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'version': version,
+        'sources': source_stamps(data_dir),
+        'tables': {},
+    }
+    for name, df in frames.items():
+        manifest['tables'][name] = write_table(df, snapshot_dir / version / name)
+
+    # The manifest goes last so a half-written snapshot is never treated as fresh
+    tmp = snapshot_dir / 'manifest.json.tmp'
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, snapshot_dir / 'manifest.json')
+
+    # Unlinked files stay readable for workers that still have them mapped
+    for old in snapshot_dir.iterdir():
+        if old.is_dir() and old.name != version:
+            shutil.rmtree(old, ignore_errors=True)
+    return manifest
+
+def read_manifest(snapshot_dir=snapshot_dir):
+    try:
+        return json.loads((Path(snapshot_dir) / 'manifest.json').read_text())
+    except (OSError, ValueError):
+        return None
+
+def snapshot_is_fresh(data_dir=data_dir, snapshot_dir=snapshot_dir):
+    manifest = read_manifest(snapshot_dir)
+    if manifest is None or manifest.get('format') != SNAPSHOT_FORMAT:
+        return False
+    try:
+        return manifest['sources'] == source_stamps(data_dir)
+    except OSError:
+        return False
+
+def read_snapshot(snapshot_dir=snapshot_dir):
+    manifest = read_manifest(snapshot_dir)
+    return {
+        name: read_table(Path(snapshot_dir) / manifest['version'] / name, columns)
+        for name, columns in manifest['tables'].items()
+    }
+
+
+# Load all datasets
+def load_datasets(data_dir=data_dir, snapshot_dir=snapshot_dir):
+    """Frames from the snapshot when it matches the CSVs, otherwise parsed from CSV"""
+    if snapshot_is_fresh(data_dir, snapshot_dir):
+        try:
+            return read_snapshot(snapshot_dir)
+        except Exception as e:
+            print(f"Error reading snapshot, falling back to CSV: {e}")
+    return read_csv_datasets(data_dir)
+
+def load_data(data_dir=data_dir, snapshot_dir=snapshot_dir):
+    frames = load_datasets(data_dir, snapshot_dir)
+    return frames['items'], frames['keywords'], frames['merchants'], frames['transactions'], frames['trans_items']
 
 def get_popular_order_hours(merchant_id, transactions):
     df = transactions[transactions['merchant_id'] == merchant_id].copy()
@@ -42,7 +171,7 @@ def get_popular_order_days(merchant_id, transactions):
 def get_average_basket_size(merchant_id, trans_items, transactions):
     tx = transactions[transactions['merchant_id'] == merchant_id][['order_id']].drop_duplicates()
     item_count = trans_items[trans_items['order_id'].isin(tx['order_id'])]
-    avg_basket = item_count.groupby('order_id').size().mean()
+    avg_basket = item_count.groupby('order_id', observed=True).size().mean()
     return round(avg_basket, 2)
 
 def get_average_order_value(merchant_id, transactions):
@@ -63,8 +192,8 @@ def get_top_selling_items(merchant_id, trans_items, transactions, items, top_n=5
     merchant_items = merged[merged['merchant_id'] == merchant_id]
 
     # Count sales
-    item_sales = merchant_items.groupby(['item_id', 'item_name']).size().reset_index(name='num_sales')
-    
+    item_sales = merchant_items.groupby(['item_id', 'item_name'], observed=True).size().reset_index(name='num_sales')
+
     # Sort and return top
     top_items = item_sales.sort_values(by='num_sales', ascending=False).head(top_n)
     return top_items.to_dict(orient='records')
@@ -78,8 +207,8 @@ def get_bottom_selling_items(merchant_id, trans_items, transactions, items, bott
     merchant_items = merged[merged['merchant_id'] == merchant_id]
 
     # Count sales
-    item_sales = merchant_items.groupby(['item_id', 'item_name']).size().reset_index(name='num_sales')
-    
+    item_sales = merchant_items.groupby(['item_id', 'item_name'], observed=True).size().reset_index(name='num_sales')
+
     # Sort and return bottom
     bottom_items = item_sales.sort_values(by='num_sales', ascending=True).head(bottom_n)
     return bottom_items.to_dict(orient='records')
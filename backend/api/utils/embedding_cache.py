@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: compactions by different workers are not coordinated
+    fcntl = None
+
+LOCK_FILE = '.compact.lock'
+
+
+@contextmanager
+def compact_lock(directory):
+    """Held while shards are merged, so two workers never compact the same files"""
+    try:
+        lock = open(Path(directory) / LOCK_FILE, 'a') if fcntl else None
+    except OSError:
+        lock = None
+    if lock is None:
+        yield
+        return
+    with lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class EmbeddingStore:
+    """Content-hashed embedding cache kept on disk as memory-mapped .npy shards
+
+    Every batch of newly encoded texts is written as its own shard
+    (``shard-*.npy`` plus a ``shard-*.json`` list of keys), so nothing already
+    on disk is ever rewritten and several workers can share the same directory.
+    Once there are more than max_shards, they are merged into one, so the
+    number of files and maps stays bounded. Keys hash the model name together
+    with the text, so changed texts and different models never collide.
+    """
+
+    def __init__(self, root, model_name, loader, max_shards=16):
+        self.model_name = model_name
+        self.dir = Path(root) / re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+        self.max_shards = max_shards
+        self._loader = loader
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._index = {}
+        self._seen = set()
+        # Directory mtime at the last scan; new or removed shards change it
+        self._scanned = None
+        self.reload()
+
+    @property
+    def model(self):
+        """Underlying encoder, only loaded the first time a text is missing from the cache"""
+        with self._model_lock:
+            if self._model is None:
+                self._model = self._loader(self.model_name)
+            return self._model
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def fingerprint(self, texts):
+        """Identifies this model and list of texts, for artifacts built from their embeddings"""
+        digest = hashlib.sha256(self.model_name.encode('utf-8'))
+        for text in texts:
+            digest.update(b'\0' + text.encode('utf-8'))
+        return digest.hexdigest()
+
+    def reload(self):
+        """Map any shards on disk this process has not seen yet (including other workers')"""
+        with self._lock:
+            self._load_new_shards()
+
+    def _load_new_shards(self):
+        try:
+            mtime = self.dir.stat().st_mtime_ns
+        except OSError:
+            return
+        # Nothing was added or removed since the last scan, so there is nothing to map. A
+        # recent mtime may not have ticked for a change made within the same clock step.
+        if mtime == self._scanned and time.time_ns() - mtime > 10**9:
+            return
+        names = sorted(path.name for path in self.dir.glob('shard-*.json'))
+        if self._seen - set(names):
+            # Shards were merged away; map what is there now instead of keeping stale maps
+            self._shards, self._index, self._seen = [], {}, set()
+        for name in names:
+            if name not in self._seen:
+                self._map_shard(self.dir / name)
+        self._scanned = mtime
+
+    def _map_shard(self, keys_path):
+        try:
+            keys = json.loads(keys_path.read_text())
+            vectors = np.load(keys_path.with_suffix('.npy'), mmap_mode='r')
+        except (OSError, ValueError) as e:
+            print(f"Skipping embedding shard {keys_path.name}: {e}")
+            return
+        if len(keys) != len(vectors):
+            print(f"Skipping embedding shard {keys_path.name}: key count mismatch")
+            return
+
+        shard_no = len(self._shards)
+        self._shards.append(vectors)
+        self._seen.add(keys_path.name)
+        for row, key in enumerate(keys):
+            self._index.setdefault(key, (shard_no, row))
+
+    def _write_shard(self, keys, vectors):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        name = f"shard-{time.time_ns()}-{os.getpid()}"
+        vectors_path = self.dir / f"{name}.npy"
+        keys_path = self.dir / f"{name}.json"
+
+        # The keys file is written last, so readers never see a shard without its vectors
+        tmp_vectors = self.dir / f".{name}.npy.tmp"
+        with open(tmp_vectors, 'wb') as f:
+            np.save(f, np.asarray(vectors, dtype=np.float32))
+        os.replace(tmp_vectors, vectors_path)
+        tmp_keys = self.dir / f".{name}.json.tmp"
+        tmp_keys.write_text(json.dumps(keys))
+        os.replace(tmp_keys, keys_path)
+
+    def _compact(self):
+        """Merge every shard on disk into one once there are more than max_shards"""
+        with compact_lock(self.dir):
+            paths = sorted(self.dir.glob('shard-*.json'))
+            if len(paths) <= self.max_shards:
+                return
+            keys, vectors, merged = [], [], set()
+            for keys_path in paths:
+                try:
+                    shard_keys = json.loads(keys_path.read_text())
+                    shard_vectors = np.load(keys_path.with_suffix('.npy'))
+                except (OSError, ValueError):
+                    continue
+                if len(shard_keys) != len(shard_vectors):
+                    continue
+                rows = [row for row, key in enumerate(shard_keys) if key not in merged]
+                merged.update(shard_keys[row] for row in rows)
+                keys += [shard_keys[row] for row in rows]
+                vectors.append(shard_vectors[rows])
+            self._write_shard(keys, np.concatenate(vectors))
+            # Workers that mapped the old files keep reading them until their next scan
+            for keys_path in paths:
+                keys_path.unlink(missing_ok=True)
+                keys_path.with_suffix('.npy').unlink(missing_ok=True)
+
+    def encode(self, texts):
+        """Embeddings for texts in input order, encoding only the ones not cached yet"""
+        texts = list(texts)
+        keys = [self.key(text) for text in texts]
+
+        with self._lock:
+            missing = {key: text for key, text in zip(keys, texts) if key not in self._index}
+            if missing:
+                self._load_new_shards()
+                missing = {key: text for key, text in missing.items() if key not in self._index}
+
+        if missing:
+            # Outside the lock, so requests whose texts are all cached don't wait on the model
+            vectors = self.model.encode(list(missing.values()))
+            with self._lock:
+                self._write_shard(list(missing.keys()), vectors)
+                if len(self._seen) >= self.max_shards:
+                    self._compact()
+                self._load_new_shards()
+
+        with self._lock:
+            locations = np.array([self._index[key] for key in keys], dtype=np.int64).reshape(-1, 2)
+            shards = self._shards
+        dim = shards[0].shape[1] if shards else 0
+        result = np.empty((len(keys), dim), dtype=np.float32)
+        # Gather shard by shard so each mmap is read with a single fancy index
+        for shard in np.unique(locations[:, 0]):
+            mask = locations[:, 0] == shard
+            result[mask] = shards[shard][locations[mask, 1]]
+        return result
@@ -0,0 +1,107 @@
+from .alerts import BOTTLENECKS
+
+# Rule-based stand-ins for Gemini output, built from the same inputs as the
+# prompts. The recommendation and alert endpoints answer with these when the
+# model misses the request's deadline or fails.
+
+SLOW_DELIVERY_MINUTES = 40
+SMALL_BASKET = 2
+
+
+def item_names(items, n=3):
+    return [item['item_name'] for item in items[:n]]
+
+def hour_labels(hours):
+    return [f'{hour}:00' for hour in hours]
+
+def rule_recommendations(result):
+    """3 to 5 recommendations in the model's format from a recommendations response"""
+    metrics = result['metrics']
+    top = item_names(metrics['top_items'])
+    under = [name for name in item_names(metrics['underperforming_items']) if name not in top]
+    peak_hours = hour_labels(list(metrics['peak_hours'])[:3])
+    peak_days = ' and '.join(list(metrics['peak_days'])[:2])
+    recommendations = []
+
+    if under:
+        recommendations.append({
+            "title": "Revive or retire underperforming items",
+            "rationale": f"{', '.join(under)} sell the least on your menu and take up space and preparation time.",
+            "action_steps": [
+                f"Pair {under[0]} with {top[0] if top else 'a best seller'} in a limited-time bundle",
+                "Refresh the photos and descriptions of these items",
+                "Remove items that still don't sell after two weeks",
+            ],
+            "expected_impact": "A leaner menu with higher sales per item",
+        })
+    if peak_hours:
+        recommendations.append({
+            "title": "Prepare for your peak hours",
+            "rationale": f"Most orders come in around {', '.join(peak_hours)}" + (f", especially on {peak_days}." if peak_days else "."),
+            "action_steps": [
+                "Schedule extra staff for these hours",
+                f"Prep ingredients for {', '.join(top) or 'your best sellers'} before the rush",
+                "Pause slow-to-make items if the kitchen falls behind",
+            ],
+            "expected_impact": "Shorter preparation times and fewer cancelled orders at peak",
+        })
+        recommendations.append({
+            "title": "Run off-peak promotions",
+            "rationale": f"Outside {', '.join(peak_hours)} your kitchen has spare capacity.",
+            "action_steps": [
+                "Offer a small discount or free add-on in your quietest hours",
+                "Promote it with a banner on your store page",
+                "Compare off-peak orders before and after two weeks",
+            ],
+            "expected_impact": "More orders in quiet hours without straining peak service",
+        })
+    if top and (metrics['average_basket_size'] or 0) < SMALL_BASKET:
+        recommendations.append({
+            "title": "Bundle best sellers to grow basket size",
+            "rationale": f"Customers order {metrics['average_basket_size']} items on average; {top[0]} is your most popular item.",
+            "action_steps": [
+                f"Create a combo of {top[0]} with a side or drink",
+                "Price the combo slightly below the items bought separately",
+                "Feature the combo at the top of your menu",
+            ],
+            "expected_impact": "A higher average order value",
+        })
+    if (metrics['average_delivery_time'] or 0) > SLOW_DELIVERY_MINUTES:
+        recommendations.append({
+            "title": "Cut delivery times",
+            "rationale": f"Orders take {metrics['average_delivery_time']} minutes to deliver on average.",
+            "action_steps": [
+                "Mark orders ready only when they are packed",
+                "Keep a pickup shelf near the entrance for drivers",
+                "Simplify packaging for items that slow down handover",
+            ],
+            "expected_impact": "Faster deliveries and better ratings",
+        })
+    if len(recommendations) < 3 and top:
+        recommendations.append({
+            "title": "Promote your best sellers",
+            "rationale": f"{', '.join(top)} are what customers order most.",
+            "action_steps": [
+                "Put them first on your menu with good photos",
+                "Keep them in stock through your busiest days",
+            ],
+            "expected_impact": "More conversions from store visits",
+        })
+    return recommendations[:5]
+
+def rule_insights(result):
+    """Plain-text insights like the model's from an alerts response"""
+    slow = {message for _, _, message, _ in BOTTLENECKS}
+    insights = [
+        f"{message} Review your preparation and handover process to keep orders moving."
+        for message in result['bottleneck_alerts'] if message in slow
+    ]
+    high = result['inventory_status']['high_selling_items']
+    low = [item for item in result['inventory_status']['low_selling_items'] if item not in high]
+    if high:
+        insights.append(f"{', '.join(high[:3])} are selling fast today. Check stock so they don't run out before closing.")
+    if low:
+        insights.append(f"{', '.join(low[:3])} are barely selling today. Consider a bundle or discount to move them.")
+    if not insights:
+        insights.append("Operations look normal today. Keep stock of your best sellers topped up for the next rush.")
+    return '\n'.join(f"{i}. {insight}" for i, insight in enumerate(insights[:3], start=1))
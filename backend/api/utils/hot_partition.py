@@ -0,0 +1,85 @@
+import pandas as pd
+
+from .merchant_index import extend_categories
+
+
+def latest_days(frame, key, days):
+    """Rows within `days` days of their merchant's latest order date, in their original order"""
+    dates = frame['order_time'].dt.normalize()
+    latest = dates.groupby(frame[key], observed=True).transform('max')
+    return frame[dates > latest - pd.Timedelta(days=days)]
+
+
+class HotPartition:
+    """The most recent days of each merchant's orders, kept apart from the history
+
+    The realtime and alert endpoints only look at a merchant's latest day. Each
+    merchant's recent rows are stored with row positions per date, so those
+    requests cost the size of one day rather than a scan of the whole history.
+    """
+
+    def __init__(self, parts, days, dtypes=None):
+        self.parts = parts  # merchant_id -> (rows of the last `days` days, {date: row positions}, latest date)
+        self.days = days
+        # Column dtypes the parts are read with; appends extend their categories
+        self.dtypes = dtypes or {}
+
+    @classmethod
+    def build(cls, frame, key, known_merchants, days=7):
+        hot = latest_days(frame, key, days)
+        parts = {
+            merchant_id: cls._part(rows)
+            for merchant_id, rows in hot.groupby(key, observed=True, sort=False)
+            if merchant_id in known_merchants
+        }
+        return cls(parts, days, dict(frame.dtypes))
+
+    @staticmethod
+    def _part(rows):
+        rows = rows.reset_index(drop=True)
+        positions = rows.groupby(rows['order_time'].dt.normalize()).indices
+        return rows, positions, max(positions)
+
+    def appended(self, delta, key, known_merchants, dtypes):
+        """A new partition with newly appended rows added; only their merchants' windows are recomputed
+
+        delta and dtypes come from cast_delta, so a merchant's rows are joined
+        as they are and no category set is rebuilt.
+        """
+        parts = dict(self.parts)
+        for merchant_id, rows in delta.groupby(key, observed=True, sort=False):
+            if merchant_id not in known_merchants:
+                continue
+            rows = rows.reset_index(drop=True)
+            if merchant_id in parts:
+                rows = pd.concat([extend_categories(parts[merchant_id][0], dtypes), rows], ignore_index=True)
+            dates = rows['order_time'].dt.normalize()
+            rows = rows[dates > dates.max() - pd.Timedelta(days=self.days)]
+            if len(rows):
+                parts[merchant_id] = self._part(rows)
+        return HotPartition(parts, self.days, dtypes)
+
+    def __contains__(self, merchant_id):
+        return merchant_id in self.parts
+
+    def latest_date(self, merchant_id):
+        part = self.parts.get(merchant_id)
+        return part[2] if part is not None else None
+
+    def latest_frame(self):
+        """Every merchant's latest day as one frame, for computing all merchants at once"""
+        if not self.parts:
+            return pd.DataFrame()
+        frames = [extend_categories(rows.iloc[positions[latest]], self.dtypes) for rows, positions, latest in self.parts.values()]
+        return pd.concat(frames, ignore_index=True)
+
+    def get(self, merchant_id, date=None):
+        """A merchant's rows on one date, by default its latest; empty if it has none"""
+        part = self.parts.get(merchant_id)
+        if part is None:
+            return pd.DataFrame()
+        rows, positions, latest = part
+        date = latest if date is None else pd.Timestamp(date).normalize()
+        if date not in positions:
+            return rows.iloc[:0]
+        return rows.iloc[positions[date]].reset_index(drop=True)
@@ -0,0 +1,124 @@
+import hashlib
+import io
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+from .data_loader import DATASET_FILES, data_dir, parse_transaction_times, source_stamps
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends and reads are not coordinated
+    fcntl = None
+
+# New orders are appended to the end of these two files. A reload that finds
+# only them grown reads just the new bytes and folds them into the loaded data;
+# any other change to the files needs a full reload.
+APPENDABLE = ['transactions', 'trans_items']
+LOCK_FILE = '.ingest.lock'
+MARK_BYTES = 4096
+
+
+@contextmanager
+def data_lock(data_dir=data_dir, exclusive=False):
+    """Writers hold it exclusively while appending, readers shared while stamping and reading"""
+    try:
+        lock = open(Path(data_dir) / LOCK_FILE, 'a') if fcntl else None
+    except OSError:
+        lock = None  # read-only data directory, so nobody is appending either
+    if lock is None:
+        yield
+        return
+    with lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def tail_mark(path, size):
+    """Digest of the bytes just before size, to tell an append from a rewrite"""
+    with open(path, 'rb') as f:
+        f.seek(max(size - MARK_BYTES, 0))
+        return hashlib.sha1(f.read(min(size, MARK_BYTES))).hexdigest()[:16]
+
+def _stamp(data_dir):
+    stamps = source_stamps(data_dir)
+    for name in APPENDABLE:
+        filename = DATASET_FILES[name]
+        stamps[filename]['mark'] = tail_mark(Path(data_dir) / filename, stamps[filename]['size'])
+    return stamps
+
+def stamp_sources(data_dir=data_dir):
+    """source_stamps plus a tail mark for each appendable file"""
+    with data_lock(data_dir):
+        return _stamp(data_dir)
+
+def read_range(path, start, stop):
+    """The CSV rows stored in bytes [start, stop) of path, parsed with the file's header"""
+    with open(path, 'rb') as f:
+        header = f.readline() if start else b''
+        f.seek(start)
+        body = f.read(stop - start)
+    return pd.read_csv(io.BytesIO(header + body))
+
+def read_appended(sources, data_dir=data_dir):
+    """({name: new rows}, new stamps) for the orders appended since sources were
+    stamped, or None if the files changed in any other way
+    """
+    with data_lock(data_dir):
+        stamps = _stamp(data_dir)
+        for name, filename in DATASET_FILES.items():
+            old, new = sources[filename], stamps[filename]
+            if name not in APPENDABLE:
+                if (old['size'], old['mtime_ns']) != (new['size'], new['mtime_ns']):
+                    return None
+                continue
+            path = Path(data_dir) / filename
+            if new['size'] < old['size'] or tail_mark(path, old['size']) != old['mark']:
+                return None
+            # Rows appended to a file without a final newline would run into its last row
+            with open(path, 'rb') as f:
+                f.seek(max(old['size'] - 1, 0))
+                if old['size'] and f.read(1) != b'\n':
+                    return None
+
+        frames = {}
+        for name in APPENDABLE:
+            filename = DATASET_FILES[name]
+            frames[name] = read_range(Path(data_dir) / filename, sources[filename]['size'], stamps[filename]['size'])
+    parse_transaction_times(frames['transactions'])
+    return frames, stamps
+
+def append_orders(transactions, trans_items, data_dir=data_dir):
+    """Append whole orders, i.e. order rows and all of their items, to the order CSVs
+
+    Both frames need every column of the file they go to. Running servers pick
+    the rows up on their next reload without reading the history again.
+    """
+    frames = {'transactions': transactions, 'trans_items': trans_items}
+    orphans = set(trans_items['order_id'].astype(str)) - set(transactions['order_id'].astype(str))
+    if orphans:
+        raise ValueError(f"Items reference orders missing from this batch: {sorted(orphans)[:5]}")
+
+    with data_lock(data_dir, exclusive=True):
+        # Check both files before writing either, so a bad batch leaves neither half-appended
+        columns = {}
+        for name, df in frames.items():
+            path = Path(data_dir) / DATASET_FILES[name]
+            columns[name] = pd.read_csv(path, nrows=0).columns.tolist()
+            missing = [col for col in columns[name] if col not in df.columns]
+            if missing:
+                raise ValueError(f"{DATASET_FILES[name]} rows are missing columns: {missing}")
+
+        for name, df in frames.items():
+            path = Path(data_dir) / DATASET_FILES[name]
+            with open(path, 'rb+') as f:
+                size = f.seek(0, 2)
+                if size:
+                    f.seek(size - 1)
+                    if f.read(1) != b'\n':
+                        f.write(b'\n')
+            df[columns[name]].to_csv(path, mode='a', header=False, index=False)
+    return {name: len(df) for name, df in frames.items()}
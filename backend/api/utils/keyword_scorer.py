@@ -0,0 +1,115 @@
+import re
+import numpy as np
+
+
+def normalize_rows(matrix):
+    """L2-normalize rows as a contiguous float32 array, leaving zero rows at zero"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return np.ascontiguousarray(matrix / norms)
+
+
+class KeywordScorer:
+    """Keyword vector index and static score components, prepared once for batched scoring
+
+    With an exact (flat) index every keyword is scored. With an approximate one,
+    each item only scores its `candidates` nearest keywords plus the keywords
+    with the best business and cuisine scores for its cuisine, which can
+    outrank closer but less popular ones.
+    """
+
+    SEMANTIC_WEIGHT = 0.5
+    BUSINESS_WEIGHT = 0.3
+    CUISINE_WEIGHT = 0.2
+
+    def __init__(self, keywords_df, index, cuisine_keywords, candidates=256):
+        self.keywords = keywords_df.reset_index(drop=True)
+        self.index = index
+        self.candidates = candidates
+        self._static_top = {}
+        self.checkout = self.keywords['checkout'].to_numpy()
+        self.order = self.keywords['order'].to_numpy()
+
+        # Normalize business metrics
+        self.business_scores = (
+            0.4 * (self.checkout / self.checkout.max()) +
+            0.6 * (self.order / self.order.max())
+        )
+
+        # Keyword contains a cuisine-specific term
+        lowered = self.keywords['keyword'].str.lower()
+        self.cuisine_scores = {
+            cuisine: lowered.str.contains('|'.join(map(re.escape, terms))).to_numpy(dtype=np.float64)
+            for cuisine, terms in cuisine_keywords.items()
+        }
+        self.no_cuisine = np.zeros(len(self.keywords))
+
+    def static_scores(self, cuisine):
+        """Business and cuisine part of the combined score for one cuisine"""
+        return (
+            self.BUSINESS_WEIGHT * self.business_scores +
+            self.CUISINE_WEIGHT * self.cuisine_scores.get(cuisine, self.no_cuisine)
+        )
+
+    def static_top(self, cuisine):
+        """Keywords with the highest static scores for a cuisine, computed once"""
+        if cuisine not in self._static_top:
+            scores = self.static_scores(cuisine)
+            k = min(self.candidates, len(scores))
+            self._static_top[cuisine] = np.argpartition(-scores, k - 1)[:k]
+        return self._static_top[cuisine]
+
+    def recommend(self, item_embeddings, cuisines, top_k=5, min_score=0.4):
+        """Top keywords for each item, as lists of records in item order"""
+        if len(self.keywords) == 0:
+            return [[] for _ in cuisines]
+
+        queries = normalize_rows(item_embeddings)
+        if not self.index.exact:
+            neighbours = self.index.search(queries, self.candidates)
+            return [
+                self._recommend_approximate(query, cuisine, semantic, idx, top_k, min_score)
+                for query, cuisine, (semantic, idx) in zip(queries, cuisines, neighbours)
+            ]
+
+        semantic = self.index.scores(queries)
+        combined = self.SEMANTIC_WEIGHT * semantic.astype(np.float64)
+        cuisines = np.asarray(cuisines, dtype=object)
+        for cuisine in set(cuisines):
+            combined[cuisines == cuisine] += self.static_scores(cuisine)
+
+        k = min(top_k, combined.shape[1])
+        candidates = np.sort(np.argpartition(-combined, k - 1, axis=1)[:, :k], axis=1)
+        return [self._records(scores[idx], idx, min_score) for scores, idx in zip(combined, candidates)]
+
+    def _recommend_approximate(self, query, cuisine, semantic, idx, top_k, min_score):
+        extra = np.setdiff1d(self.static_top(cuisine), idx)
+        idx = np.concatenate([idx, extra])
+        semantic = np.concatenate([semantic, self.index.reconstruct(extra) @ query])
+
+        cuisine_scores = self.cuisine_scores.get(cuisine, self.no_cuisine)
+        combined = (
+            self.SEMANTIC_WEIGHT * semantic.astype(np.float64) +
+            self.BUSINESS_WEIGHT * self.business_scores[idx] +
+            self.CUISINE_WEIGHT * cuisine_scores[idx]
+        )
+        best = np.argsort(-combined, kind='stable')[:top_k]
+        return self._records(combined[best], idx[best], min_score)
+
+    def _records(self, scores, idx, min_score):
+        """scores[i] is the combined score of keyword idx[i]"""
+        keep = scores > min_score
+        scores, idx = scores[keep], idx[keep]
+        # Highest score first, then checkout and order as tie-breakers
+        order = np.lexsort((-self.order[idx], -self.checkout[idx], -scores))
+        scores, idx = scores[order], idx[order]
+        return [
+            {
+                'keyword': self.keywords.at[i, 'keyword'],
+                'score': float(score),
+                'checkout': self.checkout[i].item(),
+                'order': self.order[i].item(),
+            }
+            for score, i in zip(scores, idx)
+        ]
@@ -0,0 +1,323 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError
+from contextlib import closing
+from pathlib import Path
+
+from .llm_gateway import LLMUnavailableError
+
+
+class InProcessBackend:
+    """Size-bounded LRU with per-entry expiry, private to this worker"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires_at = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # Nothing here blocks, so the async API just calls through
+    async def aget(self, key, default=None):
+        return self.get(key, default)
+
+    async def aset(self, key, value, timeout=None):
+        self.set(key, value, timeout)
+
+
+class DjangoCacheBackend:
+    """Entries in a Django cache (e.g. Redis or database), shared by every worker"""
+
+    def __init__(self, alias='default'):
+        from django.core.cache import caches
+        self.cache = caches[alias]
+
+    def get(self, key, default=None):
+        return self.cache.get(key, default)
+
+    def set(self, key, value, timeout=None):
+        self.cache.set(key, value, timeout)
+
+    def clear(self):
+        self.cache.clear()
+
+    async def aget(self, key, default=None):
+        return await self.cache.aget(key, default)
+
+    async def aset(self, key, value, timeout=None):
+        await self.cache.aset(key, value, timeout)
+
+
+class InFlightCalls:
+    """Single-flight within this process: while a key is being computed, other
+    callers for it wait on the same future instead of calling again
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def join(self, key):
+        """(future, True) for the caller that must compute key, (future, False) for the rest"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def finish(self, key, future, text=None, error=None):
+        """Release key and hand the leader's text or error to the waiting callers"""
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if error is not None and not isinstance(error, Exception):
+            # The leader was cancelled or interrupted; the others get an error, not its cancellation
+            error = LLMUnavailableError(f"The shared LLM call was abandoned: {error!r}")
+        if future.done():
+            return
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(text)
+        except InvalidStateError:
+            # Cancelled between the check and here
+            pass
+
+
+class SQLiteFlights:
+    """Single-flight across workers through a SQLite file of their own
+
+    The worker that claims a key calls the model and publishes the text in the
+    row; the others poll the row. A claim expires after ttl seconds, so a worker
+    that died mid-call doesn't block the key.
+    """
+
+    table = 'flights'
+
+    def __init__(self, path, ttl=60):
+        self.path = str(path)
+        self.ttl = ttl
+        self._created = False
+
+    def _connect(self):
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._created:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} "
+                "(key TEXT PRIMARY KEY, text TEXT, expires_at REAL NOT NULL)"
+            )
+            self._created = True
+        return conn
+
+    def claim(self, key):
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+            cursor = conn.execute(
+                f"INSERT OR IGNORE INTO {self.table} (key, text, expires_at) VALUES (?, NULL, ?)",
+                (key, now + self.ttl),
+            )
+            return cursor.rowcount == 1
+
+    def publish(self, key, text):
+        # Kept for ttl more seconds, for workers still polling
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"UPDATE {self.table} SET text = ?, expires_at = ? WHERE key = ?",
+                (text, time.time() + self.ttl, key),
+            )
+
+    def abandon(self, key):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ? AND text IS NULL", (key,))
+
+    def poll(self, key):
+        """The published text, or None while the call is still running"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                f"SELECT text FROM {self.table} WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+
+class CacheFlights:
+    """Single-flight across workers through a Django cache; add() is the atomic claim"""
+
+    def __init__(self, alias='default', ttl=60):
+        from django.core.cache import caches
+        self.cache = caches[alias]
+        self.ttl = ttl
+
+    def claim(self, key):
+        return self.cache.add(f"{key}:flight", '', self.ttl)
+
+    def publish(self, key, text):
+        self.cache.set(f"{key}:flight", text, self.ttl)
+
+    def abandon(self, key):
+        self.cache.delete(f"{key}:flight")
+
+    def poll(self, key):
+        return self.cache.get(f"{key}:flight") or None
+
+
+class LLMResponseCache:
+    """Caches model output by endpoint, merchant data version and the exact prompt
+
+    The version is the caller's, i.e. the registry's version of the merchant's
+    data (views.data_version): new data makes every older entry for that
+    merchant unreachable, and they then age out through the TTL and LRU bound.
+    Identical requests that miss together make one model call: within a worker
+    always, and across workers when flights is set.
+    """
+
+    def __init__(self, backend, ttl=900, flights=None, wait_timeout=60, poll_interval=0.1):
+        self.backend = backend
+        self.ttl = ttl
+        self.in_flight = InFlightCalls()
+        self.flights = flights
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+
+    def key(self, endpoint, merchant_id, prompt, version=''):
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        return f"llm:{endpoint}:{merchant_id}:{version}:{digest}"
+
+    def get_or_call(self, endpoint, merchant_id, prompt, call, version=''):
+        """Cached text for this prompt and data version, or call() to produce and store it"""
+        key = self.key(endpoint, merchant_id, prompt, version)
+        text = self.backend.get(key)
+        if text is not None:
+            return text
+
+        future, leader = self.in_flight.join(key)
+        if not leader:
+            return future.result(self.wait_timeout)
+        text = error = None
+        try:
+            text = self._call_once(key, call)
+            return text
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.in_flight.finish(key, future, text, error)
+
+    def _call_once(self, key, call):
+        """call() unless another worker is already making it, then its published text"""
+        deadline = time.monotonic() + self.wait_timeout
+        while self.flights is not None and time.monotonic() < deadline:
+            if self.flights.claim(key):
+                break
+            time.sleep(self.poll_interval)
+            text = self.flights.poll(key)
+            if text is not None:
+                self.backend.set(key, text, self.ttl)
+                return text
+            # No reply yet; claiming again succeeds if that worker failed and released the key
+        return self._call_and_store(key, call)
+
+    def _call_and_store(self, key, call):
+        try:
+            text = call()
+        except BaseException:
+            if self.flights is not None:
+                self.flights.abandon(key)
+            raise
+        self.backend.set(key, text, self.ttl)
+        if self.flights is not None:
+            self.flights.publish(key, text)
+        return text
+
+    async def aget_or_call(self, endpoint, merchant_id, prompt, call, version=''):
+        """Async get_or_call; call is a coroutine function"""
+        key = self.key(endpoint, merchant_id, prompt, version)
+        text = await self.backend.aget(key)
+        if text is not None:
+            return text
+
+        future, leader = self.in_flight.join(key)
+        if not leader:
+            # Shielded, so a follower that times out or is cancelled doesn't cancel the shared future
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.wait_timeout)
+        text = error = None
+        try:
+            text = await self._acall_once(key, call)
+            return text
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.in_flight.finish(key, future, text, error)
+
+    async def _acall_once(self, key, call):
+        # Same as _call_once; the flight table or cache is blocking I/O, so it runs in a thread
+        deadline = time.monotonic() + self.wait_timeout
+        while self.flights is not None and time.monotonic() < deadline:
+            if await asyncio.to_thread(self.flights.claim, key):
+                break
+            await asyncio.sleep(self.poll_interval)
+            text = await asyncio.to_thread(self.flights.poll, key)
+            if text is not None:
+                await self.backend.aset(key, text, self.ttl)
+                return text
+
+        try:
+            text = await call()
+        except BaseException:
+            if self.flights is not None:
+                # Called directly rather than in a thread, so a cancelled task still releases the claim
+                self.flights.abandon(key)
+            raise
+        await self.backend.aset(key, text, self.ttl)
+        if self.flights is not None:
+            await asyncio.to_thread(self.flights.publish, key, text)
+        return text
+
+
+def build_llm_cache(settings):
+    backend_name = getattr(settings, 'LLM_CACHE_BACKEND', 'memory')
+    if backend_name == 'django':
+        backend = DjangoCacheBackend(getattr(settings, 'LLM_CACHE_ALIAS', 'default'))
+    else:
+        backend = InProcessBackend(getattr(settings, 'LLM_CACHE_MAX_ENTRIES', 1024))
+
+    flights_name = getattr(settings, 'LLM_SINGLE_FLIGHT', None)
+    wait_timeout = getattr(settings, 'LLM_SINGLE_FLIGHT_TIMEOUT', 60)
+    if flights_name == 'sqlite':
+        path = getattr(settings, 'LLM_SINGLE_FLIGHT_SQLITE_PATH', Path(settings.BASE_DIR) / 'data' / 'llm_flights.sqlite3')
+        flights = SQLiteFlights(path, wait_timeout)
+    elif flights_name == 'django':
+        flights = CacheFlights(getattr(settings, 'LLM_CACHE_ALIAS', 'default'), wait_timeout)
+    else:
+        flights = None
+    return LLMResponseCache(backend, ttl=getattr(settings, 'LLM_CACHE_TTL', 900), flights=flights, wait_timeout=wait_timeout)
@@ -0,0 +1,420 @@
+import asyncio
+import math
+import random
+import threading
+import time
+
+# Every Gemini call goes through one LLMGateway per process. It holds the
+# configured client, caps calls in flight, rate-limits globally and per
+# merchant, retries quota and availability errors with exponential backoff,
+# and stops calling for a while once calls keep failing (circuit breaker).
+
+
+class LLMUnavailableError(Exception):
+    """The model can't be called right now; views turn this into a 503"""
+
+class CircuitOpenError(LLMUnavailableError):
+    pass
+
+class RateLimitedError(LLMUnavailableError):
+    pass
+
+class GatewayBusyError(LLMUnavailableError):
+    pass
+
+
+def is_retryable(error):
+    """Quota, overload and timeout errors, which are worth retrying after a pause"""
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return isinstance(error, TimeoutError)
+    return isinstance(error, (
+        exceptions.TooManyRequests,
+        exceptions.ResourceExhausted,
+        exceptions.ServiceUnavailable,
+        exceptions.InternalServerError,
+        exceptions.DeadlineExceeded,
+        TimeoutError,
+    ))
+
+
+def is_transient(error):
+    """Failures of the service rather than of the request: the retryable errors and any 5xx
+
+    Only these count towards opening the breaker; a rejected prompt says
+    nothing about whether the service is up.
+    """
+    if is_retryable(error):
+        return True
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return False
+    return isinstance(error, exceptions.ServerError)
+
+
+class TokenBucket:
+    """rate tokens per second, up to burst saved up; thread-safe"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait):
+        """Take a token and return how long to wait before using it
+
+        Raises RateLimitedError instead if that would be longer than max_wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if wait > max_wait:
+                raise RateLimitedError(f"LLM rate limit reached; next call possible in {wait:.0f}s")
+            # Tokens may go negative: callers already waiting hold a place in line
+            self.tokens -= 1
+            return wait
+
+    def refund(self):
+        """Give back a token taken by reserve() that won't be used"""
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+    def is_full(self, now):
+        """True once the bucket has refilled, when it behaves like a new one"""
+        with self._lock:
+            return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class CircuitBreaker:
+    """Opens after `failures` consecutive failed attempts and fails fast for reset_after
+    seconds. After that it is half-open: one probe call goes through while the
+    others keep failing fast; its success closes the breaker, its failure
+    reopens it. A probe that never reports back is replaced after reset_after.
+    """
+
+    def __init__(self, failures=5, reset_after=30):
+        self.failures = failures
+        self.reset_after = reset_after
+        self.consecutive = 0
+        self.opened_at = None
+        self.probe_started = None
+        self._lock = threading.Lock()
+
+    def check(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            now = time.monotonic()
+            retry_at = max(self.opened_at, self.probe_started or 0) + self.reset_after
+            if retry_at <= now:
+                self.probe_started = now
+                return
+            raise CircuitOpenError(f"LLM calls are paused after repeated failures; retry in {math.ceil(retry_at - now)}s")
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive = 0
+            self.opened_at = None
+            self.probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive += 1
+            if self.consecutive >= self.failures or self.probe_started is not None:
+                self.opened_at = time.monotonic()
+                self.probe_started = None
+
+
+# --- Backends ---
+
+class GeminiBackend:
+    """google-generativeai, configured once per process"""
+
+    requires_key = True
+
+    def __init__(self, api_key, model_name='gemini-2.0-flash', timeout=30):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.timeout = timeout
+        self._genai = None
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def model(self, system_instruction=None):
+        with self._lock:
+            if self._genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=self.api_key)
+                self._genai = genai
+            # Chat instructions differ per merchant, so only the plain model is kept
+            if system_instruction is not None:
+                return self._genai.GenerativeModel(self.model_name, system_instruction=system_instruction)
+            if None not in self._models:
+                self._models[None] = self._genai.GenerativeModel(self.model_name)
+            return self._models[None]
+
+    def request_options(self):
+        return {'timeout': self.timeout} if self.timeout else None
+
+    def generate(self, prompt):
+        return self.model().generate_content(prompt, request_options=self.request_options()).text
+
+    async def agenerate(self, prompt):
+        response = await self.model().generate_content_async(prompt, request_options=self.request_options())
+        return response.text
+
+    def start_chat(self, system_instruction, history):
+        return self.model(system_instruction).start_chat(history=history)
+
+    def send(self, chat, message, stream=False):
+        return chat.send_message(message, stream=stream, request_options=self.request_options())
+
+    async def asend(self, chat, message, stream=False):
+        return await chat.send_message_async(message, stream=stream, request_options=self.request_options())
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeStream:
+    """Chunks of a streamed reply, iterable both sync and async"""
+
+    def __init__(self, text, size=16):
+        self.chunks = [FakeResponse(text[i:i + size]) for i in range(0, len(text), size)] or [FakeResponse('')]
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    async def _agen(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    def __aiter__(self):
+        return self._agen()
+
+
+class FakeChat:
+    def __init__(self, backend, system_instruction, history):
+        self.backend = backend
+        self.system_instruction = system_instruction
+        self.history = list(history or [])
+
+
+class FakeBackend:
+    """Local stand-in for tests and development: no network, deterministic replies
+
+    reply(prompt) produces the text (by default a JSON list echoing the prompt
+    length); fail_next() makes the next calls raise, latency delays each call.
+    Every prompt sent is kept in prompts.
+    """
+
+    requires_key = False
+
+    def __init__(self, reply=None, latency=0):
+        self.reply = reply or (lambda prompt: f'[{{"title": "Fake reply", "prompt_length": {len(prompt)}}}]')
+        self.latency = latency
+        self.prompts = []
+        self._failures = []
+        self._lock = threading.Lock()
+
+    def fail_next(self, count=1, error=None):
+        with self._lock:
+            self._failures += [error or TimeoutError('Fake LLM failure')] * count
+
+    def _respond(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+            error = self._failures.pop(0) if self._failures else None
+        if error is not None:
+            raise error
+        return self.reply(prompt)
+
+    def generate(self, prompt):
+        time.sleep(self.latency)
+        return self._respond(prompt)
+
+    async def agenerate(self, prompt):
+        await asyncio.sleep(self.latency)
+        return self._respond(prompt)
+
+    def start_chat(self, system_instruction, history):
+        return FakeChat(self, system_instruction, history)
+
+    def send(self, chat, message, stream=False):
+        text = self.generate(message)
+        return FakeStream(text) if stream else FakeResponse(text)
+
+    async def asend(self, chat, message, stream=False):
+        text = await self.agenerate(message)
+        return FakeStream(text) if stream else FakeResponse(text)
+
+
+# --- Gateway ---
+
+class LLMGateway:
+    def __init__(self, backend, max_in_flight=8, queue_timeout=10, rate=10, burst=20,
+                 merchant_rate=0.5, merchant_burst=5, max_retries=3, backoff_base=1.0, backoff_max=20,
+                 breaker_failures=5, breaker_reset=30, max_merchants=10000):
+        self.backend = backend
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.bucket = TokenBucket(rate, burst)
+        self.merchant_rate = merchant_rate
+        self.merchant_burst = merchant_burst
+        # Least recently used first; at most max_merchants buckets are kept
+        self.merchant_buckets = {}
+        self.max_merchants = max_merchants
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset)
+        self._lock = threading.Lock()
+
+    def _merchant_bucket(self, merchant_id):
+        with self._lock:
+            bucket = self.merchant_buckets.pop(merchant_id, None)
+            if bucket is None:
+                if len(self.merchant_buckets) >= self.max_merchants:
+                    self._prune()
+                bucket = TokenBucket(self.merchant_rate, self.merchant_burst)
+            self.merchant_buckets[merchant_id] = bucket
+            return bucket
+
+    def _prune(self):
+        # Refilled buckets are the same as new ones, so dropping them changes nothing;
+        # if that isn't enough, the least recently used go
+        now = time.monotonic()
+        for merchant_id, bucket in list(self.merchant_buckets.items()):
+            if bucket.is_full(now):
+                del self.merchant_buckets[merchant_id]
+        while len(self.merchant_buckets) >= self.max_merchants:
+            del self.merchant_buckets[next(iter(self.merchant_buckets))]
+
+    def _reserve(self, merchant_id):
+        """Seconds to wait for both the global and the merchant's rate limit"""
+        wait = self.bucket.reserve(self.queue_timeout)
+        if merchant_id is not None:
+            try:
+                wait = max(wait, self._merchant_bucket(merchant_id).reserve(self.queue_timeout))
+            except RateLimitedError:
+                # The call isn't made, so it mustn't use up other merchants' share
+                self.bucket.refund()
+                raise
+        return wait
+
+    def _refund(self, merchant_id):
+        """Give back the tokens _reserve took for a call that is not sent"""
+        self.bucket.refund()
+        if merchant_id is not None:
+            self._merchant_bucket(merchant_id).refund()
+
+    def _backoff(self, attempt):
+        # Full jitter, so callers that failed together don't retry together
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def call(self, fn, merchant_id=None):
+        """Run fn() (one model request) under the limits, retrying retryable errors"""
+        for attempt in range(self.max_retries + 1):
+            self.breaker.check()
+            time.sleep(self._reserve(merchant_id))
+            if not self.slots.acquire(timeout=self.queue_timeout):
+                self._refund(merchant_id)
+                raise GatewayBusyError("Too many LLM calls in flight")
+            try:
+                result = fn()
+            except Exception as e:
+                # Client errors (bad arguments, blocked text) are re-raised without touching the breaker
+                if is_transient(e):
+                    self.breaker.record_failure()
+                if not is_retryable(e):
+                    raise
+                error = e
+            else:
+                self.breaker.record_success()
+                return result
+            finally:
+                self.slots.release()
+            if attempt < self.max_retries:
+                time.sleep(self._backoff(attempt))
+        raise LLMUnavailableError(f"LLM call failed after {self.max_retries + 1} attempts: {error}")
+
+    async def acall(self, fn, merchant_id=None):
+        """Async call(); fn is a coroutine function"""
+        for attempt in range(self.max_retries + 1):
+            self.breaker.check()
+            await asyncio.sleep(self._reserve(merchant_id))
+            try:
+                await self._aacquire_slot()
+            except GatewayBusyError:
+                self._refund(merchant_id)
+                raise
+            try:
+                result = await fn()
+            except Exception as e:
+                if is_transient(e):
+                    self.breaker.record_failure()
+                if not is_retryable(e):
+                    raise
+                error = e
+            else:
+                self.breaker.record_success()
+                return result
+            finally:
+                self.slots.release()
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._backoff(attempt))
+        raise LLMUnavailableError(f"LLM call failed after {self.max_retries + 1} attempts: {error}")
+
+    async def _aacquire_slot(self):
+        # The semaphore is shared with sync callers, so poll it rather than block the event loop
+        deadline = time.monotonic() + self.queue_timeout
+        while not self.slots.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                raise GatewayBusyError("Too many LLM calls in flight")
+            await asyncio.sleep(0.01)
+
+    def generate(self, prompt, merchant_id=None):
+        return self.call(lambda: self.backend.generate(prompt), merchant_id)
+
+    async def agenerate(self, prompt, merchant_id=None):
+        return await self.acall(lambda: self.backend.agenerate(prompt), merchant_id)
+
+    def start_chat(self, system_instruction=None, history=None):
+        return self.backend.start_chat(system_instruction, history)
+
+    def send(self, chat, message, merchant_id=None, stream=False):
+        """Send a chat message; with stream, the limits cover the request, not reading the chunks"""
+        return self.call(lambda: self.backend.send(chat, message, stream), merchant_id)
+
+    async def asend(self, chat, message, merchant_id=None, stream=False):
+        return await self.acall(lambda: self.backend.asend(chat, message, stream), merchant_id)
+
+
+def build_llm_gateway(settings, api_key=None):
+    if getattr(settings, 'LLM_BACKEND', 'gemini') == 'fake':
+        backend = FakeBackend()
+    else:
+        backend = GeminiBackend(api_key, getattr(settings, 'LLM_MODEL', 'gemini-2.0-flash'), getattr(settings, 'LLM_TIMEOUT', 30))
+    return LLMGateway(
+        backend,
+        max_in_flight=getattr(settings, 'LLM_MAX_IN_FLIGHT', 8),
+        queue_timeout=getattr(settings, 'LLM_QUEUE_TIMEOUT', 10),
+        rate=getattr(settings, 'LLM_RATE', 10),
+        burst=getattr(settings, 'LLM_BURST', 20),
+        merchant_rate=getattr(settings, 'LLM_MERCHANT_RATE', 0.5),
+        merchant_burst=getattr(settings, 'LLM_MERCHANT_BURST', 5),
+        max_retries=getattr(settings, 'LLM_MAX_RETRIES', 3),
+        backoff_base=getattr(settings, 'LLM_BACKOFF_BASE', 1.0),
+        backoff_max=getattr(settings, 'LLM_BACKOFF_MAX', 20),
+        breaker_failures=getattr(settings, 'LLM_BREAKER_FAILURES', 5),
+        breaker_reset=getattr(settings, 'LLM_BREAKER_RESET', 30),
+        max_merchants=getattr(settings, 'LLM_MERCHANT_BUCKETS_MAX', 10000),
+    )
@@ -0,0 +1,221 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+DATETIME_COLS = ['order_time', 'delivery_time', 'driver_arrival_time', 'driver_pickup_time']
+
+
+def build_merchant_frame(merchants, items, transaction_items, transaction_data):
+    """Merge all transactions once, in the same shape get_merchant_data used to return"""
+    frame = pd.merge(transaction_items, items, on='item_id', how='inner')
+    frame = pd.merge(frame, transaction_data, on='order_id', how='inner')
+    frame = pd.merge(frame, merchants, on='merchant_id', how='left')
+
+    for col in DATETIME_COLS:
+        if col in frame.columns:
+            frame[col] = pd.to_datetime(frame[col])
+
+    if 'join_date' in frame.columns:
+        frame['join_date'] = pd.to_datetime(frame['join_date'], format='%d%m%Y')
+
+    return frame
+
+
+def owner_column(frame):
+    """Column holding the merchant that owns each row"""
+    # transaction_items and items both carry merchant_id, so the item side ends up
+    # suffixed. Items decide ownership, same as filtering items_df by merchant did.
+    return 'merchant_id_y' if 'merchant_id_y' in frame.columns else 'merchant_id'
+
+
+def row_hashes(frame):
+    """One uint64 per row that depends only on the row's values
+
+    Columns are compared by name and in canonical dtypes, so the same rows hash
+    the same whether they came from the CSVs, a snapshot or an append.
+    """
+    frame = frame[sorted(frame.columns)]
+    columns = {}
+    for col in frame.columns:
+        series = frame[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Hashing a categorical hashes its whole category set, which grows with the data
+            series = series.astype(object)
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            series = series.astype('datetime64[ns]')
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            series = series.astype(np.float64)
+        columns[col] = series
+    return pd.util.hash_pandas_object(pd.DataFrame(columns), index=False)
+
+
+def _fits(series, dtype):
+    """Whether series can be stored as dtype without changing any value"""
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return pd.api.types.is_datetime64_any_dtype(series)
+    if pd.api.types.is_integer_dtype(dtype):
+        if not pd.api.types.is_integer_dtype(series):
+            return False
+        info = np.iinfo(dtype)
+        return series.empty or (info.min <= series.min() and series.max() <= info.max)
+    if pd.api.types.is_float_dtype(dtype):
+        return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+    return False
+
+
+def cast_delta(delta, dtypes):
+    """Appended rows in the loaded frame's columns and dtypes
+
+    Categorical columns keep their categories and get any new values added at
+    the end, so each one is extended once per append and the codes already
+    stored stay valid. Returns the cast rows and the dtypes, extended ones
+    included, that the history is read with from then on.
+    """
+    delta = delta[list(dtypes)]
+    columns, dtypes = {}, dict(dtypes)
+    for col, dtype in dtypes.items():
+        series = delta[col]
+        if isinstance(dtype, pd.CategoricalDtype):
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.astype(object)
+            codes = dtype.categories.get_indexer(series)
+            new = series[(codes == -1) & series.notna().to_numpy()].unique()
+            if len(new):
+                categories = dtype.categories.append(pd.Index(new, dtype=dtype.categories.dtype))
+                dtype = dtypes[col] = pd.CategoricalDtype(categories)
+                codes = dtype.categories.get_indexer(series)
+            series = pd.Series(pd.Categorical.from_codes(codes, dtype=dtype, validate=False), index=delta.index)
+        elif series.dtype != dtype and _fits(series, dtype):
+            series = series.astype(dtype)
+        columns[col] = series
+    return pd.DataFrame(columns, index=delta.index), dtypes
+
+
+def extend_categories(frame, dtypes):
+    """frame with its categorical columns read as dtypes, whose categories extend theirs
+
+    Categories only ever grow at the end (see cast_delta), so the stored codes
+    are reused as they are and no value is looked up again.
+    """
+    columns = {}
+    for col, dtype in dtypes.items():
+        series = frame[col]
+        if not isinstance(dtype, pd.CategoricalDtype) or series.dtype is dtype:
+            continue
+        if series.cat.categories is dtype.categories:
+            continue
+        codes = series.cat.codes.to_numpy()
+        columns[col] = pd.Series(pd.Categorical.from_codes(codes, dtype=dtype, validate=False), index=frame.index)
+    return frame.assign(**columns) if columns else frame
+
+
+class MerchantIndex:
+    """Merged transaction frame sorted by merchant, with row offsets per merchant
+
+    Orders appended after the load are kept per merchant in tails rather than
+    merged into the (possibly memory-mapped) frame, so an append never copies
+    the history. dtypes are the frame's, with categories extended by appends.
+    """
+
+    def __init__(self, frame, known_merchants, tails=None, dtypes=None):
+        """Wrap a frame that is already sorted by its owner column, e.g. from a snapshot"""
+        self.key = owner_column(frame)
+        self.frame = frame
+        self.known_merchants = set(known_merchants)
+        self.offsets = self._build_offsets(self.known_merchants)
+        self.tails = tails or {}
+        self.dtypes = dtypes or dict(frame.dtypes)
+
+    @classmethod
+    def build(cls, merchants, items, transaction_items, transaction_data):
+        frame = build_merchant_frame(merchants, items, transaction_items, transaction_data)
+        # Stable sort keeps each merchant's rows in their original merge order
+        frame = frame.sort_values(owner_column(frame), kind='stable').reset_index(drop=True)
+        return cls(frame, merchants['merchant_id'])
+
+    def _build_offsets(self, known_merchants):
+        column = self.frame[self.key]
+        if len(column) == 0:
+            return {}
+
+        # Compare category codes rather than strings when the key is categorical
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            keys = column.cat.codes.to_numpy()
+        else:
+            keys = column.to_numpy()
+
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        stops = np.r_[starts[1:], len(keys)]
+        merchant_ids = column.iloc[starts].tolist()
+        return {
+            merchant_id: (int(start), int(stop))
+            for merchant_id, start, stop in zip(merchant_ids, starts, stops)
+            if merchant_id in known_merchants
+        }
+
+    def __contains__(self, merchant_id):
+        return merchant_id in self.offsets or merchant_id in self.tails
+
+    @property
+    def merchant_ids(self):
+        """Every merchant with rows, in frame order, then those only seen in appends"""
+        return list(self.offsets) + [m for m in self.tails if m not in self.offsets]
+
+    @property
+    def merged(self):
+        """The whole merged frame, appended rows included"""
+        if not self.tails:
+            return self.frame
+        frames = [extend_categories(frame, self.dtypes) for frame in [self.frame, *self.tails.values()]]
+        return pd.concat(frames, ignore_index=True)
+
+    def get(self, merchant_id):
+        """Return the merchant's rows; a slice of the shared frame (no copy) unless orders were appended"""
+        bounds = self.offsets.get(merchant_id)
+        rows = self.frame.iloc[bounds[0]:bounds[1]] if bounds is not None else None
+        tail = self.tails.get(merchant_id)
+        if tail is None:
+            return rows if rows is not None else pd.DataFrame()
+        if rows is None:
+            return extend_categories(tail, self.dtypes)
+        return pd.concat([extend_categories(rows, self.dtypes), extend_categories(tail, self.dtypes)], ignore_index=True)
+
+    def fingerprint(self, merchant_id):
+        """Order-independent hash of the merchant's rows; 0 when it has none"""
+        rows = self.get(merchant_id)
+        if len(rows) == 0:
+            return 0
+        return int(row_hashes(rows).to_numpy().sum(dtype=np.uint64))
+
+    def take(self, merchant_ids):
+        """Rows of several merchants as one frame, gathered from their offsets"""
+        merchant_ids = list(dict.fromkeys(merchant_ids))
+        ranges = [np.arange(*self.offsets[m]) for m in merchant_ids if m in self.offsets]
+        rows = self.frame.iloc[np.sort(np.concatenate(ranges))] if ranges else self.frame.iloc[:0]
+        tails = [self.tails[m] for m in merchant_ids if m in self.tails]
+        if not tails:
+            return rows
+        frames = [extend_categories(frame, self.dtypes) for frame in [rows, *tails]]
+        return pd.concat(frames, ignore_index=True)
+
+    def append(self, delta, dtypes=None):
+        """A new index with merged rows of newly appended orders added to their merchants' tails
+
+        delta and dtypes come from cast_delta, unless delta is still as merged.
+        The frame and offsets are shared with this index, which stays as it was.
+        """
+        if dtypes is None:
+            delta, dtypes = cast_delta(delta, self.dtypes)
+        tails = dict(self.tails)
+        for merchant_id, rows in delta.groupby(self.key, observed=True, sort=False):
+            if merchant_id not in self.known_merchants:
+                continue
+            rows = rows.reset_index(drop=True)
+            if merchant_id in tails:
+                rows = pd.concat([extend_categories(tails[merchant_id], dtypes), rows], ignore_index=True)
+            tails[merchant_id] = rows
+        index = copy.copy(self)
+        index.tails = tails
+        index.dtypes = dtypes
+        return index
@@ -0,0 +1,135 @@
+import pandas as pd
+
+from . import rollups
+
+
+def get_item_sales(data):
+    return data.groupby(['item_id', 'item_name'], observed=True).size().reset_index(name='num_sales')
+
+def get_top_selling_items(data, top_n=5, item_sales=None):
+    if item_sales is None:
+        item_sales = get_item_sales(data)
+    return item_sales.sort_values(by='num_sales', ascending=False).head(top_n)
+
+def get_least_selling_items(data, bottom_n=5, item_sales=None):
+    if item_sales is None:
+        item_sales = get_item_sales(data)
+    return item_sales.sort_values(by='num_sales', ascending=True).head(bottom_n)
+
+# Merchant frames are slices of the shared index, so metrics must not add columns to them
+def get_popular_order_hours(data):
+    order_hour = data['order_time'].dt.hour.rename('order_hour')
+    return order_hour.value_counts().sort_values(ascending=False)
+
+def get_popular_order_days(data):
+    order_day = data['order_time'].dt.day_name().rename('order_day')
+    return order_day.value_counts().sort_values(ascending=False)
+
+def get_average_basket_size(data):
+    return round(data[['order_id', 'item_id']].drop_duplicates().groupby('order_id', observed=True).size().mean(), 2)
+
+def get_average_order_value(data):
+    return round(data['order_value'].mean(), 2)
+
+def get_avg_delivery_time(data):
+    return round(((data['delivery_time'] - data['order_time']).dt.total_seconds() / 60).mean(), 2)
+
+def get_total_revenue(data):
+    return round(data['item_price'].sum(), 2)
+
+
+def compute_merchant_metrics(data, top_n=5, rollup=None):
+    """Every dashboard metric for one merchant frame, as JSON-ready values
+
+    When the merchant's daily rollup is given, the time-based and average
+    metrics come from it and only the item rankings touch the rows.
+    """
+    item_sales = get_item_sales(data)
+    metrics = {
+        'top_selling_items': get_top_selling_items(data, top_n, item_sales).to_dict(orient='records'),
+        'least_selling_items': get_least_selling_items(data, top_n, item_sales).to_dict(orient='records'),
+    }
+
+    if rollup is not None:
+        metrics.update({
+            'popular_order_hours': rollups.get_popular_order_hours(rollup).to_dict(),
+            'popular_order_days': rollups.get_popular_order_days(rollup).to_dict(),
+            'average_basket_size': rollups.get_average_basket_size(rollup),
+            'average_order_value': rollups.get_average_order_value(rollup),
+            'average_delivery_time': rollups.get_avg_delivery_time(rollup),
+            'total_revenue': rollups.get_total_revenue(rollup),
+            'total_orders': rollups.get_total_orders(rollup),
+        })
+        return metrics
+
+    metrics.update({
+        'popular_order_hours': get_popular_order_hours(data).to_dict(),
+        'popular_order_days': get_popular_order_days(data).to_dict(),
+        'average_basket_size': get_average_basket_size(data),
+        'average_order_value': get_average_order_value(data),
+        'average_delivery_time': get_avg_delivery_time(data),
+        'total_revenue': get_total_revenue(data),
+        'total_orders': data['order_id'].nunique(),
+    })
+    return metrics
+
+def grouped_counts(counts, axis_name):
+    """{merchant_id: counts sorted like the per-merchant rollup metrics}"""
+    return {
+        merchant_id: group.droplevel(0).rename_axis(axis_name).sort_values(ascending=False, kind='stable').to_dict()
+        for merchant_id, group in counts.groupby(level=0, observed=True)
+    }
+
+def grouped_ratio(numerator, denominator):
+    return (numerator / denominator.where(denominator != 0)).round(2)
+
+class FleetMetrics:
+    """compute_merchant_metrics for many merchants from one grouped pass each over
+    the transaction rows and the flat rollup table
+    """
+
+    def __init__(self, frame, key, rollup_flat, top_n=5):
+        self.top_n = top_n
+        item_sales = frame.groupby([key, 'item_id', 'item_name'], observed=True).size().reset_index(name='num_sales')
+        self.items_by_merchant = {
+            merchant_id: group.drop(columns=key)
+            for merchant_id, group in item_sales.groupby(key, observed=True)
+        }
+
+        totals = rollup_flat.groupby('merchant_id', observed=True)[rollups.ROLLUP_COLUMNS].sum()
+        self.scalars = pd.DataFrame({
+            'average_basket_size': grouped_ratio(totals['item_count'], totals['order_count']),
+            'average_order_value': grouped_ratio(totals['order_value_sum'], totals['order_value_count']),
+            'average_delivery_time': grouped_ratio(totals['delivery_minutes_sum'], totals['delivery_count']),
+            'total_revenue': totals['revenue_sum'].round(2),
+            'total_orders': totals['order_count'],
+        })
+        self.hours = grouped_counts(
+            rollup_flat.groupby(['merchant_id', 'hour'], observed=True)['line_count'].sum(), 'order_hour'
+        )
+        day_names = rollup_flat['date'].dt.day_name().rename('order_day')
+        self.days = grouped_counts(
+            rollup_flat.groupby([rollup_flat['merchant_id'], day_names], observed=True)['line_count'].sum(), 'order_day'
+        )
+
+    def get(self, merchant_id):
+        """The merchant's metrics, or None if it has no data"""
+        sales = self.items_by_merchant.get(merchant_id)
+        if sales is None or merchant_id not in self.scalars.index:
+            return None
+        row = self.scalars.loc[merchant_id]
+        return {
+            'top_selling_items': get_top_selling_items(None, self.top_n, sales).to_dict(orient='records'),
+            'least_selling_items': get_least_selling_items(None, self.top_n, sales).to_dict(orient='records'),
+            'popular_order_hours': self.hours[merchant_id],
+            'popular_order_days': self.days[merchant_id],
+            'average_basket_size': row['average_basket_size'],
+            'average_order_value': row['average_order_value'],
+            'average_delivery_time': row['average_delivery_time'],
+            'total_revenue': row['total_revenue'],
+            'total_orders': int(row['total_orders']),
+        }
+
+def top_entries(counts, n=5):
+    """First n entries of an already-sorted count dict"""
+    return dict(list(counts.items())[:n])
@@ -0,0 +1,94 @@
+import os
+import pickle
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+
+
+class PrecomputeStore:
+    """Per-merchant results of the offline precompute job, in a SQLite file
+
+    Every result carries the data version it was computed from, and readers
+    only accept a result whose version matches their own, so a stale store is
+    simply ignored. The done table is the job's checkpoint for resuming.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._created = False
+
+    def _connect(self):
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._created:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS results (merchant_id TEXT NOT NULL, kind TEXT NOT NULL, "
+                    "version TEXT NOT NULL, payload BLOB NOT NULL, PRIMARY KEY (merchant_id, kind))"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS done (merchant_id TEXT PRIMARY KEY, "
+                    "version TEXT NOT NULL, finished_at REAL NOT NULL)"
+                )
+            self._created = True
+        return conn
+
+    def get(self, merchant_id, kind, version):
+        # The job has never run here; don't create an empty store on every request
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    "SELECT payload FROM results WHERE merchant_id = ? AND kind = ? AND version = ?",
+                    (merchant_id, kind, version),
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading precomputed results: {e}")
+            return None
+        return pickle.loads(row[0]) if row else None
+
+    def done(self):
+        """{merchant_id: data version} of every merchant already finished"""
+        with closing(self._connect()) as conn:
+            return dict(conn.execute("SELECT merchant_id, version FROM done").fetchall())
+
+    def write(self, results, kinds):
+        """Store one chunk of results and mark its merchants done, in one transaction
+
+        results maps merchant_id -> (version, {kind: value}); merchants without data have no values.
+        Their old results of these kinds are replaced; other kinds (see put) are left alone.
+        """
+        now = time.time()
+        kinds = list(kinds)
+        placeholders = ', '.join('?' * len(kinds))
+        with closing(self._connect()) as conn, conn:
+            for merchant_id, (version, values) in results.items():
+                conn.execute(
+                    f"DELETE FROM results WHERE merchant_id = ? AND kind IN ({placeholders})", (merchant_id, *kinds)
+                )
+                conn.executemany(
+                    "INSERT INTO results (merchant_id, kind, version, payload) VALUES (?, ?, ?, ?)",
+                    [(merchant_id, kind, version, pickle.dumps(value)) for kind, value in values.items()],
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO done (merchant_id, version, finished_at) VALUES (?, ?, ?)",
+                    (merchant_id, version, now),
+                )
+
+    def put(self, kind, results):
+        """Store one kind of result for many merchants, leaving their other kinds and the checkpoint alone
+
+        results maps merchant_id -> (version, value), e.g. from the alert engine.
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO results (merchant_id, kind, version, payload) VALUES (?, ?, ?, ?)",
+                [(merchant_id, kind, version, pickle.dumps(value)) for merchant_id, (version, value) in results.items()],
+            )
+
+    def versions(self, kind):
+        """{merchant_id: data version} of every stored result of one kind"""
+        with closing(self._connect()) as conn:
+            return dict(conn.execute("SELECT merchant_id, version FROM results WHERE kind = ?", (kind,)).fetchall())
@@ -0,0 +1,227 @@
+import copy
+import signal
+import threading
+import time
+
+from .data_loader import DATASET_FILES, data_dir, dataset_version, load_datasets, snapshot_dir, stamps_version
+from .ingest import APPENDABLE, read_appended, stamp_sources
+from .hot_partition import HotPartition
+from .merchant_index import MerchantIndex, build_merchant_frame, cast_delta
+from .rollups import DailyRollup
+
+
+def static_version(sources):
+    """stamps_version of the source files other than the appendable order files"""
+    appendable = {DATASET_FILES[name] for name in APPENDABLE}
+    return stamps_version({filename: s for filename, s in sources.items() if filename not in appendable})
+
+
+class Datasets:
+    """Every frame and index the views read, built from one load of the data
+
+    A reload builds a new instance rather than changing this one, so a request
+    that holds one sees one consistent version throughout.
+    """
+
+    def __init__(self, frames, version, sources=None, hot_days=7):
+        self.frames = frames
+        # Derived from the source files, so every process that loaded the same data agrees on it
+        self.version = version
+        # Stamps of the files as loaded, to recognise a later append; None if they changed mid-load
+        self.sources = sources
+        # Version of the last full load, which Derived values are built from
+        self.base_version = version
+        # Version of the files appends never touch; with a hash of a merchant's rows
+        # it makes a merchant version that a fresh load of the same data reproduces
+        self.static_version = static_version(sources) if sources is not None else version
+        self._merchant_versions = {}
+        self.keywords = frames['keywords']
+        self.merchants = frames['merchants']
+        self.transactions = frames['transactions']
+        self.trans_items = frames['trans_items']
+        self.items = frames['items']
+
+        # Merge everything once, or reuse the snapshot's merged frame; per-merchant lookups are slices of it
+        if 'merchant_index' in frames:
+            self.merchant_index = MerchantIndex(frames['merchant_index'], self.merchants['merchant_id'])
+        else:
+            self.merchant_index = MerchantIndex.build(self.merchants, self.items, self.trans_items, self.transactions)
+
+        # Per (merchant, date, hour) aggregates behind the time-based metrics
+        if 'daily_rollup' in frames:
+            self.daily_rollup = DailyRollup.from_flat(frames['daily_rollup'])
+        else:
+            self.daily_rollup = DailyRollup.build(self.merchant_index.frame, self.merchant_index.key)
+
+        # Each merchant's last hot_days days, which the realtime and alert endpoints read
+        index = self.merchant_index
+        self.hot = HotPartition.build(index.frame, index.key, index.known_merchants, hot_days)
+
+    @property
+    def merged(self):
+        return self.merchant_index.merged
+
+    @classmethod
+    def load(cls, data_dir=data_dir, snapshot_dir=snapshot_dir, hot_days=7):
+        """Columnar snapshot when fresh, CSV otherwise"""
+        sources = stamp_sources(data_dir)
+        frames = load_datasets(data_dir, snapshot_dir)
+        if stamp_sources(data_dir) != sources:
+            sources = None
+        version = dataset_version(data_dir) if sources is None else stamps_version(sources)
+        return cls(frames, version, sources, hot_days)
+
+    def merchant_version(self, merchant_id):
+        """Changes only when this merchant's data (or a file shared by all merchants) changes
+
+        Computed from the data rather than from load history, so a process that
+        appended orders and one that loaded the appended files agree on it.
+        """
+        version = self._merchant_versions.get(merchant_id)
+        if version is None:
+            version = f"{self.static_version}:{self.merchant_index.fingerprint(merchant_id):016x}"
+            self._merchant_versions[merchant_id] = version
+        return version
+
+    def append(self, frames, sources):
+        """A new Datasets with appended orders folded into the merchant index and rollup
+
+        Only the new rows are merged and aggregated; the history is shared with
+        this instance. transactions and trans_items stay the frames as loaded.
+        """
+        delta = build_merchant_frame(self.merchants, self.items, frames['trans_items'], frames['transactions'])
+        # Cast once to the loaded dtypes, so no merchant's rows need their categories reconciled
+        delta, dtypes = cast_delta(delta, self.merchant_index.dtypes)
+        datasets = copy.copy(self)
+        datasets.version = stamps_version(sources)
+        datasets.sources = sources
+        datasets.merchant_index = self.merchant_index.append(delta, dtypes)
+        datasets.daily_rollup = self.daily_rollup.appended(delta, self.merchant_index.key)
+        datasets.hot = self.hot.appended(delta, self.merchant_index.key, self.merchant_index.known_merchants, dtypes)
+        touched = set(delta[self.merchant_index.key].dropna().unique())
+        datasets._merchant_versions = {m: v for m, v in self._merchant_versions.items() if m not in touched}
+        return datasets
+
+
+class DatasetRegistry:
+    """Holds the current Datasets and swaps in a new one when the data changes
+
+    The first load happens on first use. Reloads build the new Datasets off the
+    request path and replace the reference in one assignment; requests already
+    holding the old instance finish on it, and caches keyed by version miss.
+    """
+
+    def __init__(self, data_dir=data_dir, snapshot_dir=snapshot_dir, hot_days=7):
+        self.data_dir = data_dir
+        self.snapshot_dir = snapshot_dir
+        self.hot_days = hot_days
+        self._current = None
+        self._load_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self.generation = 0
+
+    @property
+    def loaded(self):
+        return self._current is not None
+
+    def current(self):
+        current = self._current
+        if current is None:
+            with self._load_lock:
+                if self._current is None:
+                    self._swap(Datasets.load(self.data_dir, self.snapshot_dir, self.hot_days))
+                current = self._current
+        return current
+
+    def _swap(self, datasets):
+        self._current = datasets
+        self.generation += 1
+
+    def reload(self, force=False):
+        """Load the data again and swap it in; returns False if nothing changed or a reload is running
+
+        When the only change is orders appended to the order files, just those
+        rows are read and folded in (see ingest.append_orders).
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            current = self._current
+            changed = current is None or current.version != dataset_version(self.data_dir)
+            if not force and not changed:
+                return False
+            if changed and current is not None and current.sources is not None and self._append(current):
+                return True
+            self._swap(Datasets.load(self.data_dir, self.snapshot_dir, self.hot_days))
+            print(f"Loaded datasets version {self._current.version} (generation {self.generation})")
+            return True
+        except Exception as e:
+            print(f"Error reloading datasets, keeping the current version: {e}")
+            return False
+        finally:
+            self._reload_lock.release()
+
+    def _append(self, current):
+        """Fold in the orders appended since current was loaded; False if a full reload is needed"""
+        try:
+            appended = read_appended(current.sources, self.data_dir)
+            if appended is None:
+                return False
+            frames, sources = appended
+            self._swap(current.append(frames, sources))
+        except Exception as e:
+            print(f"Error appending new orders, reloading everything instead: {e}")
+            return False
+        print(f"Appended {len(frames['transactions'])} orders, datasets version {self._current.version} (generation {self.generation})")
+        return True
+
+    def reload_in_background(self, force=False):
+        threading.Thread(target=self.reload, kwargs={'force': force}, name='dataset-reload', daemon=True).start()
+
+    def watch(self, interval):
+        """Poll the source files every interval seconds and reload when they change"""
+        if self._watcher is not None:
+            return
+
+        def poll():
+            while True:
+                time.sleep(interval)
+                # Nothing to compare against until something has loaded the data
+                if self._current is not None:
+                    self.reload()
+
+        self._watcher = threading.Thread(target=poll, name='dataset-watch', daemon=True)
+        self._watcher.start()
+
+    def reload_on_signal(self, signal_name):
+        """Reload (unconditionally) when this process receives the named signal, e.g. SIGUSR2"""
+        try:
+            signal.signal(getattr(signal, signal_name), lambda signum, frame: self.reload_in_background(force=True))
+        except (AttributeError, ValueError) as e:
+            # Unknown on this platform, or not called from the main thread
+            print(f"Cannot reload datasets on {signal_name}: {e}")
+
+
+class Derived:
+    """A value built from the Datasets (e.g. the keyword index), rebuilt lazily after each full load
+
+    Appends only add orders, so a value built from the same load is kept.
+    """
+
+    def __init__(self, registry, build):
+        self.registry = registry
+        self._build = build
+        self._lock = threading.Lock()
+        self._entry = None
+
+    def get(self, datasets=None):
+        datasets = datasets or self.registry.current()
+        entry = self._entry
+        if entry is None or entry[0] != datasets.base_version:
+            with self._lock:
+                entry = self._entry
+                if entry is None or entry[0] != datasets.base_version:
+                    entry = (datasets.base_version, self._build(datasets))
+                    self._entry = entry
+        return entry[1]
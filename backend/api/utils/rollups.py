@@ -0,0 +1,140 @@
+import copy
+import threading
+
+import pandas as pd
+
+ROLLUP_INDEX = ['date', 'hour']
+ROLLUP_COLUMNS = [
+    'line_count',             # order-item rows, what the popularity counts have always counted
+    'order_count',            # distinct orders
+    'item_count',             # distinct (order, item) pairs, summed into basket size
+    'order_value_sum',
+    'order_value_count',
+    'revenue_sum',            # item_price over rows
+    'delivery_minutes_sum',
+    'delivery_count',
+]
+
+
+def build_rollup_table(frame, key):
+    """Aggregate merged transaction rows into one row per (merchant, date, hour)"""
+    order_time = frame['order_time']
+    delivery_minutes = (frame['delivery_time'] - order_time).dt.total_seconds() / 60
+    rows = pd.DataFrame({
+        'merchant_id': frame[key],
+        'date': order_time.dt.normalize(),
+        'hour': order_time.dt.hour,
+        'order_id': frame['order_id'],
+        'item_id': frame['item_id'],
+        'order_value': frame['order_value'],
+        'item_price': frame['item_price'],
+        'delivery_minutes': delivery_minutes,
+    })
+    keys = ['merchant_id'] + ROLLUP_INDEX
+
+    table = rows.groupby(keys, observed=True).agg(
+        line_count=('order_id', 'size'),
+        order_count=('order_id', 'nunique'),
+        order_value_sum=('order_value', 'sum'),
+        order_value_count=('order_value', 'count'),
+        revenue_sum=('item_price', 'sum'),
+        delivery_minutes_sum=('delivery_minutes', 'sum'),
+        delivery_count=('delivery_minutes', 'count'),
+    )
+    distinct_items = rows.drop_duplicates(['order_id', 'item_id']).groupby(keys, observed=True).size()
+    table['item_count'] = distinct_items.reindex(table.index, fill_value=0)
+    return table[ROLLUP_COLUMNS]
+
+
+class DailyRollup:
+    """Per-merchant (date, hour) aggregates, updated in place as new orders arrive
+
+    Every column is a sum, so a delta is folded in by adding it to the
+    merchant's existing rows. Deltas must contain whole orders: an order whose
+    items are split across two updates would be counted twice in order_count.
+    """
+
+    def __init__(self, table):
+        self._lock = threading.Lock()
+        self.parts = {}
+        self._merge(table)
+
+    @classmethod
+    def build(cls, frame, key):
+        return cls(build_rollup_table(frame, key))
+
+    @classmethod
+    def from_flat(cls, flat):
+        """Rebuild from the flat table written to the snapshot"""
+        return cls(flat.set_index(['merchant_id'] + ROLLUP_INDEX))
+
+    def to_flat(self, merchant_ids=None):
+        """One flat table of every merchant's rows, or only the given merchants'"""
+        parts = self.parts
+        if merchant_ids is not None:
+            parts = {m: parts[m] for m in merchant_ids if m in parts}
+        if not parts:
+            return pd.DataFrame(columns=['merchant_id'] + ROLLUP_INDEX + ROLLUP_COLUMNS)
+        return pd.concat(parts, names=['merchant_id']).reset_index()
+
+    def _merge(self, table):
+        for merchant_id, part in table.groupby(level='merchant_id', observed=True):
+            part = part.droplevel('merchant_id')
+            current = self.parts.get(merchant_id)
+            if current is not None:
+                part = current.add(part, fill_value=0).astype(current.dtypes)
+            self.parts[merchant_id] = part.sort_index()
+
+    def update(self, frame, key):
+        """Fold newly appended transaction rows into the affected merchants only"""
+        delta = build_rollup_table(frame, key)
+        with self._lock:
+            self._merge(delta)
+
+    def appended(self, frame, key):
+        """A new rollup with the rows folded in; this one is left unchanged for readers still holding it"""
+        rollup = copy.copy(self)
+        rollup._lock = threading.Lock()
+        # _merge replaces a merchant's part rather than changing it, so sharing the parts is safe
+        rollup.parts = dict(self.parts)
+        rollup.update(frame, key)
+        return rollup
+
+    def get(self, merchant_id, start=None, end=None):
+        """A merchant's rows, optionally limited to dates in [start, end]"""
+        part = self.parts.get(merchant_id)
+        if part is None:
+            return None
+        if start is not None or end is not None:
+            part = part.loc[pd.IndexSlice[start:end, :], :]
+        return part
+
+
+# --- Metrics answered from the rollup ---
+
+def get_popular_order_hours(rollup):
+    counts = rollup.groupby(level='hour')['line_count'].sum().rename_axis('order_hour')
+    return counts.sort_values(ascending=False, kind='stable')
+
+def get_popular_order_days(rollup):
+    day_names = rollup.index.get_level_values('date').day_name()
+    counts = rollup['line_count'].groupby(day_names).sum().rename_axis('order_day')
+    return counts.sort_values(ascending=False, kind='stable')
+
+def ratio(numerator, denominator):
+    return round(numerator / denominator, 2) if denominator else float('nan')
+
+def get_average_basket_size(rollup):
+    return ratio(rollup['item_count'].sum(), rollup['order_count'].sum())
+
+def get_average_order_value(rollup):
+    return ratio(rollup['order_value_sum'].sum(), rollup['order_value_count'].sum())
+
+def get_avg_delivery_time(rollup):
+    return ratio(rollup['delivery_minutes_sum'].sum(), rollup['delivery_count'].sum())
+
+def get_total_revenue(rollup):
+    return round(rollup['revenue_sum'].sum(), 2)
+
+def get_total_orders(rollup):
+    return int(rollup['order_count'].sum())
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+# Identifier columns that are joined across tables share one dtype: a categorical
+# when they hold text, so merges and groupbys work on integer codes instead of
+# strings, and otherwise the narrowest numeric type that fits every table
+SHARED_CATEGORIES = {
+    'merchant_id': ['merchants', 'items', 'transactions', 'trans_items'],
+    'order_id': ['transactions', 'trans_items'],
+    'item_id': ['items', 'trans_items'],
+}
+
+
+def is_text(series):
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+def shared_dtype(columns):
+    """One categorical dtype covering every value seen in the given columns"""
+    values = pd.concat([col.dropna().astype(str) for col in columns], ignore_index=True)
+    return pd.CategoricalDtype(pd.Index(values.unique()).sort_values())
+
+def narrow_numeric(series):
+    """Smallest integer type that fits, and float32 only where it round-trips exactly"""
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer')
+    if pd.api.types.is_float_dtype(series):
+        narrowed = series.astype(np.float32)
+        # Prices like 12.99 are not exact in float32, so those stay float64
+        if np.array_equal(narrowed.to_numpy(dtype=np.float64), series.to_numpy(), equal_nan=True):
+            return narrowed
+    return series
+
+def shared_numeric_dtype(columns):
+    """Narrowest numeric dtype that holds every value of the given columns"""
+    return np.result_type(*(narrow_numeric(col).dtype for col in columns))
+
+def apply_schema(frames):
+    """Give every column its compact dtype: shared categoricals for join keys,
+    categoricals for other text, and the narrowest numeric types.
+
+    Datetime columns are left as datetime64, which is already an int64 epoch
+    offset in memory and keeps the .dt accessors the metrics rely on.
+    """
+    shared = set()
+    for col, tables in SHARED_CATEGORIES.items():
+        tables = [t for t in tables if t in frames and col in frames[t]]
+        text = [t for t in tables if is_text(frames[t][col])]
+        if text:
+            dtype = shared_dtype([frames[t][col] for t in text])
+            tables = text
+        elif tables and all(pd.api.types.is_numeric_dtype(frames[t][col]) for t in tables):
+            dtype = shared_numeric_dtype([frames[t][col] for t in tables])
+        else:
+            continue
+        for t in tables:
+            frames[t][col] = frames[t][col].astype(dtype)
+            shared.add((t, col))
+
+    for name, df in frames.items():
+        for col in df.columns:
+            if (name, col) in shared:
+                continue
+            if is_text(df[col]):
+                df[col] = df[col].astype('category')
+            elif pd.api.types.is_numeric_dtype(df[col]):
+                df[col] = narrow_numeric(df[col])
+    return frames
+
+def memory_usage(frames):
+    """Deep memory usage in bytes per frame"""
+    return {name: int(df.memory_usage(deep=True).sum()) for name, df in frames.items()}
@@ -0,0 +1,222 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+# Similarity is the inner product of L2-normalized rows, i.e. cosine similarity.
+# Every index is saved as plain .npy arrays plus meta.json and loaded with mmap,
+# so a large keyword matrix is paged in on demand and shared between workers.
+
+BATCH_ROWS = 65536
+
+
+def top_k(scores, k):
+    """Indices of the k highest scores, highest first"""
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx], kind='stable')]
+
+
+class FlatIndex:
+    """Exact search over every vector; the right choice up to tens of thousands of rows"""
+
+    kind = 'flat'
+    exact = True
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    @classmethod
+    def build(cls, vectors):
+        return cls(vectors)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def scores(self, queries):
+        """Similarity of every query to every vector"""
+        return queries @ self.vectors.T
+
+    def search(self, queries, k):
+        """(scores, ids) of the k most similar vectors per query, best first"""
+        results = []
+        for row in self.scores(queries):
+            idx = top_k(row, k)
+            results.append((row[idx], idx))
+        return results
+
+    def reconstruct(self, ids):
+        return np.asarray(self.vectors[ids])
+
+    def arrays(self):
+        return {'vectors': self.vectors}
+
+    @classmethod
+    def from_arrays(cls, arrays, nprobe=None):
+        return cls(arrays['vectors'])
+
+
+class IVFIndex:
+    """Inverted-file index: vectors are clustered with spherical k-means and a query
+    only scans the nprobe clusters whose centroids are closest to it.
+
+    Vectors are stored sorted by cluster, so each inverted list is one contiguous
+    slice of the (memory-mapped) matrix.
+    """
+
+    kind = 'ivf'
+    exact = False
+
+    def __init__(self, centroids, vectors, ids, offsets, nprobe=16):
+        self.centroids = centroids
+        self.vectors = vectors        # rows grouped by cluster
+        self.ids = ids                # original row id of each stored vector
+        self.offsets = offsets        # list i is vectors[offsets[i]:offsets[i + 1]]
+        self.nprobe = nprobe
+        self._positions = None
+
+    @classmethod
+    def build(cls, vectors, n_lists=None, nprobe=16, iterations=10, seed=0):
+        n = len(vectors)
+        n_lists = n_lists or max(1, int(np.sqrt(n)))
+        n_lists = min(n_lists, n)
+        rng = np.random.default_rng(seed)
+
+        # Train the centroids on a sample; a few dozen points per list is enough
+        sample = vectors[np.sort(rng.choice(n, min(n, 64 * n_lists), replace=False))]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = cls._assign(sample, centroids)
+            counts = np.bincount(assignment, minlength=n_lists)
+            starts = np.cumsum(counts) - counts
+            sums = np.zeros_like(centroids)
+            filled = counts > 0
+            sums[filled] = np.add.reduceat(sample[np.argsort(assignment, kind='stable')], starts[filled], axis=0)
+            # Re-seed empty lists from random sample points
+            empty = ~filled
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1
+            centroids = (sums / norms).astype(np.float32)
+
+        assignment = cls._assign(vectors, centroids)
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=n_lists), out=offsets[1:])
+        return cls(centroids, np.ascontiguousarray(vectors[order]), order.astype(np.int64), offsets, nprobe)
+
+    @staticmethod
+    def _assign(vectors, centroids):
+        return np.concatenate([
+            np.argmax(vectors[start:start + BATCH_ROWS] @ centroids.T, axis=1)
+            for start in range(0, len(vectors), BATCH_ROWS)
+        ]) if len(vectors) else np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def search(self, queries, k):
+        nprobe = min(self.nprobe, len(self.centroids))
+        centroid_scores = queries @ self.centroids.T
+        probes = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+
+        # Scan list by list, so each list is read once as a contiguous slice and
+        # scored against every query that probes it in one matrix product
+        found_scores = [[] for _ in queries]
+        found_rows = [[] for _ in queries]
+        list_ids, query_ids = np.unique(probes, return_inverse=True)
+        query_ids = query_ids.reshape(probes.shape)
+        for position, list_id in enumerate(list_ids):
+            start, stop = int(self.offsets[list_id]), int(self.offsets[list_id + 1])
+            if start == stop:
+                continue
+            probing = np.flatnonzero((query_ids == position).any(axis=1))
+            block = queries[probing] @ self.vectors[start:stop].T
+            for q, scores in zip(probing, block):
+                found_scores[q].append(scores)
+                found_rows[q].append(np.arange(start, stop))
+
+        results = []
+        for scores, rows in zip(found_scores, found_rows):
+            scores = np.concatenate(scores) if scores else np.empty(0, dtype=np.float32)
+            rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+            idx = top_k(scores, k)
+            results.append((scores[idx], np.asarray(self.ids[rows[idx]])))
+        return results
+
+    def reconstruct(self, ids):
+        if self._positions is None:
+            positions = np.empty(len(self.ids), dtype=np.int64)
+            positions[self.ids] = np.arange(len(self.ids))
+            self._positions = positions
+        return np.asarray(self.vectors[self._positions[ids]])
+
+    def arrays(self):
+        return {'centroids': self.centroids, 'vectors': self.vectors, 'ids': self.ids, 'offsets': self.offsets}
+
+    @classmethod
+    def from_arrays(cls, arrays, nprobe=16):
+        # nprobe only affects search, so it is a load-time setting rather than part of the saved index
+        return cls(arrays['centroids'], arrays['vectors'], arrays['ids'], arrays['offsets'], nprobe)
+
+
+INDEX_TYPES = {cls.kind: cls for cls in (FlatIndex, IVFIndex)}
+
+
+def resolve_kind(kind, count, flat_limit):
+    """'auto' is flat search up to flat_limit vectors and IVF above it"""
+    if kind == 'auto':
+        return 'flat' if count <= flat_limit else 'ivf'
+    return kind
+
+def build_index(vectors, kind='auto', flat_limit=50000, nprobe=16):
+    kind = resolve_kind(kind, len(vectors), flat_limit)
+    if kind == 'ivf':
+        return IVFIndex.build(vectors, nprobe=nprobe)
+    return FlatIndex.build(vectors)
+
+def save_index(index, path, fingerprint):
+    """Write into a temporary directory and rename it into place, so readers never see half an index"""
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for name, array in index.arrays().items():
+        np.save(tmp / f"{name}.npy", np.ascontiguousarray(array))
+    meta = {'kind': index.kind, 'fingerprint': fingerprint, 'count': len(index)}
+    (tmp / 'meta.json').write_text(json.dumps(meta))
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+
+def load_index(path, fingerprint=None, kind='auto', flat_limit=50000, nprobe=16):
+    """Memory-map a saved index, or None if it is missing, was built from other
+    data (fingerprint) or is not the kind now configured
+    """
+    path = Path(path)
+    try:
+        meta = json.loads((path / 'meta.json').read_text())
+    except (OSError, ValueError):
+        return None
+    if fingerprint is not None and meta.get('fingerprint') != fingerprint:
+        return None
+    if meta['kind'] != resolve_kind(kind, meta['count'], flat_limit):
+        return None
+    arrays = {p.stem: np.load(p, mmap_mode='r') for p in path.glob('*.npy')}
+    return INDEX_TYPES[meta['kind']].from_arrays(arrays, nprobe)
+
+def load_or_build_index(path, fingerprint, load_vectors, kind='auto', flat_limit=50000, nprobe=16):
+    """The saved index when it is still valid, otherwise a freshly built and saved one"""
+    index = load_index(path, fingerprint, kind, flat_limit, nprobe)
+    if index is not None:
+        return index
+    index = build_index(load_vectors(), kind, flat_limit, nprobe)
+    try:
+        save_index(index, path, fingerprint)
+        return load_index(path, fingerprint, kind, flat_limit, nprobe)
+    except OSError as e:
+        print(f"Error saving vector index: {e}")
+        return index
@@ -1,326 +1,484 @@
 import json
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, renderer_classes
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from django.http import StreamingHttpResponse
+from django.conf import settings
 import os
-import google.generativeai as genai
 import pandas as pd
 from dotenv import load_dotenv
 from pathlib import Path
-import re
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from .utils.embedding_cache import EmbeddingStore
+from .utils.keyword_scorer import KeywordScorer, normalize_rows
+from .utils.alerts import compute_fleet_alerts
+from .utils.chat_store import build_chat_store
+from .utils.fallback import rule_insights, rule_recommendations
+from .utils.llm_cache import build_llm_cache
+from .utils.llm_gateway import LLMUnavailableError, build_llm_gateway
+from .utils.metrics import FleetMetrics, compute_merchant_metrics, top_entries
+from .utils.precompute_store import PrecomputeStore
+from .utils.registry import DatasetRegistry, Derived
+from .utils.vector_index import load_or_build_index
 
 # Configuration
 load_dotenv()
 
-model = None
 
+# Datasets load on first use rather than at import, so management commands and
+# cheap endpoints don't pay for them; see warm_up() to load them at startup instead.
+# New data is swapped in by reload (see server_started), never changed in place.
+datasets = DatasetRegistry(hot_days=settings.HOT_PARTITION_DAYS)
 
-# Dataset loading
-data_dir = Path("data/datasets/")
-try:
-    keywords_df = pd.read_csv(data_dir / 'keywords.csv')
-    merchants_df = pd.read_csv(data_dir / 'merchant.csv')
-    transaction_data_df = pd.read_csv(data_dir / 'transaction_data.csv')
-    transaction_items_df = pd.read_csv(data_dir / 'transaction_items.csv')
-    items_df = pd.read_csv(data_dir / 'items.csv')
+def current_data():
+    return datasets.current()
 
-    merged_df = pd.merge(merchants_df, items_df, on='merchant_id', how='inner')
-    merged_df = pd.merge(merged_df, transaction_items_df, on='item_id', how='inner')
-    merged_df = pd.merge(merged_df, transaction_data_df, on='order_id', how='inner')
 
-    merged_df.drop(columns=['Unnamed: 0'], errors='ignore', inplace=True)
-    merged_df.drop(columns=[col for col in merged_df.columns if col.endswith('_drop')], inplace=True)
+# --- Utility Functions ---
 
-    merged_df['order_time'] = pd.to_datetime(merged_df['order_time'])
-    merged_df['delivery_time'] = pd.to_datetime(merged_df['delivery_time'])
-    merged_df['driver_arrival_time'] = pd.to_datetime(merged_df['driver_arrival_time'])
-    merged_df['driver_pickup_time'] = pd.to_datetime(merged_df['driver_pickup_time'])
-    merged_df['join_date'] = pd.to_datetime(merged_df['join_date'], format='%d%m%Y')
+# Gemini output for identical prompts is reused until it expires or the merchant's data changes
+llm_cache = build_llm_cache(settings)
+
+def data_version(merchant_id):
+    # Changes when a reload or an append changes the merchant's data; caches and stored
+    # results are keyed by it
+    return current_data().merchant_version(merchant_id)
+
+# Results of `manage.py precompute`, used whenever they match the loaded data
+precomputed = PrecomputeStore(settings.PRECOMPUTE_STORE_PATH)
+
+def precomputed_or_build(kind, merchant_id, build):
+    value = precomputed.get(merchant_id, kind, data_version(merchant_id))
+    return value if value is not None else build(merchant_id)
+
+def get_merchant_metrics(merchant_id):
+    """Cached dashboard metrics for a merchant, shared by every metric endpoint"""
+    return merchant_metrics(merchant_id, data_version(merchant_id))
+
+@lru_cache(maxsize=4096)
+def merchant_metrics(merchant_id, version):
+    return precomputed_or_build('metrics', merchant_id, compute_metrics)
+
+def compute_metrics(merchant_id):
+    current = current_data()
+    data = current.merchant_index.get(merchant_id)
+    if data.empty:
+        return None
+    return compute_merchant_metrics(data, rollup=current.daily_rollup.get(merchant_id))
+
+# Every Gemini call goes through the gateway: one configured client, concurrency and
+# rate limits, backoff on quota errors and a circuit breaker (see LLM_* settings)
+llm_gateway = build_llm_gateway(settings, os.getenv('GEMINI_API_KEY'))
+
+def llm_api_key_missing():
+    # Only the Gemini backend needs a key; LLM_BACKEND = 'fake' answers without one
+    return llm_gateway.backend.requires_key and not os.getenv('GEMINI_API_KEY')
+
+def generate_text(endpoint, merchant_id, prompt):
+    call = lambda: llm_gateway.generate(prompt, merchant_id)
+    return llm_cache.get_or_call(endpoint, merchant_id, prompt, call, data_version(merchant_id))
+
+# The recommendation and alert endpoints wait for Gemini until LLM_DEADLINE seconds after
+# the request came in. Past that they answer with rule-based output, while the call keeps
+# running here and fills llm_cache for the next request.
+llm_executor = ThreadPoolExecutor(max_workers=settings.LLM_MAX_IN_FLIGHT, thread_name_prefix='llm')
+# Calls running or waiting in llm_executor; its own queue has no bound
+llm_slots = threading.BoundedSemaphore(settings.LLM_MAX_IN_FLIGHT + settings.LLM_MAX_QUEUED)
+
+def remaining_budget(started):
+    deadline = settings.LLM_DEADLINE
+    return None if deadline is None else max(0.0, deadline - (time.monotonic() - started))
+
+def generate_before(deadline, endpoint, merchant_id, prompt):
+    """generate_text, unless the request stopped waiting while the call was queued"""
+    if deadline is not None and time.monotonic() >= deadline:
+        return None
+    return generate_text(endpoint, merchant_id, prompt)
+
+def generate_within(endpoint, merchant_id, prompt, started):
+    """Parsed model output, or None if it isn't ready within the request's budget, the
+    queue is full or the call failed
+    """
+    if not llm_slots.acquire(blocking=False):
+        print(f"Answering {endpoint} for {merchant_id} without Gemini: too many calls queued")
+        return None
+    budget = remaining_budget(started)
+    deadline = None if budget is None else time.monotonic() + budget
+    try:
+        future = llm_executor.submit(generate_before, deadline, endpoint, merchant_id, prompt)
+    except Exception:
+        llm_slots.release()
+        raise
+    future.add_done_callback(lambda future: llm_slots.release())
+    try:
+        return parse_model_output(future.result(budget))
+    except Exception as e:
+        print(f"Answering {endpoint} for {merchant_id} without Gemini: {str(e) or 'deadline passed'}")
+        return None
 
-    # keywords sort by checkout, descending
-    keywords_df.sort_values(by='checkout', ascending=False, inplace=True)
+def llm_or_fallback(result, field, output, fallback):
+    if output is None:
+        output = fallback(result)
+        result['fallback'] = True
+    result[field] = output
+    return result
 
-except Exception as e:
-    print(f"Error loading datasets: {e}")
 
+class NoDataError(Exception):
+    """Nothing to build a response from; views turn this into a 404"""
 
-# --- Utility Functions ---
+def parse_model_output(text):
+    try:
+        return json.loads(text)
+    except:
+        return text
 
 
-def get_merchant_data(merchant_id):
+# --- API Views ---
+# Chat history per merchant, bounded and compacted (see CHAT_* settings)
+chat_store = build_chat_store(settings)
+
+def get_chat(merchant_id, lang='en'):
+    """The merchant's stored state and a ChatSession resumed from it"""
+    instruction = chat_system_instruction(merchant_id, lang, data_version(merchant_id))
+    state = chat_store.load(merchant_id)
+    return state, llm_gateway.start_chat(instruction, state.contents())
+
+def summarize_chat(summary, messages):
+    transcript = '\n'.join(f"{m['role']}: {m['text']}" for m in messages)
+    prompt = (
+        "Summarize this conversation between a Grab merchant and their business assistant "
+        "in under 150 words. Keep the figures, advice given and any open questions.\n\n"
+        f"Earlier summary: {summary or 'none'}\n\n"
+        f"{transcript}"
+    )
+    return llm_gateway.generate(prompt)
+
+def chat_response(merchant_id, state, prompt, text):
+    """Record the turn and return it; the full conversation is served by chat_history_view"""
+    state.append(prompt, text)
+    chat_store.save(merchant_id, state, summarize_chat)
+    return {
+        'response': text,
+        'turn': state.turns - 1,
+    }
+
+def sse_event(data, event=None):
+    prefix = f"event: {event}\n" if event else ''
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+def stream_chat_events(chunks, finish):
+    """Server-Sent Events for one streamed turn: a 'message' per chunk, then 'done'"""
+    text = []
     try:
-        # Filter each dataframe first before merging
-        merchant_data = merchants_df[merchants_df['merchant_id'] == merchant_id].copy()
-        if merchant_data.empty:
-            return pd.DataFrame()
-            
-        merchant_items = items_df[items_df['merchant_id'] == merchant_id].copy()
-        if merchant_items.empty:
-            return pd.DataFrame()
-            
-        # Merge with transaction items
-        merchant_trans = pd.merge(
-            transaction_items_df,
-            merchant_items,
-            on='item_id',
-            how='inner'
-        )
-        
-        # Merge with transaction data
-        result = pd.merge(
-            merchant_trans,
-            transaction_data_df,
-            on='order_id',
-            how='inner'
-        )
-        
-        # Merge with merchant data
-        result = pd.merge(
-            result,
-            merchant_data,
-            on='merchant_id',
-            how='left'
-        )
-        
-        # Process datetime columns
-        datetime_cols = ['order_time', 'delivery_time', 'driver_arrival_time', 'driver_pickup_time']
-        for col in datetime_cols:
-            if col in result.columns:
-                result[col] = pd.to_datetime(result[col])
-        
-        if 'join_date' in result.columns:
-            result['join_date'] = pd.to_datetime(result['join_date'], format='%d%m%Y')
-        
-        return result.reset_index(drop=True)
-        
+        for chunk in chunks:
+            text.append(chunk.text)
+            yield sse_event({'text': chunk.text})
+        yield sse_event(finish(''.join(text)), event='done')
     except Exception as e:
-        print(f"Error getting merchant data: {e}")
-        return pd.DataFrame()
-
-def get_top_selling_items(data, top_n=5):
-    return (
-        data.groupby(['item_id', 'item_name'])
-        .size()
-        .reset_index(name='num_sales')
-        .sort_values(by='num_sales', ascending=False)
-        .head(top_n)
+        yield sse_event({'error': str(e)}, event='error')
+
+def event_stream_response(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    # Stop proxies (nginx) from buffering the stream into one late response
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets clients send Accept: text/event-stream; errors are still rendered as JSON"""
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode('utf-8')
+
+class NDJSONRenderer(EventStreamRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+@lru_cache(maxsize=4096)
+def chat_system_instruction(merchant_id, lang, version):
+    """Assistant instructions plus the merchant's stats, built once per data version
+
+    Sent as the model's system instruction, so each chat turn only carries the question.
+    """
+    # Merchant-specific key insights
+    metrics = get_merchant_metrics(merchant_id)
+    if metrics is None:
+        raise NoDataError('No data found for this merchant')
+
+    basket_size = metrics['average_basket_size']
+    avg_order_value = metrics['average_order_value']
+    avg_delivery_time = metrics['average_delivery_time']
+    popular_hours = top_entries(metrics['popular_order_hours'])
+    popular_days = top_entries(metrics['popular_order_days'])
+    tot_revenue = metrics['total_revenue']
+
+    def format_items(items):
+        return ', '.join([f"{item['item_name']} ({item['num_sales']} sales)" for item in items])
+
+    stats_context = (
+        f"Merchant ID: {merchant_id}. "
+        f"Top items: {format_items(metrics['top_selling_items'])}. "
+        f"Underperforming items: {format_items(metrics['least_selling_items'])}. "
+        f"Basket size: {basket_size} items. "
+        f"Order value: RM {avg_order_value}. "
+        f"Delivery time: {avg_delivery_time} mins. "
+        f"Popular hours: {', '.join(f'{hour}:00 ({count} orders)' for hour, count in popular_hours.items())}. "
+        f"Popular days: {', '.join(f'{day} ({count} orders)' for day, count in popular_days.items())}."
+        f"Total revenue: RM {tot_revenue}."
     )
 
-def get_least_selling_items(data, bottom_n=5):
+    system_instruction = {
+        "en": (
+            "You are a helpful business assistant for Grab merchants. "
+            "Use clear and simple language with no markdown formatting. "
+            "Answer in a friendly and human-like tone, explaining business insights and recommendations based on the data. "
+            "Keep responses short and actionable. No bullet points or special characters. Just plain text."
+        ),
+        "ms": (
+            "Anda ialah pembantu perniagaan untuk peniaga Grab. "
+            "Gunakan bahasa mudah tanpa sebarang format khas. "
+            "Jawab dengan mesra dan jelas, beri cadangan atau penjelasan berdasarkan data. "
+            "Pastikan ayat pendek dan mudah difahami. Jangan gunakan tanda bintang atau markdown."
+        )
+    }
+
     return (
-        data.groupby(['item_id', 'item_name'])
-        .size()
-        .reset_index(name='num_sales')
-        .sort_values(by='num_sales', ascending=True)
-        .head(bottom_n)
+        f"{system_instruction.get(lang, system_instruction['en'])}\n\n"
+        f"Merchant stats: {stats_context}"
     )
 
-def get_popular_order_hours(data):
-    data['order_hour'] = data['order_time'].dt.hour
-    return data['order_hour'].value_counts().sort_values(ascending=False)
-
-def get_popular_order_days(data):
-    data['order_day'] = data['order_time'].dt.day_name()
-    return data['order_day'].value_counts().sort_values(ascending=False)
-
-def get_average_basket_size(data):
-    return round(data[['order_id', 'item_id']].drop_duplicates().groupby('order_id').size().mean(), 2)
-
-def get_average_order_value(data):
-    return round(data['order_value'].mean(), 2)
+@api_view(['POST'])
+def ask_gemini(request):
+    user_query = request.data.get('query')
+    merchant_id = request.data.get('merchant_id')
+    lang = request.data.get('lang', 'en')  # Support 'en' or 'ms'
 
-def get_avg_delivery_time(data):
-    return round(((data['delivery_time'] - data['order_time']).dt.total_seconds() / 60).mean(), 2)
+    if llm_api_key_missing():
+        return Response({'error': 'API key missing'}, status=500)
+    if not user_query or not merchant_id:
+        return Response({'error': 'Missing query or merchant_id'}, status=400)
 
-def get_total_revenue(data):
-    return round(data['item_price'].sum(), 2)
+    try:
+        state, chat = get_chat(merchant_id, lang)
 
+        # Send message and return plain response
+        response = llm_gateway.send(chat, user_query, merchant_id)
+        return Response(chat_response(merchant_id, state, user_query, response.text))
 
-# --- API Views ---
-# Store chat sessions in memory (for demo/testing only)
-chat_sessions = {}
+    except NoDataError as e:
+        return Response({'error': str(e)}, status=404)
+    except LLMUnavailableError as e:
+        return Response({'error': str(e)}, status=503)
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
 
 @api_view(['POST'])
-def ask_gemini(request):
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def ask_gemini_stream(request):
+    """ask_gemini, forwarding model tokens as Server-Sent Events as they arrive"""
     user_query = request.data.get('query')
     merchant_id = request.data.get('merchant_id')
-    lang = request.data.get('lang', 'en')  # Support 'en' or 'ms'
-    api_key = os.getenv('GEMINI_API_KEY')
+    lang = request.data.get('lang', 'en')
 
-    if not api_key:
+    if llm_api_key_missing():
         return Response({'error': 'API key missing'}, status=500)
     if not user_query or not merchant_id:
         return Response({'error': 'Missing query or merchant_id'}, status=400)
 
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.0-flash')
-
-        if merchant_id not in chat_sessions:
-            chat_sessions[merchant_id] = model.start_chat()
-        chat = chat_sessions[merchant_id]
-
-        # Get merchant-specific data
-        data = get_merchant_data(merchant_id)
-        if data.empty:
-            return Response({'error': 'No data found for this merchant'}, status=404)
-
-        # Key insights
-        top_items_df = get_top_selling_items(data, top_n=5)
-        least_items_df = get_least_selling_items(data, bottom_n=5)
-        basket_size = get_average_basket_size(data)
-        avg_order_value = get_average_order_value(data)
-        avg_delivery_time = get_avg_delivery_time(data)
-        popular_hours = get_popular_order_hours(data).head(5).to_dict()
-        popular_days = get_popular_order_days(data).head(5).to_dict()
-        tot_revenue = get_total_revenue(data)
-
-        def format_items(df):
-            return ', '.join([f"{row['item_name']} ({row['num_sales']} sales)" for _, row in df.iterrows()])
-
-        stats_context = (
-            f"Merchant ID: {merchant_id}. "
-            f"Top items: {format_items(top_items_df)}. "
-            f"Underperforming items: {format_items(least_items_df)}. "
-            f"Basket size: {basket_size} items. "
-            f"Order value: RM {avg_order_value}. "
-            f"Delivery time: {avg_delivery_time} mins. "
-            f"Popular hours: {', '.join(f'{hour}:00 ({count} orders)' for hour, count in popular_hours.items())}. "
-            f"Popular days: {', '.join(f'{day} ({count} orders)' for day, count in popular_days.items())}."
-            f"Total revenue: RM {tot_revenue}."
+        state, chat = get_chat(merchant_id, lang)
+        chunks = llm_gateway.send(chat, user_query, merchant_id, stream=True)
+        return event_stream_response(
+            stream_chat_events(chunks, lambda text: chat_response(merchant_id, state, user_query, text))
         )
 
-        system_instruction = {
-            "en": (
-                "You are a helpful business assistant for Grab merchants. "
-                "Use clear and simple language with no markdown formatting. "
-                "Answer in a friendly and human-like tone, explaining business insights and recommendations based on the data. "
-                "Keep responses short and actionable. No bullet points or special characters. Just plain text."
-            ),
-            "ms": (
-                "Anda ialah pembantu perniagaan untuk peniaga Grab. "
-                "Gunakan bahasa mudah tanpa sebarang format khas. "
-                "Jawab dengan mesra dan jelas, beri cadangan atau penjelasan berdasarkan data. "
-                "Pastikan ayat pendek dan mudah difahami. Jangan gunakan tanda bintang atau markdown."
-            )
-        }
+    except NoDataError as e:
+        return Response({'error': str(e)}, status=404)
+    except LLMUnavailableError as e:
+        return Response({'error': str(e)}, status=503)
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
 
-        # Construct final prompt
-        prompt = (
-            f"{system_instruction.get(lang, system_instruction['en'])}\n\n"
-            f"Merchant stats: {stats_context}\n"
-            f"Merchant question: {user_query}"
-        )
+class ChatHistoryPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
 
-        # Send message and return plain response
-        response = chat.send_message(prompt)
+@api_view(['GET'])
+def chat_history_view(request, merchant_id):
+    """A merchant's chat messages, newest first, one page at a time
 
-        return Response({
-            'response': response.text,
-            'chat_history': [
-                {"role": msg.role, "text": msg.parts[0].text}
-                for msg in chat.history
-            ]
-        })
+    Turns older than the compaction window are only kept as 'summary'.
+    """
+    state = chat_store.load(merchant_id)
+    paginator = ChatHistoryPagination()
+    page = paginator.paginate_queryset(state.messages[::-1], request)
+    response = paginator.get_paginated_response(page)
+    response.data['summary'] = state.summary
+    return response
+
+
+def metric_response(merchant_id, build):
+    metrics = get_merchant_metrics(merchant_id)
+    if metrics is None:
+        return Response({'error': 'No data found for this merchant'}, status=404)
+    return Response(build(metrics))
+
+@api_view(['GET'])
+def merchant_summary_view(request, merchant_id):
+    return metric_response(merchant_id, lambda metrics: {'merchant_id': merchant_id, **metrics})
 
+def bulk_summary_line(fleet, merchant_id):
+    """One NDJSON line; a merchant that fails gets an error line and the stream goes on"""
+    try:
+        metrics = fleet.get(merchant_id)
+        if metrics is None:
+            row = {'merchant_id': merchant_id, 'error': 'No data found for this merchant'}
+        else:
+            row = {'merchant_id': merchant_id, **metrics}
+        return json.dumps(row, cls=JSONEncoder) + '\n'
     except Exception as e:
-        return Response({'error': str(e)}, status=500)
+        return json.dumps({'merchant_id': merchant_id, 'error': str(e)}) + '\n'
 
+@api_view(['POST'])
+@renderer_classes([JSONRenderer, NDJSONRenderer])
+def bulk_summary_view(request):
+    """The summary for many merchants, streamed as NDJSON with one line per merchant
+
+    Body: {"merchant_ids": [...]} or {"merchant_ids": "all"}. All merchants are
+    computed with one grouped pass instead of a lookup per merchant.
+    """
+    merchant_ids = request.data.get('merchant_ids')
+    if merchant_ids != 'all' and not (
+        isinstance(merchant_ids, list) and merchant_ids and all(isinstance(m, str) for m in merchant_ids)
+    ):
+        return Response({'error': "merchant_ids must be a list of merchant ID strings or 'all'"}, status=400)
+
+    current = current_data()
+    if merchant_ids == 'all':
+        merchant_ids = current.merchant_index.merchant_ids
+        frame = current.merged
+        rollup_flat = current.daily_rollup.to_flat()
+    else:
+        frame = current.merchant_index.take(merchant_ids)
+        rollup_flat = current.daily_rollup.to_flat(merchant_ids)
+
+    def lines():
+        try:
+            fleet = FleetMetrics(frame, current.merchant_index.key, rollup_flat)
+        except Exception as e:
+            # The grouped pass covers every merchant, so each of them reports its failure
+            for merchant_id in merchant_ids:
+                yield json.dumps({'merchant_id': merchant_id, 'error': str(e)}) + '\n'
+            return
+        for merchant_id in merchant_ids:
+            yield bulk_summary_line(fleet, merchant_id)
+
+    return StreamingHttpResponse(lines(), content_type='application/x-ndjson')
 
 @api_view(['GET'])
 def top_selling_items_view(request, merchant_id):
-    data = get_merchant_data(merchant_id)
-    result = get_top_selling_items(data).to_dict(orient='records')
-    return Response(result)
+    return metric_response(merchant_id, lambda metrics: metrics['top_selling_items'])
 
 @api_view(['GET'])
 def least_selling_items_view(request, merchant_id):
-    data = get_merchant_data(merchant_id)
-    result = get_least_selling_items(data).to_dict(orient='records')
-    return Response(result)
+    return metric_response(merchant_id, lambda metrics: metrics['least_selling_items'])
 
 @api_view(['GET'])
 def popular_hours_view(request, merchant_id):
-    data = get_merchant_data(merchant_id)
-    result = get_popular_order_hours(data).to_dict()
-    return Response(result)
+    return metric_response(merchant_id, lambda metrics: metrics['popular_order_hours'])
 
 @api_view(['GET'])
 def popular_days_view(request, merchant_id):
-    data = get_merchant_data(merchant_id)
-    result = get_popular_order_days(data).to_dict()
-    return Response(result)
+    return metric_response(merchant_id, lambda metrics: metrics['popular_order_days'])
 
 @api_view(['GET'])
 def average_basket_size_view(request, merchant_id):
-    data = get_merchant_data(merchant_id)
-    return Response({'average_basket_size': get_average_basket_size(data)})
+    return metric_response(merchant_id, lambda metrics: {'average_basket_size': metrics['average_basket_size']})
 
 @api_view(['GET'])
 def average_order_value_view(request, merchant_id):
-    data = get_merchant_data(merchant_id)
-    return Response({'average_order_value': get_average_order_value(data)})
+    return metric_response(merchant_id, lambda metrics: {'average_order_value': metrics['average_order_value']})
 
 @api_view(['GET'])
 def average_delivery_time_view(request, merchant_id):
-    data = get_merchant_data(merchant_id)
-    return Response({'average_delivery_time': get_avg_delivery_time(data)})
+    return metric_response(merchant_id, lambda metrics: {'average_delivery_time': metrics['average_delivery_time']})
 
 @api_view(['GET'])
 def total_revenue_view(request, merchant_id):
     try:
-        data = get_merchant_data(merchant_id)
-        if data.empty:
-            return Response({'error': 'No data found for this merchant'}, status=404)
-
-        total_revenue = get_total_revenue(data)
-        return Response({
+        return metric_response(merchant_id, lambda metrics: {
             'merchant_id': merchant_id,
-            'total_revenue': total_revenue
+            'total_revenue': metrics['total_revenue']
         })
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
-@api_view(['GET'])
-def merchant_recommendations(request, merchant_id):
-    try:
-        data = get_merchant_data(merchant_id)
-        if data.empty:
-            return Response({'error': 'No data found for this merchant'}, status=404)
-
-        # Metrics
-        top_items = get_top_selling_items(data, top_n=5)
-        least_items = get_least_selling_items(data, bottom_n=5)
-        basket_size = get_average_basket_size(data)
-        avg_order_value = get_average_order_value(data)
-        avg_delivery_time = get_avg_delivery_time(data)
-        popular_hours = get_popular_order_hours(data).head(5)
-        popular_days = get_popular_order_days(data).head(5)
-
-        # Merchant profile
-        merchant_info = merchants_df[merchants_df['merchant_id'] == merchant_id].iloc[0].to_dict()
-        merchant_name = merchant_info.get('merchant_name', 'Unknown')
-        cuisine = merchant_info.get('cuisine_type', 'Unknown')
-        total_orders = len(data['order_id'].unique())
-
-        # Format for Gemini
-        summary = (
-            f"Merchant Name: {merchant_name}\n"
-            f"Cuisine: {cuisine}\n"
-            f"Total Orders: {total_orders}\n"
-            f"Top Selling Items: {[row['item_name'] for _, row in top_items.iterrows()]}\n"
-            f"Underperforming Items: {[row['item_name'] for _, row in least_items.iterrows()]}\n"
-            f"Average Basket Size: {basket_size} items\n"
-            f"Average Order Value: RM{avg_order_value}\n"
-            f"Average Delivery Time: {avg_delivery_time} minutes\n"
-            f"Peak Order Hours: {[f'{k}:00' for k in popular_hours.index.tolist()]}\n"
-            f"Peak Days: {[day for day in popular_days.index.tolist()]}\n"
-        )
+def build_recommendations(merchant_id):
+    summary, result = recommendations_summary(merchant_id)
+    return recommendations_prompt(summary), result
+
+def recommendations_summary(merchant_id):
+    """(summary block for the model, response without recommendations)"""
+    metrics = get_merchant_metrics(merchant_id)
+    if metrics is None:
+        raise NoDataError('No data found for this merchant')
+
+    # Metrics
+    top_items = metrics['top_selling_items']
+    least_items = metrics['least_selling_items']
+    basket_size = metrics['average_basket_size']
+    avg_order_value = metrics['average_order_value']
+    avg_delivery_time = metrics['average_delivery_time']
+    popular_hours = top_entries(metrics['popular_order_hours'])
+    popular_days = top_entries(metrics['popular_order_days'])
+
+    # Merchant profile
+    merchants_df = current_data().merchants
+    merchant_info = merchants_df[merchants_df['merchant_id'] == merchant_id].iloc[0].to_dict()
+    merchant_name = merchant_info.get('merchant_name', 'Unknown')
+    cuisine = merchant_info.get('cuisine_type', 'Unknown')
+    total_orders = metrics['total_orders']
+
+    # Format for Gemini
+    summary = (
+        f"Merchant Name: {merchant_name}\n"
+        f"Cuisine: {cuisine}\n"
+        f"Total Orders: {total_orders}\n"
+        f"Top Selling Items: {[item['item_name'] for item in top_items]}\n"
+        f"Underperforming Items: {[item['item_name'] for item in least_items]}\n"
+        f"Average Basket Size: {basket_size} items\n"
+        f"Average Order Value: RM{avg_order_value}\n"
+        f"Average Delivery Time: {avg_delivery_time} minutes\n"
+        f"Peak Order Hours: {[f'{k}:00' for k in popular_hours]}\n"
+        f"Peak Days: {[day for day in popular_days]}\n"
+    )
+
+    return summary, {
+        'merchant_id': merchant_id,
+        'merchant_name': merchant_name,
+        'metrics': {
+            'average_basket_size': basket_size,
+            'average_order_value': avg_order_value,
+            'average_delivery_time': avg_delivery_time,
+            'top_items': top_items,
+            'underperforming_items': least_items,
+            'peak_hours': popular_hours,
+            'peak_days': popular_days
+        }
+    }
 
-        # Improved Prompt for More Actionable Insights
-        prompt = f"""
+def recommendations_prompt(summary):
+    # Improved Prompt for More Actionable Insights
+    prompt = f"""
         You are a Grab Business Consultant AI that gives personalized, real-world business recommendations to food & beverage merchant-partners.
         
         Based on the performance data below, generate 3 to 5 actionable recommendations in this format:
@@ -344,32 +502,26 @@ def merchant_recommendations(request, merchant_id):
         --- MERCHANT PERFORMANCE DATA ---
         {summary}
         """
+    return prompt
 
-        # Gemini call
-        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        response = model.generate_content(prompt)
+def stored_recommendations(merchant_id):
+    """Recommendations from `manage.py generate_recommendations`, if made from the loaded data"""
+    return precomputed.get(merchant_id, 'recommendations', data_version(merchant_id))
 
-        try:
-            recommendations = json.loads(response.text)
-        except:
-            recommendations = response.text
+@api_view(['GET'])
+def merchant_recommendations(request, merchant_id):
+    started = time.monotonic()
+    try:
+        prompt, result = build_recommendations(merchant_id)
 
-        return Response({
-            'merchant_id': merchant_id,
-            'merchant_name': merchant_name,
-            'metrics': {
-                'average_basket_size': basket_size,
-                'average_order_value': avg_order_value,
-                'average_delivery_time': avg_delivery_time,
-                'top_items': top_items.to_dict('records'),
-                'underperforming_items': least_items.to_dict('records'),
-                'peak_hours': popular_hours.to_dict(),
-                'peak_days': popular_days.to_dict()
-            },
-            'recommendations': recommendations
-        })
+        output = stored_recommendations(merchant_id)
+        if output is None:
+            # Gemini call (cached per prompt), or rule-based recommendations past the deadline
+            output = generate_within('recommendations', merchant_id, prompt, started)
+        return Response(llm_or_fallback(result, 'recommendations', output, rule_recommendations))
 
+    except NoDataError as e:
+        return Response({'error': str(e)}, status=404)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
@@ -397,155 +549,110 @@ cuisine_keywords = {
     'Turkish': {'kebab', 'doner', 'baklava', 'dolma', 'lokum'}
 }
 
-try:
-    # --- Data Loading ---
-    keywords_df = pd.read_csv(data_dir / 'keywords.csv')
-    merchants_df = pd.read_csv(data_dir / 'merchant.csv')
-    items_df = pd.read_csv(data_dir / 'items.csv')
-    
-    # Clean data
-    keywords_df = keywords_df.dropna(subset=['keyword'])
-    items_df = items_df.dropna(subset=['item_name', 'cuisine_tag'])
-    
-    # Initialize model
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    
-    # Precompute keyword embeddings
-    keywords_df['embedding'] = list(model.encode(keywords_df['keyword'].tolist()))
-    
-except Exception as e:
-    print(f"Initialization error: {e}")
-    raise
-
-def calculate_business_score(row):
-    """Normalize business metrics"""
-    max_checkout = keywords_df['checkout'].max()
-    max_order = keywords_df['order'].max()
-    return (0.4 * (row['checkout'] / max_checkout) + 0.6 * (row['order'] / max_order))
-
-def get_cuisine_relevance(keyword, cuisine):
-    """Check if keyword contains cuisine-specific terms"""
-    if cuisine not in cuisine_keywords:
-        return 0
-    return 1 if any(term in keyword.lower() for term in cuisine_keywords[cuisine]) else 0
+def load_sentence_transformer(model_name):
+    # Imported here so that only keyword search pays for sentence_transformers and torch
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+def build_keyword_search(current):
+    keywords_df = current.keywords
+
+    # Embeddings are cached on disk; the model itself only loads when a text is not cached yet
+    embedding_store = EmbeddingStore(Path("data/embeddings/"), 'all-MiniLM-L6-v2', load_sentence_transformer)
+
+    # Keyword vector index, memory-mapped from disk and rebuilt only when the keywords change
+    keyword_texts = keywords_df['keyword'].astype(str).tolist()
+    keyword_index = load_or_build_index(
+        Path("data/keyword_index/"),
+        embedding_store.fingerprint(keyword_texts),
+        lambda: normalize_rows(embedding_store.encode(keyword_texts)),
+        kind=settings.KEYWORD_INDEX,
+        flat_limit=settings.KEYWORD_INDEX_FLAT_LIMIT,
+        nprobe=settings.KEYWORD_INDEX_NPROBE,
+    )
+
+    # Static business/cuisine scores are precomputed alongside the index
+    keyword_scorer = KeywordScorer(keywords_df, keyword_index, cuisine_keywords, settings.KEYWORD_INDEX_CANDIDATES)
+    return embedding_store, keyword_scorer
+
+# Built on the first keyword request, and again on the first one after a reload
+keyword_search = Derived(datasets, build_keyword_search)
+
+def warm_up():
+    """Load the datasets and keyword search now rather than on the first requests"""
+    keyword_search.get(current_data())
+
+def server_started():
+    """Startup hook for the WSGI/ASGI application (not run by management commands)"""
+    if settings.API_WARM_UP:
+        warm_up()
+    if settings.DATASET_WATCH_INTERVAL:
+        datasets.watch(settings.DATASET_WATCH_INTERVAL)
+    if settings.DATASET_RELOAD_SIGNAL:
+        datasets.reload_on_signal(settings.DATASET_RELOAD_SIGNAL)
+
+def compute_keyword_recommendations(merchant_id):
+    current = current_data()
+    embedding_store, keyword_scorer = keyword_search.get(current)
+    items_df = current.items
+
+    # Get merchant items
+    merchant_items = items_df[items_df['merchant_id'] == merchant_id]
+    if merchant_items.empty:
+        raise NoDataError('Merchant not found')
+
+    # Encode every item name in one batch and score them against all keywords at once
+    item_names = merchant_items['item_name'].tolist()
+    item_embeddings = embedding_store.encode(item_names)
+    recommendations = keyword_scorer.recommend(item_embeddings, merchant_items['cuisine_tag'].tolist())
+
+    results = {}
+    for item_name, keywords in zip(item_names, recommendations):
+        if keywords:
+            results[item_name] = keywords
+    return results
 
 @api_view(['GET'])
 def enhanced_keyword_recommendations_view(request, merchant_id):
     """Improved SEO recommendations with cuisine awareness"""
     try:
-        # Get merchant items
-        merchant_items = items_df[items_df['merchant_id'] == merchant_id]
-        if merchant_items.empty:
-            return Response({'error': 'Merchant not found'}, status=404)
-
-        results = {}
-        
-        for _, item in merchant_items.iterrows():
-            item_name = item['item_name']
-            cuisine = item['cuisine_tag']
-            
-            # Generate item embedding
-            item_embedding = model.encode([item_name])[0]
-            
-            # Calculate similarities
-            keyword_embeddings = np.array(keywords_df['embedding'].tolist())
-            semantic_scores = cosine_similarity([item_embedding], keyword_embeddings)[0]
-            
-            # Calculate business scores
-            business_scores = keywords_df.apply(calculate_business_score, axis=1)
-            
-            # Calculate cuisine relevance
-            cuisine_scores = keywords_df['keyword'].apply(
-                lambda x: get_cuisine_relevance(x, cuisine)
-            )
-            
-            # Combine scores
-            combined_scores = (
-                0.5 * semantic_scores +
-                0.3 * business_scores +
-                0.2 * cuisine_scores
-            )
-            
-            # Get top results
-            result_df = keywords_df.copy()
-            result_df['score'] = combined_scores
-            result_df = result_df[result_df['score'] > 0.4].sort_values(
-                by=['score', 'checkout', 'order'], 
-                ascending=[False, False, False]
-            ).head(5)
-            
-            if not result_df.empty:
-                results[item_name] = result_df[
-                    ['keyword', 'score', 'checkout', 'order']
-                ].to_dict(orient='records')
-
         return Response({
             'merchant_id': merchant_id,
-            'recommendations': results
+            'recommendations': precomputed_or_build('keywords', merchant_id, compute_keyword_recommendations)
         })
 
+    except NoDataError as e:
+        return Response({'error': str(e)}, status=404)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
-@api_view(['GET'])
-def merchant_alerts_v2(request, merchant_id):
-    try:
-        # Load merchant-specific data
-        df = get_merchant_data(merchant_id)
-        if df.empty:
-            return Response({'error': 'No data found for this merchant'}, status=404)
-
-        # Convert to datetime safely
-        df = df.copy()  # Ensure we're modifying a copy of the original data
-        df['order_time'] = pd.to_datetime(df['order_time'])
-        
-        # Create filtered data WITH EXPLICIT COPY
-        latest_date = df['order_time'].max().normalize()
-        latest_data = df.loc[df['order_time'].dt.normalize() == latest_date].copy()  # <-- Key fix here
-
-        if latest_data.empty:
-            return Response({'error': 'No data available for the latest date'}, status=404)
-
-        # --- Revenue Summary ---
-        total_orders = latest_data['order_id'].nunique()
-        total_revenue = latest_data['order_value'].sum()
-
-        # --- Inventory Alerts ---
-        item_sales = (
-            latest_data.groupby('item_name')['order_id']
-            .nunique()
-            .reset_index(name='sales_count')
-        )
-        low_selling = item_sales[item_sales['sales_count'] <= 2]['item_name'].tolist()
-        high_selling = item_sales[
-            item_sales['sales_count'] > item_sales['sales_count'].mean() + item_sales['sales_count'].std()
-        ]['item_name'].tolist()
-
-        # --- Bottleneck Alerts (SAFE COLUMN ASSIGNMENT) ---
-        latest_data = latest_data.assign(
-            arrival_delay=lambda x: (x['driver_arrival_time'] - x['order_time']).dt.total_seconds() / 60,
-            pickup_delay=lambda x: (x['driver_pickup_time'] - x['driver_arrival_time']).dt.total_seconds() / 60,
-            delivery_delay=lambda x: (x['delivery_time'] - x['driver_pickup_time']).dt.total_seconds() / 60
-        )
-
-        bottlenecks = []
-        if latest_data['arrival_delay'].mean() > 15:
-            bottlenecks.append("Drivers are taking longer than usual to arrive.")
-        else:
-            bottlenecks.append("Driver arrival times are within acceptable range.")
-
-        if latest_data['pickup_delay'].mean() > 10:
-            bottlenecks.append("Orders are waiting too long after drivers arrive.")
-        else:
-            bottlenecks.append("Pickup delays are minimal and acceptable.")
-
-        if latest_data['delivery_delay'].mean() > 30:
-            bottlenecks.append("Deliveries are slower than expected.")
-        else:
-            bottlenecks.append("Delivery times are within expected range.")
-
-        # --- Gemini Insights ---
-        prompt = f"""
+def build_alerts(merchant_id):
+    return precomputed_or_build('alerts', merchant_id, compute_alerts)
+
+def compute_alerts(merchant_id):
+    # The merchant's latest day, straight from the hot partition
+    current = current_data()
+    latest_data = current.hot.get(merchant_id)
+    if merchant_id not in current.hot:
+        raise NoDataError('No data found for this merchant')
+    if latest_data.empty:
+        raise NoDataError('No data available for the latest date')
+
+    # Same computation the alert engine runs for every merchant at once
+    _, summary = next(compute_fleet_alerts(latest_data, current.merchant_index.key))
+    return alert_payload(merchant_id, summary)
+
+def alert_payload(merchant_id, summary):
+    """(prompt, result) of the alerts endpoint from a compute_fleet_alerts summary"""
+    latest_date = summary['latest_date']
+    total_orders = summary['total_orders']
+    total_revenue = summary['total_revenue']
+    high_selling = summary['high_selling_items']
+    low_selling = summary['low_selling_items']
+    bottlenecks = summary['bottlenecks']
+
+    # --- Gemini Insights ---
+    prompt = f"""
         You are an AI assistant for Grab that gives merchant-partners real-time operational and inventory insights.
 
         Below is the latest merchant performance snapshot:
@@ -562,83 +669,82 @@ def merchant_alerts_v2(request, merchant_id):
         Make sure the response doesnt contain any markdown or special characters.
         """
 
-        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        response = model.generate_content(prompt)
+    return prompt, {
+        "merchant_id": merchant_id,
+        "latest_date": str(latest_date.date()),
+        "inventory_status": {
+            "high_selling_items": high_selling,
+            "low_selling_items": low_selling
+        },
+        "revenue_summary": {
+            "total_orders": total_orders,
+            "total_revenue": round(total_revenue, 2)
+        },
+        "bottleneck_alerts": bottlenecks
+    }
 
-        try:
-            gemini_insights = json.loads(response.text)
-        except:
-            gemini_insights = response.text
+@api_view(['GET'])
+def merchant_alerts_v2(request, merchant_id):
+    started = time.monotonic()
+    try:
+        prompt, result = build_alerts(merchant_id)
 
-        return Response({
-            "merchant_id": merchant_id,
-            "latest_date": str(latest_date.date()),
-            "inventory_status": {
-                "high_selling_items": high_selling,
-                "low_selling_items": low_selling
-            },
-            "revenue_summary": {
-                "total_orders": total_orders,
-                "total_revenue": round(total_revenue, 2)
-            },
-            "bottleneck_alerts": bottlenecks,
-            "gemini_insights": gemini_insights
-        })
+        # Gemini call (cached per prompt), or rule-based insights past the deadline
+        output = generate_within('alerts', merchant_id, prompt, started)
+        return Response(llm_or_fallback(result, 'gemini_insights', output, rule_insights))
 
+    except NoDataError as e:
+        return Response({'error': str(e)}, status=404)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
     
-def get_today_data(data):
+def get_today_data(merchant_id):
     # since the data is not updated to today, we will use the last date in the dataset
-    last_date = data['order_time'].max()
-    today_data = data[data['order_time'].dt.date == last_date.date()]
-    return today_data.reset_index(drop=True)
-
-@api_view(['GET'])
-def realtime_recommendations(request, merchant_id):
-    try:
-        full_data = get_merchant_data(merchant_id)
-        if full_data.empty:
-            return Response({'error': 'No data found for this merchant'}, status=404)
-
-        data = get_today_data(full_data)
-        if data.empty:
-            return Response({'error': 'No data available for the latest date'}, status=404)
-
-        # Metrics
-        top_items = get_top_selling_items(data, top_n=5)
-        least_items = get_least_selling_items(data, bottom_n=5)
-        basket_size = get_average_basket_size(data)
-        avg_order_value = get_average_order_value(data)
-        avg_delivery_time = get_avg_delivery_time(data)
-        popular_hours = get_popular_order_hours(data).head(5)
-        popular_days = get_popular_order_days(data).head(5)
-
-        # Merchant profile
-        merchant_info = merchants_df[merchants_df['merchant_id'] == merchant_id].iloc[0].to_dict()
-        merchant_name = merchant_info.get('merchant_name', 'Unknown')
-        cuisine = merchant_info.get('cuisine_type', 'Unknown')
-        total_orders = len(data['order_id'].unique())
-        last_date_str = data['order_time'].max().strftime('%Y-%m-%d')
-
-        # Format for Gemini
-        summary = (
-            f"Merchant Name: {merchant_name}\n"
-            f"Cuisine: {cuisine}\n"
-            f"Date: {last_date_str}\n"
-            f"Total Orders: {total_orders}\n"
-            f"Top Selling Items: {[row['item_name'] for _, row in top_items.iterrows()]}\n"
-            f"Underperforming Items: {[row['item_name'] for _, row in least_items.iterrows()]}\n"
-            f"Average Basket Size: {basket_size} items\n"
-            f"Average Order Value: RM{avg_order_value}\n"
-            f"Average Delivery Time: {avg_delivery_time} minutes\n"
-            f"Peak Order Hours: {[f'{k}:00' for k in popular_hours.index.tolist()]}\n"
-            f"Peak Days: {[day for day in popular_days.index.tolist()]}\n"
-        )
+    return current_data().hot.get(merchant_id)
+
+def build_realtime_recommendations(merchant_id):
+    if merchant_id not in current_data().hot:
+        raise NoDataError('No data found for this merchant')
+
+    data = get_today_data(merchant_id)
+    if data.empty:
+        raise NoDataError('No data available for the latest date')
+
+    # Metrics
+    metrics = compute_merchant_metrics(data)
+    top_items = metrics['top_selling_items']
+    least_items = metrics['least_selling_items']
+    basket_size = metrics['average_basket_size']
+    avg_order_value = metrics['average_order_value']
+    avg_delivery_time = metrics['average_delivery_time']
+    popular_hours = top_entries(metrics['popular_order_hours'])
+    popular_days = top_entries(metrics['popular_order_days'])
+
+    # Merchant profile
+    merchants_df = current_data().merchants
+    merchant_info = merchants_df[merchants_df['merchant_id'] == merchant_id].iloc[0].to_dict()
+    merchant_name = merchant_info.get('merchant_name', 'Unknown')
+    cuisine = merchant_info.get('cuisine_type', 'Unknown')
+    total_orders = metrics['total_orders']
+    last_date_str = data['order_time'].max().strftime('%Y-%m-%d')
+
+    # Format for Gemini
+    summary = (
+        f"Merchant Name: {merchant_name}\n"
+        f"Cuisine: {cuisine}\n"
+        f"Date: {last_date_str}\n"
+        f"Total Orders: {total_orders}\n"
+        f"Top Selling Items: {[item['item_name'] for item in top_items]}\n"
+        f"Underperforming Items: {[item['item_name'] for item in least_items]}\n"
+        f"Average Basket Size: {basket_size} items\n"
+        f"Average Order Value: RM{avg_order_value}\n"
+        f"Average Delivery Time: {avg_delivery_time} minutes\n"
+        f"Peak Order Hours: {[f'{k}:00' for k in popular_hours]}\n"
+        f"Peak Days: {[day for day in popular_days]}\n"
+    )
 
-        # Improved Prompt for Daily Personalized Insights
-        prompt = f"""
+    # Improved Prompt for Daily Personalized Insights
+    prompt = f"""
         You are a Grab Business Consultant AI that gives personalized, real-world business recommendations to food & beverage merchant-partners.
 
         Based on the merchant's performance data **specifically for {last_date_str}**, generate 3 to 5 actionable and personalized recommendations in this format:
@@ -663,31 +769,32 @@ def realtime_recommendations(request, merchant_id):
         {summary}
         """
 
-        # Gemini call
-        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        response = model.generate_content(prompt)
+    return prompt, {
+        'merchant_id': merchant_id,
+        'merchant_name': merchant_name,
+        'date': last_date_str,
+        'metrics': {
+            'average_basket_size': basket_size,
+            'average_order_value': avg_order_value,
+            'average_delivery_time': avg_delivery_time,
+            'top_items': top_items,
+            'underperforming_items': least_items,
+            'peak_hours': popular_hours,
+            'peak_days': popular_days
+        }
+    }
 
-        try:
-            recommendations = json.loads(response.text)
-        except:
-            recommendations = response.text
+@api_view(['GET'])
+def realtime_recommendations(request, merchant_id):
+    started = time.monotonic()
+    try:
+        prompt, result = build_realtime_recommendations(merchant_id)
 
-        return Response({
-            'merchant_id': merchant_id,
-            'merchant_name': merchant_name,
-            'date': last_date_str,
-            'metrics': {
-                'average_basket_size': basket_size,
-                'average_order_value': avg_order_value,
-                'average_delivery_time': avg_delivery_time,
-                'top_items': top_items.to_dict('records'),
-                'underperforming_items': least_items.to_dict('records'),
-                'peak_hours': popular_hours.to_dict(),
-                'peak_days': popular_days.to_dict()
-            },
-            'recommendations': recommendations
-        })
+        # Gemini call (cached per prompt), or rule-based recommendations past the deadline
+        output = generate_within('realtime_recommendations', merchant_id, prompt, started)
+        return Response(llm_or_fallback(result, 'recommendations', output, rule_recommendations))
 
+    except NoDataError as e:
+        return Response({'error': str(e)}, status=404)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
@@ -3,8 +3,8 @@ from .models import SellerProfile, Product, Order, SalesAnalytics, Anomaly
 
 @admin.register(SellerProfile)
 class SellerProfileAdmin(admin.ModelAdmin):
-    list_display = ('shop_name', 'shop_rating', 'total_sales', 'total_products')
-    search_fields = ('shop_name',)
+    list_display = ('shop_name', 'merchant_id', 'shop_rating', 'total_sales', 'total_products')
+    search_fields = ('shop_name', 'merchant_id')
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
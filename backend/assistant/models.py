@@ -4,6 +4,8 @@ from django.contrib.auth.models import User
 class SellerProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     shop_name = models.CharField(max_length=100)
+    # merchant_id of the shop in the order datasets, which alerts and anomalies are keyed by
+    merchant_id = models.CharField(max_length=50, unique=True, null=True, blank=True)
     shop_rating = models.FloatField(default=0.0)
     total_sales = models.IntegerField(default=0)
     total_products = models.IntegerField(default=0)
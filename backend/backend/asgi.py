@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_asgi_application()
+
+# Optional warm-up, dataset file watching and reload signal (API_WARM_UP, DATASET_* settings)
+from api.views import server_started  # noqa: E402
+
+server_started()
@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'api',
+    'assistant',
 ]
 
 MIDDLEWARE = [
@@ -153,3 +154,114 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Gemini response cache
+# 'memory' keeps a per-worker LRU; 'django' uses the cache named by LLM_CACHE_ALIAS
+
+LLM_CACHE_BACKEND = 'memory'
+LLM_CACHE_ALIAS = 'default'
+LLM_CACHE_TTL = 15 * 60  # seconds
+LLM_CACHE_MAX_ENTRIES = 1024
+# Identical prompts that miss the cache together make one Gemini call per worker. 'sqlite'
+# (the SQLite file at LLM_SINGLE_FLIGHT_SQLITE_PATH) or 'django' (the LLM_CACHE_ALIAS cache)
+# extends that across workers; the others wait up to LLM_SINGLE_FLIGHT_TIMEOUT seconds for its reply
+LLM_SINGLE_FLIGHT = None
+LLM_SINGLE_FLIGHT_TIMEOUT = 60
+LLM_SINGLE_FLIGHT_SQLITE_PATH = BASE_DIR / 'data' / 'llm_flights.sqlite3'
+
+# Chat sessions
+# 'memory' keeps a per-worker LRU; 'sqlite' the SQLite file at CHAT_STORE_SQLITE_PATH and
+# 'django' the cache named by CHAT_STORE_ALIAS, both of which survive restarts and are shared by workers
+
+CHAT_STORE_BACKEND = 'memory'
+CHAT_STORE_ALIAS = 'default'
+CHAT_STORE_SQLITE_PATH = BASE_DIR / 'data' / 'chat_sessions.sqlite3'
+CHAT_MAX_SESSIONS = 1000
+CHAT_MAX_BYTES = 50 * 2**20  # in-process backend only
+CHAT_IDLE_TIMEOUT = 60 * 60  # seconds
+# Older turns are summarized once the history passes the budget; the last few stay verbatim
+CHAT_HISTORY_TOKEN_BUDGET = 4000
+CHAT_KEEP_TURNS = 4
+
+
+# Output of `manage.py precompute`, read by the views when it matches the loaded data
+
+PRECOMPUTE_STORE_PATH = BASE_DIR / 'data' / 'precomputed.sqlite3'
+
+
+# Keyword vector index for enhanced keyword recommendations
+# 'auto' searches every keyword exactly up to KEYWORD_INDEX_FLAT_LIMIT and uses IVF above it;
+# 'flat' and 'ivf' force one. IVF scans KEYWORD_INDEX_NPROBE clusters per item and then
+# re-scores KEYWORD_INDEX_CANDIDATES nearest keywords plus as many top business/cuisine ones
+
+KEYWORD_INDEX = 'auto'
+KEYWORD_INDEX_FLAT_LIMIT = 50000
+KEYWORD_INDEX_NPROBE = 16
+KEYWORD_INDEX_CANDIDATES = 256
+
+
+# Load datasets and the keyword model when the WSGI/ASGI application starts rather than
+# on first use; management commands never load them unless they need them
+
+API_WARM_UP = False
+
+# Served processes reload the datasets in the background when the CSVs change (checked
+# every DATASET_WATCH_INTERVAL seconds, 0 to disable) or on DATASET_RELOAD_SIGNAL
+# (e.g. `kill -USR2 <worker pid>`, None to disable)
+
+DATASET_WATCH_INTERVAL = 60
+DATASET_RELOAD_SIGNAL = 'SIGUSR2'
+
+# Days of each merchant's most recent orders kept in the hot partition that the
+# realtime recommendation and alert endpoints read
+
+HOT_PARTITION_DAYS = 7
+
+# Streaming anomaly detector (`manage.py detect_anomalies`): per-merchant EWMA of hourly
+# orders, revenue and delays for each hour of the day; an hour more than ANOMALY_Z_THRESHOLD
+# deviations off, once ANOMALY_MIN_DAYS days of that hour are known, is recorded as an Anomaly
+
+ANOMALY_DETECTOR_STATE_PATH = BASE_DIR / 'data' / 'anomaly_detector.pickle'
+ANOMALY_EWMA_ALPHA = 0.1
+ANOMALY_Z_THRESHOLD = 3.0
+ANOMALY_MIN_DAYS = 7
+ANOMALY_WARMUP_DAYS = 28
+
+# LLM gateway: every Gemini call shares one client, at most LLM_MAX_IN_FLIGHT calls at
+# a time, token buckets of LLM_RATE/s overall and LLM_MERCHANT_RATE/s per merchant,
+# up to LLM_MAX_RETRIES retries with exponential backoff on quota/overload errors, and
+# a circuit breaker that fails fast for LLM_BREAKER_RESET seconds after
+# LLM_BREAKER_FAILURES failed attempts in a row, then lets one probe call through.
+# At most LLM_MERCHANT_BUCKETS_MAX merchants' buckets are kept. LLM_BACKEND = 'fake'
+# answers locally and needs no GEMINI_API_KEY.
+
+LLM_BACKEND = 'gemini'
+LLM_MODEL = 'gemini-2.0-flash'
+LLM_TIMEOUT = 30
+LLM_MAX_IN_FLIGHT = 8
+LLM_QUEUE_TIMEOUT = 10
+LLM_RATE = 10
+LLM_BURST = 20
+LLM_MERCHANT_RATE = 0.5
+LLM_MERCHANT_BURST = 5
+LLM_MAX_RETRIES = 3
+LLM_BACKOFF_BASE = 1.0
+LLM_BACKOFF_MAX = 20
+LLM_BREAKER_FAILURES = 5
+LLM_BREAKER_RESET = 30
+LLM_MERCHANT_BUCKETS_MAX = 10000
+# Seconds from request to response that the recommendation and alert endpoints wait for
+# Gemini before answering with rule-based output (None waits as long as the call takes).
+# At most LLM_MAX_QUEUED calls wait for one of the LLM_MAX_IN_FLIGHT threads; requests
+# beyond that answer with rule-based output straight away
+LLM_DEADLINE = 8
+LLM_MAX_QUEUED = 32
+
+# `manage.py generate_recommendations` packs up to LLM_BATCH_MAX_MERCHANTS merchants into
+# one request of about LLM_BATCH_TOKEN_BUDGET prompt tokens, and retries merchants missing
+# from a reply for up to LLM_BATCH_ATTEMPTS rounds
+
+LLM_BATCH_TOKEN_BUDGET = 6000
+LLM_BATCH_MAX_MERCHANTS = 20
+LLM_BATCH_ATTEMPTS = 3